@@ -0,0 +1,137 @@
+"""
+Batch analysis of PGN or FEN/EPD files.
+Positions are streamed from the input and fanned out to worker processes, each with its own GameState and
+move cache. Results are written as JSON lines in input order. Only a bounded number of positions is in flight
+at a time, and a checkpoint lets an interrupted job resume where it stopped.
+
+Usage: python BatchAnalysis.py games.pgn -o analysis.jsonl --depth 3 [--resume]
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+from multiprocessing import Pool, cpu_count
+import ChessAI
+import ChessEngine
+import ChessPGN
+
+CHECKPOINT_EVERY = 100  # results written between checkpoints
+MAX_PENDING_PER_PROCESS = 4  # positions queued per worker before reading more input
+
+
+def readPositions(filename):
+    """
+    Lazily yield (id, fen) for every position of the input: every position before a move of every game
+    for a .pgn file, every line for FEN and EPD files.
+    """
+    with open(filename) as file:
+        if filename.lower().endswith(".pgn"):
+            for game_number, ply, fen, san in ChessPGN.readPGNPositions(file):
+                yield f"{game_number + 1}:{ply + 1}", fen
+        else:
+            for line_number, line in enumerate(file):
+                position = ChessEngine.parseFENLine(line)
+                if position is not None:
+                    yield position[1].get("id", str(line_number + 1)), position[0]
+
+
+def initWorker(depth, movetime, cache_size):
+    global worker_state, worker_depth, worker_movetime
+    worker_state = ChessEngine.GameState()
+    worker_state.enableMoveCache(cache_size)
+    worker_depth = depth
+    worker_movetime = movetime
+
+
+def analysePosition(position):
+    """
+    Worker task: search one position and return its result record.
+    """
+    position_id, fen = position
+    worker_state.loadFEN(fen)
+    valid_moves = worker_state.getValidMoves()
+    start_time = time.perf_counter()
+    deadline = start_time + worker_movetime if worker_movetime else None
+    completed = {"depth": 0}
+
+    def recordDepth(depth, score, principal_variation):
+        completed["depth"] = depth
+
+    best_move, score, principal_variation = ChessAI.findBestMoveIterative(
+        worker_state, valid_moves, worker_depth,
+        (lambda: time.perf_counter() >= deadline) if deadline else None, recordDepth)
+    return {"id": position_id, "fen": fen, "best_move": best_move.getUCINotation() if best_move else None,
+            "score": round(score * 100), "depth": completed["depth"], "nodes": ChessAI.nodes_searched,
+            "pv": [move.getUCINotation() for move in principal_variation],
+            "time": round(time.perf_counter() - start_time, 4)}
+
+
+def readCheckpoint(checkpoint):
+    if not os.path.exists(checkpoint):
+        return 0, 0
+    with open(checkpoint) as file:
+        data = json.load(file)
+    return data["positions"], data["offset"]
+
+
+def writeCheckpoint(checkpoint, positions, offset):
+    with open(checkpoint + ".tmp", "w") as file:
+        json.dump({"positions": positions, "offset": offset}, file)
+    os.replace(checkpoint + ".tmp", checkpoint)  # atomic, so a crash never leaves half a checkpoint
+
+
+def analyse(input_file, output, depth=ChessAI.DEPTH, movetime=None, processes=None, resume=False,
+            cache_size=ChessEngine.MOVE_CACHE_SIZE):
+    """
+    Analyse every position of input_file and write the results to output, in order.
+    With resume, positions already covered by the checkpoint of a previous run are skipped.
+    """
+    checkpoint = output + ".checkpoint"
+    done, offset = readCheckpoint(checkpoint) if resume else (0, 0)
+    if done and (not os.path.exists(output) or os.path.getsize(output) < offset):
+        print(f"{output} is missing or shorter than its checkpoint, starting over")
+        done, offset = 0, 0
+    processes = processes or cpu_count()
+    positions = readPositions(input_file)
+    for skipped in range(done):  # positions the previous run already wrote
+        next(positions, None)
+    with open(output, "r+" if done else "w") as file, \
+            Pool(processes, initializer=initWorker, initargs=(depth, movetime, cache_size)) as pool:
+        file.truncate(offset)  # drop results written after the last checkpoint
+        file.seek(offset)
+        pending = deque()
+        written = done
+        start_time = time.perf_counter()
+
+        def writeNext():
+            nonlocal written
+            file.write(json.dumps(pending.popleft().get()) + "\n")
+            written += 1
+            if written % CHECKPOINT_EVERY == 0:
+                file.flush()
+                writeCheckpoint(checkpoint, written, file.tell())
+                rate = (written - done) / (time.perf_counter() - start_time)
+                print(f"{written} positions analysed ({rate:.1f}/s)")
+
+        for position in positions:
+            pending.append(pool.apply_async(analysePosition, (position,)))
+            if len(pending) >= processes * MAX_PENDING_PER_PROCESS:  # back-pressure: wait before reading on
+                writeNext()
+        while pending:
+            writeNext()
+        file.flush()
+        writeCheckpoint(checkpoint, written, file.tell())
+    print(f"Done: {written} positions in {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse every position of a PGN or FEN/EPD file.")
+    parser.add_argument("input", help=".pgn, .fen or .epd file")
+    parser.add_argument("-o", "--output", default="analysis.jsonl")
+    parser.add_argument("--depth", type=int, default=ChessAI.DEPTH)
+    parser.add_argument("--movetime", type=float, default=None, help="seconds per position")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint of a previous run")
+    args = parser.parse_args()
+    analyse(args.input, args.output, args.depth, args.movetime, args.processes, args.resume)
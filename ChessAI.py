@@ -1,6 +1,8 @@
 """
 Handling the AI moves.
 """
+import functools
+import json
 import random
 
 piece_score = {"K": 0, "Q": 9, "R": 5, "B": 3, "N": 3, "p": 1}
@@ -61,14 +63,59 @@ piece_position_scores = {"wN": knight_scores,
                          "wp": pawn_scores,
                          "bp": pawn_scores[::-1]}
 
-CHECKMATE = 1000
+piece_tables = {"N": knight_scores, "B": bishop_scores, "R": rook_scores, "Q": queen_scores, "p": pawn_scores}
+
+DOUBLED_PAWN_SCORE = -0.2  # for every pawn beyond the first on a file
+ISOLATED_PAWN_SCORE = -0.15  # for a pawn without friendly pawns on the neighbouring files
+passed_pawn_scores = [0.0, 0.05, 0.1, 0.2, 0.35, 0.6]  # by rows advanced from the starting row, up to promotion
+
+CHECKMATE = 1000  # a mate found in the search scores CHECKMATE - plies to the mate, so nearer mates score higher
+MAX_MATE_PLIES = 200  # scores within this many plies of CHECKMATE are forced mates
 STALEMATE = 0
 DEPTH = 3
+QUIESCENCE_DEPTH = 4  # captures searched beyond DEPTH before the position counts as quiet
+
+
+nodes_searched = 0  # positions visited by the current search
+PAWN_HASH_SIZE = 1 << 14  # entries in the pawn structure table, a power of two
+pawn_hash_keys = [None] * PAWN_HASH_SIZE
+pawn_hash_scores = [0.0] * PAWN_HASH_SIZE
+pawn_hash_hits = 0
+pawn_hash_misses = 0
+search_depth = DEPTH  # depth of the current iteration, the root is where depth == search_depth
+stop_search = None  # function polled during the search, returning True when it should give up
+
+
+class SearchStopped(Exception):
+    """
+    Raised inside the search once stop_search asks it to give up.
+    """
+
+
+def withMoveCache(search):
+    """
+    Decorator for the search entry points: a game state without a move cache gets one for the length of the
+    search, where iterative deepening and transpositions revisit positions, and drops it afterwards.
+    """
+    @functools.wraps(search)
+    def searchWithMoveCache(game_state, *args, **kwargs):
+        if game_state.move_cache is not None:
+            return search(game_state, *args, **kwargs)
+        game_state.enableMoveCache()
+        try:
+            return search(game_state, *args, **kwargs)
+        finally:
+            game_state.enableMoveCache(0)
+    return searchWithMoveCache
 
 
+@withMoveCache
 def findBestMove(game_state, valid_moves):
-    global next_move
+    global next_move, search_depth, stop_search, nodes_searched
     next_move = None
+    nodes_searched = 0
+    search_depth = DEPTH
+    stop_search = None
     random.shuffle(valid_moves)  # Shuffle to add some randomness
     
     # Use the NegaMax AlphaBeta method to find the best move
@@ -78,21 +125,121 @@ def findBestMove(game_state, valid_moves):
     return next_move
 
 
+@withMoveCache
+def findBestMoveIterative(game_state, valid_moves, max_depth=DEPTH, should_stop=None, on_iteration=None):
+    """
+    Iterative deepening: search depth 1, 2, ... max_depth, trying the best move of the previous depth first.
+    should_stop is polled at every node; once it returns True the result of the last finished depth is kept.
+    on_iteration(depth, score, principal_variation) is called after every finished depth.
+    Returns (best move, score for the side to move, principal variation).
+    """
+    global next_move, search_depth, stop_search, nodes_searched
+    nodes_searched = 0
+    if not valid_moves:
+        return None, -CHECKMATE if game_state.checkmate else STALEMATE, []
+    stop_search = should_stop
+    valid_moves = list(valid_moves)
+    random.shuffle(valid_moves)  # Shuffle to add some randomness
+    plies_played = len(game_state.move_log)
+    best_move, best_score, principal_variation = (valid_moves[0] if valid_moves else None), 0, []
+    for depth in range(1, max_depth + 1):
+        next_move = None
+        search_depth = depth
+        line = []
+        try:
+            score = findMoveNegaMaxAlphaBeta(game_state, valid_moves, depth, -CHECKMATE, CHECKMATE,
+                                             1 if game_state.white_to_move else -1, line)
+        except SearchStopped:
+            while len(game_state.move_log) > plies_played:  # take back the moves of the interrupted line
+                game_state.undoMove()
+            game_state.getValidMoves()  # restore the check and mate flags of the root position
+            break
+        best_move, best_score, principal_variation = next_move, score, line
+        valid_moves.remove(best_move)
+        valid_moves.insert(0, best_move)
+        if on_iteration is not None:
+            on_iteration(depth, best_score, principal_variation)
+        if getMateMoves(best_score) is not None:  # a forced mate was found, searching deeper won't change the move
+            break
+    stop_search = None
+    return best_move, best_score, principal_variation
+
+
+@withMoveCache
+def findBestMoves(game_state, valid_moves, count=3, max_depth=DEPTH, should_stop=None, on_iteration=None):
+    """
+    Multi-PV analysis: the best `count` root moves, each with its score and principal variation.
+    Uses iterative deepening, and each depth is a single pass over the root moves. Every move is searched
+    against the score of the current count-th best line, so a move that can't make the list fails low cheaply
+    and is left out, instead of running a separate full search per line.
+    on_iteration(depth, lines) is called after every finished depth.
+    Returns a list of (move, score, principal variation), best first.
+    """
+    global search_depth, stop_search, nodes_searched
+    nodes_searched = 0
+    stop_search = should_stop
+    valid_moves = list(valid_moves)
+    random.shuffle(valid_moves)  # Shuffle to add some randomness
+    turn_multiplier = 1 if game_state.white_to_move else -1
+    plies_played = len(game_state.move_log)
+    lines = []
+    for depth in range(1, max_depth + 1):
+        search_depth = depth
+        depth_lines = []
+        try:
+            for move in valid_moves:
+                alpha = depth_lines[-1][1] if len(depth_lines) == count else -CHECKMATE - 1
+                game_state.makeMove(move)
+                next_line = []
+                score = -findMoveNegaMaxAlphaBeta(game_state, game_state.getValidMoves(), depth - 1,
+                                                  -CHECKMATE - 1, -alpha, -turn_multiplier, next_line)
+                game_state.undoMove()
+                if score > alpha:
+                    depth_lines.append((move, score, [move] + next_line))
+                    depth_lines.sort(key=lambda line: -line[1])
+                    del depth_lines[count:]
+        except SearchStopped:
+            while len(game_state.move_log) > plies_played:  # take back the moves of the interrupted line
+                game_state.undoMove()
+            game_state.getValidMoves()  # restore the check and mate flags of the root position
+            break
+        lines = depth_lines
+        # search the best lines of this depth first next time, so the window tightens sooner
+        best_moves = [line[0] for line in lines]
+        valid_moves = best_moves + [move for move in valid_moves if move not in best_moves]
+        if on_iteration is not None:
+            on_iteration(depth, lines)
+    stop_search = None
+    return lines
 
-def findMoveNegaMaxAlphaBeta(game_state, valid_moves, depth, alpha, beta, turn_multiplier):
-    global next_move
+
+def findMoveNegaMaxAlphaBeta(game_state, valid_moves, depth, alpha, beta, turn_multiplier, line=None):
+    """
+    NegaMax search with alpha-beta pruning. If a list is given as line, it is filled with the principal variation.
+    """
+    global next_move, nodes_searched
+    nodes_searched += 1
+    if stop_search is not None and stop_search():
+        raise SearchStopped()
     if depth == 0:
-        return turn_multiplier * scoreBoard(game_state)
-    # move ordering - implement later //TODO
-    max_score = -CHECKMATE
+        return findMoveQuiescence(game_state, valid_moves, QUIESCENCE_DEPTH, alpha, beta, turn_multiplier)
+    if not valid_moves:
+        return -(CHECKMATE - (search_depth - depth)) if game_state.checkmate else STALEMATE
+    if depth < search_depth:  # the root keeps the order the caller chose
+        valid_moves = orderMoves(game_state, valid_moves)
+    max_score = -CHECKMATE - 1  # below any real score, so even a lost position still picks a move
     for move in valid_moves:
         game_state.makeMove(move)
         next_moves = game_state.getValidMoves()
-        score = -findMoveNegaMaxAlphaBeta(game_state, next_moves, depth - 1, -beta, -alpha, -turn_multiplier)
+        next_line = [] if line is not None else None
+        score = -findMoveNegaMaxAlphaBeta(game_state, next_moves, depth - 1, -beta, -alpha, -turn_multiplier,
+                                          next_line)
         if score > max_score:
             max_score = score
-            if depth == DEPTH:
+            if depth == search_depth:
                 next_move = move
+            if line is not None:
+                line[:] = [move] + next_line
         game_state.undoMove()
         if max_score > alpha:
             alpha = max_score
@@ -101,6 +248,67 @@ def findMoveNegaMaxAlphaBeta(game_state, valid_moves, depth, alpha, beta, turn_m
     return max_score
 
 
+def findMoveQuiescence(game_state, valid_moves, depth, alpha, beta, turn_multiplier):
+    """
+    Search captures only until the position is quiet, so the evaluation isn't taken in the middle of an exchange.
+    The side to move may stand pat on the static score. Captures that lose material by static exchange
+    evaluation are skipped, the others are searched best exchange first.
+    """
+    global nodes_searched
+    nodes_searched += 1
+    if stop_search is not None and stop_search():
+        raise SearchStopped()
+    if not valid_moves:  # scored like the full search does, by the distance to the mate
+        ply = search_depth + QUIESCENCE_DEPTH - depth
+        return -(CHECKMATE - ply) if game_state.checkmate else STALEMATE
+    stand_pat = turn_multiplier * scoreBoard(game_state)
+    if depth == 0 or stand_pat >= beta:
+        return stand_pat
+    alpha = max(alpha, stand_pat)
+    captures = []
+    for move in valid_moves:
+        if move.is_capture or move.is_pawn_promotion:
+            exchange = game_state.staticExchange(move)
+            if exchange >= 0:
+                captures.append((exchange, move))
+    captures.sort(key=lambda capture: -capture[0])
+    for exchange, move in captures:
+        game_state.makeMove(move)
+        score = -findMoveQuiescence(game_state, game_state.getValidMoves(), depth - 1, -beta, -alpha,
+                                    -turn_multiplier)
+        game_state.undoMove()
+        if score > alpha:
+            alpha = score
+            if alpha >= beta:
+                break
+    return alpha
+
+
+def getMateMoves(score):
+    """
+    Moves to the mate for a search score: positive when the side to move mates, negative when it is mated,
+    None when the score isn't a forced mate.
+    """
+    if abs(score) < CHECKMATE - MAX_MATE_PLIES:
+        return None
+    moves = (CHECKMATE - abs(score) + 1) // 2
+    return moves if score > 0 else -moves
+
+
+def orderMoves(game_state, valid_moves):
+    """
+    Winning and even captures first, best exchange first, then quiet moves, then captures that lose material.
+    The sort is stable, so moves that compare equal keep their shuffled order.
+    """
+    def exchangeOrder(move):
+        if not move.is_capture:
+            return 0
+        exchange = game_state.staticExchange(move)
+        return -exchange - 100 if exchange >= 0 else -exchange
+
+    return sorted(valid_moves, key=exchangeOrder)
+
+
 def scoreBoard(game_state):
     """
     Score the board. A positive score is good for white, a negative score is good for black.
@@ -112,6 +320,8 @@ def scoreBoard(game_state):
             return CHECKMATE  # white wins
     elif game_state.stalemate:
         return STALEMATE
+    if game_state.evaluator is not None:
+        return game_state.evaluator.evaluate()
     score = 0
     for row in range(len(game_state.board)):
         for col in range(len(game_state.board[row])):
@@ -125,9 +335,99 @@ def scoreBoard(game_state):
                 if piece[0] == "b":
                     score -= piece_score[piece[1]] + piece_position_score
 
+    return score + probePawnHash(game_state)
+
+
+def probePawnHash(game_state):
+    """
+    Pawn structure score of the position, looked up by pawn key and only computed on a miss.
+    Entries are replaced whenever another pawn configuration maps to the same slot.
+    """
+    global pawn_hash_hits, pawn_hash_misses
+    index = game_state.pawn_key & (PAWN_HASH_SIZE - 1)
+    if pawn_hash_keys[index] == game_state.pawn_key:
+        pawn_hash_hits += 1
+        return pawn_hash_scores[index]
+    pawn_hash_misses += 1
+    score = scorePawnStructure(game_state.board)
+    pawn_hash_keys[index] = game_state.pawn_key
+    pawn_hash_scores[index] = score
+    return score
+
+
+def scorePawnStructure(board):
+    """
+    Doubled, isolated and passed pawns. A positive score is good for white, a negative score is good for black.
+    """
+    pawn_rows = {"w": [[] for col in range(8)], "b": [[] for col in range(8)]}  # rows of the pawns on every file
+    for row in range(1, 7):
+        for col in range(8):
+            if board[row][col][1] == "p":
+                pawn_rows[board[row][col][0]][col].append(row)
+    score = 0
+    for color, sign, enemy in (("w", 1, "b"), ("b", -1, "w")):
+        files = pawn_rows[color]
+        for col in range(8):
+            if not files[col]:
+                continue
+            score += sign * DOUBLED_PAWN_SCORE * (len(files[col]) - 1)
+            neighbours = range(max(col - 1, 0), min(col + 2, 8))
+            if not any(files[neighbour] for neighbour in neighbours if neighbour != col):
+                score += sign * ISOLATED_PAWN_SCORE * len(files[col])
+            enemy_rows = [enemy_row for neighbour in neighbours for enemy_row in pawn_rows[enemy][neighbour]]
+            for row in files[col]:
+                # passed if no enemy pawn stands in front of it on its own or a neighbouring file
+                if color == "w" and not any(enemy_row < row for enemy_row in enemy_rows):
+                    score += passed_pawn_scores[6 - row]
+                elif color == "b" and not any(enemy_row > row for enemy_row in enemy_rows):
+                    score -= passed_pawn_scores[row - 1]
     return score
 
 
+def getSearchStatistics():
+    """
+    Nodes of the last search and the pawn structure table hit rate since the program started.
+    """
+    probes = pawn_hash_hits + pawn_hash_misses
+    return {"nodes": nodes_searched, "pawn_hash_hits": pawn_hash_hits, "pawn_hash_misses": pawn_hash_misses,
+            "pawn_hash_hit_rate": pawn_hash_hits / probes if probes else 0.0}
+
+
+def loadParameters(filename):
+    """
+    Load piece values and piece-square tables from a file written by saveParameters (e.g. by TexelTuner).
+    """
+    with open(filename) as file:
+        setParameters(json.load(file))
+
+
+def saveParameters(filename):
+    """
+    Save the current piece values and piece-square tables.
+    """
+    with open(filename, "w") as file:
+        json.dump(getParameters(), file, indent=1)
+
+
+def getParameters():
+    """
+    A copy of the current piece values and piece-square tables.
+    """
+    return {"piece_score": dict(piece_score),
+            "piece_tables": {piece: [list(row) for row in table] for piece, table in piece_tables.items()}}
+
+
+def setParameters(parameters):
+    """
+    Replace the piece values and piece-square tables.
+    The tables are updated in place, so the mirrored black tables in piece_position_scores follow along.
+    """
+    piece_score.update(parameters["piece_score"])
+    for piece, table in piece_tables.items():
+        for row in range(8):
+            table[row][:] = parameters["piece_tables"][piece][row]
+
+
 def findRandomMove(valid_moves):
     """
     Picks and returns a random valid move.
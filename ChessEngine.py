@@ -3,7 +3,23 @@ Storing all the information about the current state of chess game.
 Determining valid moves at current state.
 It will keep move log.
 """
-import pickle
+import random
+import re
+import struct
+from collections import OrderedDict
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+SAVE_FILE = "saved_game.journal"
+UNDO_CODE = 0xFFFF  # journal entry that takes back the previous move
+move_code = struct.Struct("<H")
+# board (one byte per square, see SNAPSHOT_PIECES), side to move and castling rights, en-passant square,
+# halfmove clock, fullmove number, position key and pawn key
+snapshot_format = struct.Struct("<64sBBHHQQ")
+SNAPSHOT_PIECES = ["--", "wp", "wR", "wN", "wB", "wQ", "wK", "bp", "bR", "bN", "bB", "bQ", "bK"]
+NO_ENPASSANT = 0xFF
+MOVE_CACHE_SIZE = 4096  # positions whose legal moves are remembered, 0 turns the cache off
+EXCHANGE_VALUES = {"p": 1, "N": 3, "B": 3, "R": 5, "Q": 9, "K": 100}  # piece values for static exchange evaluation
+
 
 class GameState:
     def __init__(self):
@@ -13,7 +29,7 @@ class GameState:
         The second character represents the type of the piece: 'R', 'N', 'B', 'Q', 'K' or 'p'.
         "--" represents an empty space with no piece.
         """
-        self.board = [
+        board = [
             ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
             ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
             ["--", "--", "--", "--", "--", "--", "--", "--"],
@@ -22,22 +38,274 @@ class GameState:
             ["--", "--", "--", "--", "--", "--", "--", "--"],
             ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp"],
             ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]]
-        self.moveFunctions = {"p": self.getPawnMoves, "R": self.getRookMoves, "N": self.getKnightMoves,
-                              "B": self.getBishopMoves, "Q": self.getQueenMoves, "K": self.getKingMoves}
-        self.white_to_move = True
+        self.initHelpers()
+        self.setPosition(board, True, CastleRights(True, True, True, True), (), START_FEN)
+
+    def setPosition(self, board, white_to_move, castling_rights, enpassant, start_fen, position_key=None,
+                    pawn_key=None):
+        """
+        Set up a position with an empty move log. Shared by __init__, loadFEN and fromSnapshot.
+        The Zobrist keys are computed unless they are given.
+        """
+        self.board = board
+        self.white_to_move = white_to_move
         self.move_log = []
         self.white_king_location = (7, 4)
         self.black_king_location = (0, 4)
+        for row in range(8):
+            for col in range(8):
+                if board[row][col] == "wK":
+                    self.white_king_location = (row, col)
+                elif board[row][col] == "bK":
+                    self.black_king_location = (row, col)
         self.checkmate = False
         self.stalemate = False
         self.in_check = False
         self.pins = []
         self.checks = []
-        self.enpassant_possible = ()  # coordinates for the square where en-passant capture is possible
+        self.enpassant_possible = enpassant  # coordinates for the square where en-passant capture is possible
         self.enpassant_possible_log = [self.enpassant_possible]
-        self.current_castling_rights = CastleRights(True, True, True, True)
-        self.castle_rights_log = [CastleRights(self.current_castling_rights.wks, self.current_castling_rights.bks,
-                                               self.current_castling_rights.wqs, self.current_castling_rights.bqs)]
+        self.current_castling_rights = castling_rights
+        self.castle_rights_log = [CastleRights(castling_rights.wks, castling_rights.bks, castling_rights.wqs,
+                                               castling_rights.bqs)]
+        self.start_fen = start_fen  # position the move log starts from
+        # Zobrist hash of the position, kept up to date by makeMove
+        self.position_key = self.computePositionKey() if position_key is None else position_key
+        self.position_key_log = [self.position_key]
+        # Zobrist hash of the pawns alone, for the pawn structure cache
+        self.pawn_key = self.computePawnKey() if pawn_key is None else pawn_key
+        self.pawn_key_log = [self.pawn_key]
+        if self.evaluator is not None:
+            self.evaluator.refresh(self.board)
+
+    @classmethod
+    def createUnset(cls):
+        """
+        A game state without a position, for the constructors that set one up right away.
+        Skips __init__, which would build the start position only to have it replaced.
+        """
+        game_state = cls.__new__(cls)
+        game_state.initHelpers()
+        return game_state
+
+    def initHelpers(self):
+        """
+        Everything but the position: the move functions, and no evaluator or move cache yet.
+        """
+        self.bindMoveFunctions()
+        self.evaluator = None  # optional incrementally updated evaluation, see setEvaluator
+        self.move_cache = None  # off unless enabled, see enableMoveCache
+
+    def bindMoveFunctions(self):
+        self.moveFunctions = {"p": self.getPawnMoves, "R": self.getRookMoves, "N": self.getKnightMoves,
+                              "B": self.getBishopMoves, "Q": self.getQueenMoves, "K": self.getKingMoves}
+
+    def __getstate__(self):
+        """
+        Pickle without the bound move functions and the contents of the move cache, only its size.
+        """
+        state = self.__dict__.copy()
+        del state["moveFunctions"]
+        state["move_cache"] = self.move_cache.size if self.move_cache is not None else 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.bindMoveFunctions()
+        self.enableMoveCache(state["move_cache"])
+
+    @classmethod
+    def fromFEN(cls, fen):
+        """
+        Create a new game state set up from a FEN (or EPD) string.
+        """
+        game_state = cls.createUnset()
+        game_state.loadFEN(fen)
+        return game_state
+
+    def loadFEN(self, fen):
+        """
+        Set up the position described by a FEN string, clearing the move log.
+        The halfmove clock and fullmove number fields are optional, so EPD positions work as well: anything after
+        the first four fields must be the two clocks, EPD opcodes or both. Raises ValueError for an invalid FEN.
+        """
+        position = parseFENLine(fen)
+        if position is None:
+            raise ValueError("Invalid FEN: " + fen)
+        fields = position[0].split()
+        extra = fen.split()[len(fields):]
+        if extra and not position[1]:  # neither clocks nor opcodes
+            raise ValueError("Invalid FEN clocks: " + " ".join(extra))
+        ranks = fields[0].split("/")
+        if len(ranks) != 8:
+            raise ValueError("Invalid FEN board: " + fields[0])
+        board = []
+        for rank in ranks:
+            row = []
+            for char in rank:
+                if char.isdigit():
+                    row.extend(["--"] * int(char))
+                elif char.lower() in fen_to_piece:
+                    row.append(("w" if char.isupper() else "b") + fen_to_piece[char.lower()])
+                else:
+                    raise ValueError("Invalid FEN piece: " + char)
+            if len(row) != 8:
+                raise ValueError("Invalid FEN rank: " + rank)
+            board.append(row)
+        if fields[1] not in ("w", "b"):
+            raise ValueError("Invalid FEN side to move: " + fields[1])
+        castling = fields[2]
+        if castling != "-" and not set(castling) <= set("KQkq"):
+            raise ValueError("Invalid FEN castling rights: " + castling)
+        if fields[3] == "-":
+            enpassant = ()
+        elif len(fields[3]) == 2 and fields[3][0] in Move.files_to_cols and fields[3][1] in Move.ranks_to_rows:
+            enpassant = (Move.ranks_to_rows[fields[3][1]], Move.files_to_cols[fields[3][0]])
+        else:
+            raise ValueError("Invalid FEN en-passant square: " + fields[3])
+        self.setPosition(board, fields[1] == "w",
+                         CastleRights("K" in castling, "k" in castling, "Q" in castling, "q" in castling), enpassant,
+                         " ".join(fields + ([] if len(fields) == 6 else ["0", "1"])))
+
+    def computePositionKey(self):
+        """
+        Compute the Zobrist hash of the position from scratch.
+        """
+        key = 0
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != "--":
+                    key ^= zobrist_pieces[piece][row * 8 + col]
+        if not self.white_to_move:
+            key ^= zobrist_black_to_move
+        key ^= zobrist_castling[self.current_castling_rights.getIndex()]
+        if self.enpassant_possible != ():
+            key ^= zobrist_enpassant[self.enpassant_possible[1]]
+        return key
+
+    def computePawnKey(self):
+        """
+        Compute the Zobrist hash of the pawn configuration from scratch.
+        """
+        key = 0
+        for row in range(8):
+            for col in range(8):
+                if self.board[row][col][1] == "p":
+                    key ^= zobrist_pieces[self.board[row][col]][row * 8 + col]
+        return key
+
+    def setEvaluator(self, evaluator):
+        """
+        Attach an evaluation that follows every makeMove and undoMove (like ChessNNUE.NNUEEvaluator),
+        ChessAI.scoreBoard then uses it instead of the piece-square tables. None detaches it.
+        The evaluator needs refresh(board), makeMove(move), undoMove() and evaluate().
+        """
+        self.evaluator = evaluator
+        if evaluator is not None:
+            evaluator.refresh(self.board)
+
+    def enableMoveCache(self, size=MOVE_CACHE_SIZE):
+        """
+        Remember the legal moves of the last `size` positions seen by getValidMoves, 0 turns the cache off.
+        The cache is off by default, a full one takes tens of MB. The ChessAI searches enable it while they run.
+        """
+        self.move_cache = MoveCache(size) if size > 0 else None
+
+    def toFEN(self):
+        """
+        Return the FEN string of the current position.
+        """
+        halfmove_clock, fullmove_number = self.getClocks()
+        return f"{self.getPositionFEN()} {halfmove_clock} {fullmove_number}"
+
+    def getPositionFEN(self):
+        """
+        The first four fields of the FEN: the board, side to move, castling rights and en-passant square.
+        """
+        ranks = []
+        for row in self.board:
+            rank = ""
+            empty = 0
+            for square in row:
+                if square == "--":
+                    empty += 1
+                else:
+                    if empty:
+                        rank += str(empty)
+                        empty = 0
+                    char = piece_to_fen[square[1]]
+                    rank += char.upper() if square[0] == "w" else char
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        castling = ""
+        if self.current_castling_rights.wks:
+            castling += "K"
+        if self.current_castling_rights.wqs:
+            castling += "Q"
+        if self.current_castling_rights.bks:
+            castling += "k"
+        if self.current_castling_rights.bqs:
+            castling += "q"
+        if self.enpassant_possible == ():
+            enpassant = "-"
+        else:
+            enpassant = Move.cols_to_files[self.enpassant_possible[1]] + Move.rows_to_ranks[self.enpassant_possible[0]]
+        return " ".join(["/".join(ranks), "w" if self.white_to_move else "b", castling or "-", enpassant])
+
+    def getClocks(self):
+        """
+        The halfmove clock and fullmove number, counted from the start position and the moves played since.
+        """
+        start_fields = self.start_fen.split()
+        halfmove_clock = 0
+        for move in reversed(self.move_log):
+            if move.piece_moved[1] == "p" or move.is_capture:
+                break
+            halfmove_clock += 1
+        else:
+            halfmove_clock += int(start_fields[4])
+        plies = len(self.move_log) + (1 if start_fields[1] == "b" else 0)
+        fullmove_number = int(start_fields[5]) + plies // 2
+        return halfmove_clock, fullmove_number
+
+    def toSnapshot(self, buffer=None, offset=0):
+        """
+        Pack the position into snapshot_format.size bytes: the board, side to move, castling rights, en-passant
+        square, clocks and keys, but not the move log. Returns the bytes, or writes them into buffer at offset
+        (any writable buffer, like the shared memory of a SnapshotBuffer) if one is given.
+        Raises ValueError if a clock doesn't fit in its 16 bits.
+        """
+        board = bytes([snapshot_codes[square] for row in self.board for square in row])
+        flags = (not self.white_to_move) | self.current_castling_rights.getIndex() << 1
+        enpassant = self.enpassant_possible[0] * 8 + self.enpassant_possible[1] if self.enpassant_possible \
+            else NO_ENPASSANT
+        halfmove_clock, fullmove_number = self.getClocks()
+        if halfmove_clock > 0xFFFF or fullmove_number > 0xFFFF:
+            raise ValueError(f"Clocks {halfmove_clock} {fullmove_number} don't fit in a snapshot")
+        fields = (board, flags, enpassant, halfmove_clock, fullmove_number, self.position_key, self.pawn_key)
+        if buffer is None:
+            return snapshot_format.pack(*fields)
+        snapshot_format.pack_into(buffer, offset, *fields)
+
+    @classmethod
+    def fromSnapshot(cls, snapshot, offset=0, move_cache_size=0):
+        """
+        Create a game state from a snapshot written by toSnapshot, at offset in any buffer.
+        The move log starts empty, like after loadFEN. move_cache_size is passed to enableMoveCache.
+        """
+        board, flags, enpassant, halfmove_clock, fullmove_number, position_key, pawn_key = \
+            snapshot_format.unpack_from(snapshot, offset)
+        castling = flags >> 1
+        castling_rights = CastleRights(bool(castling & 1), bool(castling & 2), bool(castling & 4), bool(castling & 8))
+        game_state = cls.createUnset()
+        rows = [[SNAPSHOT_PIECES[code] for code in board[start:start + 8]] for start in range(0, 64, 8)]
+        game_state.setPosition(rows, not flags & 1, castling_rights,
+                               divmod(enpassant, 8) if enpassant != NO_ENPASSANT else (), None, position_key, pawn_key)
+        game_state.start_fen = f"{game_state.getPositionFEN()} {halfmove_clock} {fullmove_number}"  # needs the board
+        game_state.enableMoveCache(move_cache_size)
+        return game_state
 
     def makeMove(self, move):
         """
@@ -90,6 +358,45 @@ class GameState:
         self.castle_rights_log.append(CastleRights(self.current_castling_rights.wks, self.current_castling_rights.bks,
                                                    self.current_castling_rights.wqs, self.current_castling_rights.bqs))
 
+        # update the position key with just the squares and rights that changed
+        key = self.position_key ^ zobrist_black_to_move
+        key ^= zobrist_pieces[move.piece_moved][move.start_row * 8 + move.start_col]
+        key ^= zobrist_pieces[self.board[move.end_row][move.end_col]][move.end_row * 8 + move.end_col]
+        if move.is_enpassant_move:
+            key ^= zobrist_pieces[move.piece_captured][move.start_row * 8 + move.end_col]
+        elif move.piece_captured != "--":
+            key ^= zobrist_pieces[move.piece_captured][move.end_row * 8 + move.end_col]
+        if move.is_castle_move:
+            rook = move.piece_moved[0] + "R"
+            if move.end_col - move.start_col == 2:  # king-side
+                key ^= zobrist_pieces[rook][move.end_row * 8 + 7] ^ zobrist_pieces[rook][move.end_row * 8 + 5]
+            else:  # queen-side
+                key ^= zobrist_pieces[rook][move.end_row * 8] ^ zobrist_pieces[rook][move.end_row * 8 + 3]
+        key ^= zobrist_castling[self.castle_rights_log[-2].getIndex()]
+        key ^= zobrist_castling[self.castle_rights_log[-1].getIndex()]
+        previous_enpassant = self.enpassant_possible_log[-2]
+        if previous_enpassant != ():
+            key ^= zobrist_enpassant[previous_enpassant[1]]
+        if self.enpassant_possible != ():
+            key ^= zobrist_enpassant[self.enpassant_possible[1]]
+        self.position_key = key
+        self.position_key_log.append(key)
+
+        # the pawn key only changes when a pawn moves or is captured
+        pawn_key = self.pawn_key
+        if move.piece_moved[1] == "p":
+            pawn_key ^= zobrist_pieces[move.piece_moved][move.start_row * 8 + move.start_col]
+            if not move.is_pawn_promotion:
+                pawn_key ^= zobrist_pieces[move.piece_moved][move.end_row * 8 + move.end_col]
+        if move.is_enpassant_move:
+            pawn_key ^= zobrist_pieces[move.piece_captured][move.start_row * 8 + move.end_col]
+        elif move.piece_captured[1] == "p":
+            pawn_key ^= zobrist_pieces[move.piece_captured][move.end_row * 8 + move.end_col]
+        self.pawn_key = pawn_key
+        self.pawn_key_log.append(pawn_key)
+        if self.evaluator is not None:
+            self.evaluator.makeMove(move)
+
     def undoMove(self):
         """
         Undo the last move
@@ -114,8 +421,10 @@ class GameState:
 
             # undo castle rights
             self.castle_rights_log.pop()  # get rid of the new castle rights from the move we are undoing
-            self.current_castling_rights = self.castle_rights_log[
-                -1]  # set the current castle rights to the last one in the list
+            # set the current castle rights to a copy of the last one in the list, so the next move can't alter the log
+            last_castle_rights = self.castle_rights_log[-1]
+            self.current_castling_rights = CastleRights(last_castle_rights.wks, last_castle_rights.bks,
+                                                        last_castle_rights.wqs, last_castle_rights.bqs)
             # undo the castle move
             if move.is_castle_move:
                 if move.end_col - move.start_col == 2:  # king-side
@@ -124,58 +433,48 @@ class GameState:
                 else:  # queen-side
                     self.board[move.end_row][move.end_col - 2] = self.board[move.end_row][move.end_col + 1]
                     self.board[move.end_row][move.end_col + 1] = '--'
+            self.position_key_log.pop()
+            self.position_key = self.position_key_log[-1]
+            self.pawn_key_log.pop()
+            self.pawn_key = self.pawn_key_log[-1]
+            if self.evaluator is not None:
+                self.evaluator.undoMove()
             self.checkmate = False
             self.stalemate = False
 
-    def saveGame(self, filename="saved_game.pkl"):
+    def saveGame(self, filename=SAVE_FILE):
         """
-        Saves the current state of the game to a file.
+        Saves the current game to a file: the start position as a FEN line followed by one 16-bit code per move.
         """
         with open(filename, "wb") as file:
-            data = {
-                "board": self.board,
-                "white_to_move": self.white_to_move,
-                "move_log": self.move_log,
-                "white_king_location": self.white_king_location,
-                "black_king_location": self.black_king_location,
-                "checkmate": self.checkmate,
-                "stalemate": self.stalemate,
-                "in_check": self.in_check,
-                "pins": self.pins,
-                "checks": self.checks,
-                "enpassant_possible": self.enpassant_possible,
-                "enpassant_possible_log": self.enpassant_possible_log,
-                "current_castling_rights": self.current_castling_rights,
-                "castle_rights_log": self.castle_rights_log,
-            }
-            pickle.dump(data, file)
-
-    def loadGame(self, filename="saved_game.pkl"):
-        """
-        Loads the game state from a file.
+            file.write(self.start_fen.encode("ascii") + b"\n")
+            file.write(b"".join(move_code.pack(move.getMoveCode()) for move in self.move_log))
+
+    def loadGame(self, filename=SAVE_FILE):
+        """
+        Loads the game from a file written by saveGame or GameJournal, replaying every move through makeMove.
+        Returns True if a saved game was found.
         """
         try:
             with open(filename, "rb") as file:
-                data = pickle.load(file)
-                self.board = data["board"]
-                self.white_to_move = data["white_to_move"]
-                self.move_log = data["move_log"]
-                self.white_king_location = data["white_king_location"]
-                self.black_king_location = data["black_king_location"]
-                self.checkmate = data["checkmate"]
-                self.stalemate = data["stalemate"]
-                self.in_check = data["in_check"]
-                self.pins = data["pins"]
-                self.checks = data["checks"]
-                self.enpassant_possible = data["enpassant_possible"]
-                self.enpassant_possible_log = data["enpassant_possible_log"]
-                self.current_castling_rights = data["current_castling_rights"]
-                self.castle_rights_log = data["castle_rights_log"]
-            print(f"Game loaded from {filename}.")
+                self.loadFEN(file.readline().decode("ascii"))
+                data = file.read()
         except FileNotFoundError:
             print(f"No saved game found at {filename}.")
+            return False
+        for (code,) in move_code.iter_unpack(data[:len(data) - len(data) % move_code.size]):
+            if code == UNDO_CODE:
+                self.undoMove()
+                continue
+            for move in self.getValidMoves():
+                if move.getMoveCode() == code:
+                    self.makeMove(move)
+                    break
+            else:
+                raise ValueError(f"Illegal move code {code} in {filename}")
+        print(f"Game loaded from {filename}.")
+        return True
 
-    
     def updateCastleRights(self, move):
         """
         Update the castle rights given the move
@@ -212,7 +511,24 @@ class GameState:
 
     def getValidMoves(self):
         """
-        All moves considering checks.
+        All moves considering checks, as a MoveList.
+        Results are looked up in the move cache first, if it is enabled.
+        """
+        if self.move_cache is None:
+            return MoveList(self.generateValidMoves())
+        cached = self.move_cache.get(self.position_key)
+        if cached is not None:
+            moves, self.in_check, self.checkmate, self.stalemate, pins, checks = cached
+            self.pins, self.checks = list(pins), list(checks)  # as generateValidMoves leaves them
+            return MoveList(moves)  # callers are free to reorder their copy
+        moves = self.generateValidMoves()
+        self.move_cache.put(self.position_key, (list(moves), self.in_check, self.checkmate, self.stalemate,
+                                                tuple(self.pins), tuple(self.checks)))
+        return MoveList(moves)
+
+    def generateValidMoves(self):
+        """
+        Generate all moves considering checks.
         """
         temp_castle_rights = CastleRights(self.current_castling_rights.wks, self.current_castling_rights.bks,
                                           self.current_castling_rights.wqs, self.current_castling_rights.bqs)
@@ -295,6 +611,69 @@ class GameState:
                 return True
         return False
 
+    def staticExchange(self, move):
+        """
+        Static exchange evaluation: the material the side to move wins (negative if it loses) when the move
+        starts a sequence of captures on its end square, both sides recapturing with their least valuable
+        attacker and either side free to stop. Pieces behind a capturer (x-rays) join once it has captured.
+        Pins and checks are ignored.
+        """
+        row, col = move.end_row, move.end_col
+        piece_value = EXCHANGE_VALUES[move.piece_moved[1]]
+        gains = [EXCHANGE_VALUES[move.piece_captured[1]] if move.is_capture else 0]
+        if move.is_pawn_promotion:
+            gains[0] += EXCHANGE_VALUES["Q"] - piece_value
+            piece_value = EXCHANGE_VALUES["Q"]
+        removed = {(move.start_row, move.start_col)}  # squares whose piece has joined the exchange
+        color = "b" if move.piece_moved[0] == "w" else "w"
+        while True:
+            attacker = self.getLeastValuableAttacker(row, col, color, removed)
+            if attacker is None:
+                break
+            gains.append(piece_value - gains[-1])  # if the capturer is taken back next
+            removed.add(attacker)
+            piece_value = EXCHANGE_VALUES[self.board[attacker[0]][attacker[1]][1]]
+            color = "b" if color == "w" else "w"
+        while len(gains) > 1:  # each side only captures if it pays off, decided from the last capture back
+            last_gain = gains.pop()
+            gains[-1] = -max(-gains[-1], last_gain)
+        return gains[0]
+
+    def getLeastValuableAttacker(self, row, col, color, removed=()):
+        """
+        Square of the cheapest piece of the given color attacking row col, or None.
+        Squares in removed are treated as empty, which uncovers the sliders behind them.
+        """
+        attackers = []
+        pawn_row = row + 1 if color == "w" else row - 1
+        for end_col in (col - 1, col + 1):
+            if 0 <= pawn_row <= 7 and 0 <= end_col <= 7 and self.board[pawn_row][end_col] == color + "p" and \
+                    (pawn_row, end_col) not in removed:
+                return pawn_row, end_col
+        knight_moves = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2))
+        for d_row, d_col in knight_moves:
+            end_row, end_col = row + d_row, col + d_col
+            if 0 <= end_row <= 7 and 0 <= end_col <= 7 and self.board[end_row][end_col] == color + "N" and \
+                    (end_row, end_col) not in removed:
+                return end_row, end_col
+        directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+        for j, (d_row, d_col) in enumerate(directions):
+            for i in range(1, 8):
+                end_row, end_col = row + d_row * i, col + d_col * i
+                if not (0 <= end_row <= 7 and 0 <= end_col <= 7):
+                    break
+                end_piece = self.board[end_row][end_col]
+                if end_piece == "--" or (end_row, end_col) in removed:
+                    continue
+                if end_piece[0] == color and (end_piece[1] == "Q" or end_piece[1] == ("R" if j <= 3 else "B") or
+                                              (i == 1 and end_piece[1] == "K")):
+                    attackers.append((EXCHANGE_VALUES[end_piece[1]], end_row, end_col))
+                break
+        if not attackers:
+            return None
+        value, end_row, end_col = min(attackers)
+        return end_row, end_col
+
     def getAllPossibleMoves(self):
         """
         All moves without considering checks.
@@ -603,6 +982,189 @@ class GameState:
                 moves.append(Move((row, col), (row, col - 2), self.board, is_castle_move=True))
 
 
+def readFENFile(filename):
+    """
+    Lazily read positions from a FEN or EPD file, one per line.
+    Yields (game_state, operations) pairs, where operations is a dict of the EPD opcodes on the line
+    (e.g. {"bm": "Nf3", "id": "test 1"}). Blank lines and lines starting with '#' are skipped.
+    """
+    with open(filename) as file:
+        for line in file:
+            position = parseFENLine(line)
+            if position is not None:
+                yield GameState.fromFEN(position[0]), position[1]
+
+
+def parseFENLine(line):
+    """
+    Split a FEN or EPD line into the FEN string and a dict of its EPD opcodes.
+    Returns None for blank lines and comments.
+    """
+    fields = line.split(None, 4)
+    if len(fields) < 4 or fields[0].startswith("#"):
+        return None
+    fen = fields[:4]
+    rest = fields[4] if len(fields) > 4 else ""
+    clocks = rest.split(None, 2)
+    if len(clocks) >= 2 and clocks[0].isdigit() and clocks[1].isdigit():  # full FEN with move counters
+        fen += clocks[:2]
+        rest = clocks[2] if len(clocks) > 2 else ""
+    operations = {}
+    for opcode, operand in epd_operation.findall(rest):
+        operations[opcode] = operand.strip().strip('"')
+    return " ".join(fen), operations
+
+
+# random 64-bit numbers for Zobrist hashing, seeded so keys are the same in every process
+zobrist_random = random.Random(2024)
+zobrist_pieces = {color + piece: [zobrist_random.getrandbits(64) for _ in range(64)]
+                  for color in "wb" for piece in "pRNBQK"}
+zobrist_black_to_move = zobrist_random.getrandbits(64)
+zobrist_castling = [zobrist_random.getrandbits(64) for _ in range(16)]
+zobrist_enpassant = [zobrist_random.getrandbits(64) for _ in range(8)]
+
+snapshot_codes = {piece: code for code, piece in enumerate(SNAPSHOT_PIECES)}
+fen_to_piece = {"p": "p", "r": "R", "n": "N", "b": "B", "q": "Q", "k": "K"}
+piece_to_fen = {v: k for k, v in fen_to_piece.items()}
+epd_operation = re.compile(r'(\w+)\s*((?:"[^"]*"|[^;"])*);')
+
+
+class GameJournal:
+    """
+    Append-only autosave of a game in the saveGame format.
+    Every move or undo appends a single 16-bit code, so saving stays constant-time however long the game gets.
+    """
+
+    def __init__(self, filename=SAVE_FILE):
+        self.filename = filename
+        self.file = None
+
+    def start(self, game_state):
+        """
+        Write the game so far and keep the file open to append the following moves.
+        """
+        self.close()
+        game_state.saveGame(self.filename)
+        self.file = open(self.filename, "ab")
+
+    def recordMove(self, move):
+        self.append(move.getMoveCode())
+
+    def recordUndo(self):
+        self.append(UNDO_CODE)
+
+    def append(self, code):
+        if self.file is not None:
+            self.file.write(move_code.pack(code))
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class SnapshotBuffer:
+    """
+    Slots of GameState.toSnapshot records in shared memory, so worker processes read positions without pickling.
+    The owner creates it with a number of slots, workers attach to it by name.
+    """
+
+    def __init__(self, slots=None, name=None):
+        from multiprocessing import shared_memory  # not available everywhere, e.g. not in the web build
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=slots * snapshot_format.size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        self.slots = slots if slots is not None else self.memory.size // snapshot_format.size
+
+    def write(self, slot, game_state):
+        game_state.toSnapshot(self.memory.buf, slot * snapshot_format.size)
+
+    def writeSnapshot(self, slot, snapshot):
+        """
+        Copy a snapshot made earlier with toSnapshot into a slot.
+        """
+        start = slot * snapshot_format.size
+        self.memory.buf[start:start + snapshot_format.size] = snapshot
+
+    def read(self, slot):
+        return GameState.fromSnapshot(self.memory.buf, slot * snapshot_format.size)
+
+    def close(self):
+        self.memory.close()
+
+    def unlink(self):
+        """
+        Free the shared memory, called by the owner once no process uses it any more.
+        """
+        self.memory.unlink()
+
+
+class MoveCache:
+    """
+    Bounded least-recently-used table of getValidMoves results keyed by position key.
+    """
+
+    def __init__(self, size=MOVE_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)  # mark as most recently used
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)  # drop the least recently used position
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class MoveList(list):
+    """
+    A list of moves that can also look moves up by square.
+    The lookup tables are built the first time they are needed, so positions that never use them pay nothing.
+    Reordering the list is fine, adding or removing moves after a lookup is not.
+    """
+
+    def __init__(self, moves=()):
+        super().__init__(moves)
+        self.moves_from = None  # (row, col) -> moves starting there
+        self.moves_by_squares = None  # ((start row, start col), (end row, end col)) -> move
+
+    def movesFrom(self, row, col):
+        """
+        The moves of the piece on row col.
+        """
+        if self.moves_from is None:
+            self.moves_from = {}
+            for move in self:
+                self.moves_from.setdefault((move.start_row, move.start_col), []).append(move)
+        return self.moves_from.get((row, col), [])
+
+    def getMove(self, start_square, end_square):
+        """
+        The move from start_square to end_square, or None if there is no such move.
+        """
+        if self.moves_by_squares is None:
+            self.moves_by_squares = {((move.start_row, move.start_col), (move.end_row, move.end_col)): move
+                                     for move in self}
+        return self.moves_by_squares.get((tuple(start_square), tuple(end_square)))
+
+
 class CastleRights:
     def __init__(self, wks, bks, wqs, bqs):
         self.wks = wks
@@ -610,6 +1172,12 @@ class CastleRights:
         self.wqs = wqs
         self.bqs = bqs
 
+    def getIndex(self):
+        """
+        The four rights packed into a number from 0 to 15.
+        """
+        return self.wks | self.bks << 1 | self.wqs << 2 | self.bqs << 3
+
 
 class Move:
     # in chess, fields on the board are described by two symbols, one of them being number between 1-8 (which is corresponding to rows)
@@ -650,6 +1218,20 @@ class Move:
             return self.moveID == other.moveID
         return False
 
+    def getMoveCode(self):
+        """
+        16-bit code of the move: start square in the low 6 bits, end square in the next 6.
+        Promotion, castling and en-passant follow from the position, so they need no bits of their own.
+        """
+        return (self.start_row * 8 + self.start_col) | (self.end_row * 8 + self.end_col) << 6
+
+    def getUCINotation(self):
+        """
+        Long algebraic notation as used by UCI, e.g. e2e4 or e7e8q.
+        """
+        return self.getRankFile(self.start_row, self.start_col) + self.getRankFile(self.end_row, self.end_col) + \
+            ("q" if self.is_pawn_promotion else "")
+
     def getChessNotation(self):
         if self.is_pawn_promotion:
             return self.getRankFile(self.end_row, self.end_col) + "Q"
@@ -0,0 +1,245 @@
+"""
+A small neural network evaluation with an incrementally updated accumulator (NNUE style).
+The input is one feature per piece type and square (the ChessTensor planes), feeding a single clipped-ReLU
+hidden layer and a linear output in pawns, positive for white. The hidden layer before activation is kept
+as an accumulator that makeMove and undoMove update by adding and subtracting the weight rows of the few
+features a move changes, so a leaf evaluation is only the small output layer.
+
+Training on self-play games written by Tournament.py:
+    python ChessNNUE.py train match_results.jsonl -o nnue.npz
+Evaluations per second against ChessAI.scoreBoard:
+    python ChessNNUE.py bench --weights nnue.npz
+Using the weights in a search: game_state.setEvaluator(ChessNNUE.NNUEEvaluator(ChessNNUE.loadWeights("nnue.npz")))
+"""
+import argparse
+import json
+import math
+import random
+import time
+import numpy as np
+import ChessAI
+import ChessEngine
+import ChessTensor
+
+FEATURE_COUNT = 12 * 64
+HIDDEN_SIZE = 64
+RESULTS = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+SIGMOID_SCALE = math.log(10) / 4  # an advantage of 4 pawns means a 10:1 winning chance
+
+
+def featureIndex(piece, row, col):
+    return ChessTensor.PIECE_PLANES[piece] * 64 + row * 8 + col
+
+
+def createWeights(hidden_size=HIDDEN_SIZE, seed=None):
+    """
+    Random initial weights.
+    """
+    generator = np.random.default_rng(seed)
+    return {"w1": (generator.standard_normal((FEATURE_COUNT, hidden_size)) * 0.1).astype(np.float32),
+            "b1": np.full(hidden_size, 0.5, dtype=np.float32),
+            "w2": (generator.standard_normal(hidden_size) * 0.1).astype(np.float32),
+            "b2": np.zeros(1, dtype=np.float32)}
+
+
+def loadWeights(filename):
+    """
+    Load weights saved by saveWeights (a NumPy .npz file with arrays w1, b1, w2 and b2).
+    """
+    with np.load(filename) as data:
+        weights = {name: data[name].astype(np.float32) for name in ("w1", "b1", "w2", "b2")}
+    if weights["w1"].shape != (FEATURE_COUNT, len(weights["b1"])) or weights["w2"].shape != weights["b1"].shape:
+        raise ValueError("Invalid NNUE weights: " + filename)
+    return weights
+
+
+def saveWeights(weights, filename):
+    np.savez(filename, **weights)
+
+
+class NNUEEvaluator:
+    def __init__(self, weights):
+        self.w1 = weights["w1"]
+        self.b1 = weights["b1"]
+        self.w2 = weights["w2"]
+        self.b2 = float(weights["b2"][0])
+        self.accumulators = []  # one per ply of the move log, the last one belongs to the current position
+
+    def refresh(self, board):
+        """
+        Compute the accumulator of a position from scratch.
+        """
+        features = [featureIndex(piece, row, col) for row in range(8) for col in range(8)
+                    if (piece := board[row][col]) != "--"]
+        self.accumulators = [self.b1 + self.w1[features].sum(axis=0)]
+
+    def makeMove(self, move):
+        """
+        Update the accumulator for a move, called by GameState.makeMove.
+        """
+        accumulator = self.accumulators[-1].copy()
+        accumulator -= self.w1[featureIndex(move.piece_moved, move.start_row, move.start_col)]
+        placed = move.piece_moved[0] + "Q" if move.is_pawn_promotion else move.piece_moved
+        accumulator += self.w1[featureIndex(placed, move.end_row, move.end_col)]
+        if move.is_enpassant_move:
+            accumulator -= self.w1[featureIndex(move.piece_captured, move.start_row, move.end_col)]
+        elif move.is_capture:
+            accumulator -= self.w1[featureIndex(move.piece_captured, move.end_row, move.end_col)]
+        if move.is_castle_move:
+            rook = move.piece_moved[0] + "R"
+            if move.end_col - move.start_col == 2:  # king-side
+                rook_start, rook_end = 7, 5
+            else:  # queen-side
+                rook_start, rook_end = 0, 3
+            accumulator -= self.w1[featureIndex(rook, move.end_row, rook_start)]
+            accumulator += self.w1[featureIndex(rook, move.end_row, rook_end)]
+        self.accumulators.append(accumulator)
+
+    def undoMove(self):
+        """
+        Go back to the accumulator before the last move, called by GameState.undoMove.
+        """
+        self.accumulators.pop()
+
+    def evaluate(self):
+        """
+        Score of the current position in pawns, positive for white.
+        """
+        return float(np.clip(self.accumulators[-1], 0, 1) @ self.w2) + self.b2
+
+
+def readSelfPlayPositions(filename, skip_plies=4):
+    """
+    Replay the games of a Tournament.py results file. Returns (N, FEATURE_COUNT) features, the game results
+    from white's point of view and the ChessAI.scoreBoard score of every position.
+    The first skip_plies of every game are left out, they come from the opening list.
+    """
+    features, results, scores = [], [], []
+    with open(filename) as file:
+        for line in file:
+            game = json.loads(line)
+            game_state = ChessEngine.GameState.fromFEN(game["opening"])
+            for ply, notation in enumerate(game["moves"]):
+                move = next(move for move in game_state.getValidMoves() if move.getUCINotation() == notation)
+                game_state.makeMove(move)
+                if ply + 1 < skip_plies:
+                    continue
+                features.append(ChessTensor.encodeBoard(game_state).reshape(FEATURE_COUNT))
+                results.append(RESULTS[game["result"]])
+                scores.append(ChessAI.scoreBoard(game_state))
+    return np.array(features, dtype=np.float32), np.array(results, dtype=np.float32), \
+        np.clip(np.array(scores, dtype=np.float32), -20, 20)
+
+
+def sigmoid(values):
+    return 1 / (1 + np.exp(-SIGMOID_SCALE * values))
+
+
+def train(positions_file, output, epochs=30, batch_size=256, learning_rate=0.001, result_weight=0.5,
+          hidden_size=HIDDEN_SIZE, weights=None, seed=None):
+    """
+    Fit the network with Adam on the mean squared error between sigmoid(output) and a target mixing the game
+    result with sigmoid(scoreBoard), weighted by result_weight, then save the weights to output.
+    """
+    features, results, scores = readSelfPlayPositions(positions_file)
+    print(f"{len(features)} positions from {positions_file}")
+    if len(features) == 0:
+        return None
+    targets = result_weight * results + (1 - result_weight) * sigmoid(scores)
+    weights = weights or createWeights(hidden_size, seed)
+    first_moments = {name: np.zeros_like(array) for name, array in weights.items()}
+    second_moments = {name: np.zeros_like(array) for name, array in weights.items()}
+    generator = np.random.default_rng(seed)
+    step = 0
+    for epoch in range(1, epochs + 1):
+        order = generator.permutation(len(features))
+        epoch_loss = 0.0
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            inputs, batch_targets = features[batch], targets[batch]
+            hidden = inputs @ weights["w1"] + weights["b1"]
+            activations = np.clip(hidden, 0, 1)
+            predictions = sigmoid(activations @ weights["w2"] + weights["b2"][0])
+            errors = predictions - batch_targets
+            epoch_loss += float(np.sum(errors ** 2))
+            # backpropagation of the mean squared error
+            output_gradient = 2 * errors * predictions * (1 - predictions) * SIGMOID_SCALE / len(batch)
+            hidden_gradient = np.outer(output_gradient, weights["w2"]) * ((hidden > 0) & (hidden < 1))
+            gradients = {"w1": inputs.T @ hidden_gradient, "b1": hidden_gradient.sum(axis=0),
+                         "w2": activations.T @ output_gradient, "b2": np.array([output_gradient.sum()])}
+            step += 1
+            for name, gradient in gradients.items():
+                first_moments[name] = 0.9 * first_moments[name] + 0.1 * gradient
+                second_moments[name] = 0.999 * second_moments[name] + 0.001 * gradient ** 2
+                update = first_moments[name] / (1 - 0.9 ** step) / \
+                    (np.sqrt(second_moments[name] / (1 - 0.999 ** step)) + 1e-8)
+                weights[name] = (weights[name] - learning_rate * update).astype(np.float32)
+        if epoch % 5 == 0 or epoch == 1:
+            print(f"epoch {epoch}: error {epoch_loss / len(features):.6f}")
+    saveWeights(weights, output)
+    print(f"NNUE weights saved to {output}")
+    return weights
+
+
+def benchmark(weights, games=20, plies=60, seed=1):
+    """
+    Compare evaluations per second of the network, including the incremental updates of makeMove and undoMove,
+    against ChessAI.scoreBoard, on the leaves of random games.
+    """
+    random.seed(seed)
+    game_states = []
+    for game in range(games):
+        game_state = ChessEngine.GameState()
+        for ply in range(plies):
+            valid_moves = game_state.getValidMoves()
+            if not valid_moves:
+                break
+            game_state.makeMove(random.choice(valid_moves))
+        game_state.getValidMoves()
+        game_states.append(game_state)
+
+    evaluations = 0
+    start_time = time.perf_counter()
+    for game_state in game_states:
+        for move in game_state.getValidMoves():
+            game_state.makeMove(move)
+            ChessAI.scoreBoard(game_state)
+            game_state.undoMove()
+            evaluations += 1
+    board_rate = evaluations / (time.perf_counter() - start_time)
+
+    for game_state in game_states:
+        game_state.setEvaluator(NNUEEvaluator(weights))
+    start_time = time.perf_counter()
+    for game_state in game_states:
+        for move in game_state.getValidMoves():
+            game_state.makeMove(move)
+            ChessAI.scoreBoard(game_state)
+            game_state.undoMove()
+    network_rate = evaluations / (time.perf_counter() - start_time)
+    print(f"scoreBoard: {board_rate:,.0f} evaluations/s (with makeMove and undoMove)")
+    print(f"NNUE:       {network_rate:,.0f} evaluations/s (with incremental updates)")
+    return board_rate, network_rate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train or benchmark the NNUE evaluation.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train_parser = commands.add_parser("train", help="train on self-play games from Tournament.py")
+    train_parser.add_argument("games", help="JSON lines results file of Tournament.py")
+    train_parser.add_argument("-o", "--output", default="nnue.npz")
+    train_parser.add_argument("--epochs", type=int, default=30)
+    train_parser.add_argument("--batch-size", type=int, default=256)
+    train_parser.add_argument("--learning-rate", type=float, default=0.001)
+    train_parser.add_argument("--result-weight", type=float, default=0.5,
+                              help="share of the game result in the target, the rest is scoreBoard")
+    train_parser.add_argument("--hidden-size", type=int, default=HIDDEN_SIZE)
+    train_parser.add_argument("--weights", default=None, help="continue training from saved weights")
+    bench_parser = commands.add_parser("bench", help="evaluations per second against ChessAI.scoreBoard")
+    bench_parser.add_argument("--weights", default=None, help="random weights if omitted")
+    args = parser.parse_args()
+    if args.command == "train":
+        train(args.games, args.output, args.epochs, args.batch_size, args.learning_rate, args.result_weight,
+              args.hidden_size, loadWeights(args.weights) if args.weights else None)
+    else:
+        benchmark(loadWeights(args.weights) if args.weights else createWeights(seed=0))
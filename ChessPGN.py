@@ -0,0 +1,174 @@
+"""
+Reading and writing PGN files and standard algebraic notation (SAN).
+"""
+import re
+import ChessEngine
+
+san_pattern = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([QRBN]))?$")
+header_pattern = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+
+def readPGN(lines):
+    """
+    Lazily read games from PGN text (an open file or any iterable of lines).
+    Yields (headers, moves) pairs, where moves is the list of SAN moves of the main line.
+    """
+    headers = {}
+    movetext = []
+    for line in lines:
+        line = line.strip()
+        match = header_pattern.match(line)
+        if match:
+            if movetext:  # a header after movetext starts the next game
+                yield headers, parseMovetext(" ".join(movetext))
+                headers, movetext = {}, []
+            headers[match.group(1)] = match.group(2)
+        elif line and not line.startswith("%"):
+            # a ";" comment runs to the end of its line, so it is stripped before the lines are joined
+            line = re.sub(r"(\{[^}]*\}?)|;.*", lambda comment: comment.group(1) or "", line).rstrip()
+            if not line:
+                continue
+            movetext.append(line)
+            if line.split()[-1] in RESULTS:
+                yield headers, parseMovetext(" ".join(movetext))
+                headers, movetext = {}, []
+    if movetext or headers:
+        yield headers, parseMovetext(" ".join(movetext))
+
+
+def parseMovetext(text):
+    """
+    Strip comments, variations, move numbers, annotations and the result, leaving the SAN moves.
+    ";" comments are left to readPGN, which removes them line by line.
+    """
+    text = re.sub(r"\{[^}]*\}", " ", text)
+    while "(" in text:  # remove variations from the innermost out
+        stripped = re.sub(r"\([^()]*\)", " ", text)
+        if stripped == text:
+            break
+        text = stripped
+    moves = []
+    for token in text.split():
+        token = re.sub(r"^\d+\.+", "", token)  # move numbers, also when glued to the move like 1.e4
+        if token and token not in RESULTS and not token.startswith("$"):
+            moves.append(token)
+    return moves
+
+
+def parseSAN(game_state, san):
+    """
+    Find the valid move of the position that a SAN string like "Nbd7", "exd5", "e8=Q+" or "O-O" describes.
+    Returns None if there is no such move. The engine always promotes to a queen, so an underpromotion like
+    "e8=N" has no move either.
+    """
+    san = san.rstrip("+#!?")
+    valid_moves = game_state.getValidMoves()
+    if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        king_side = san in ("O-O", "0-0")
+        for move in valid_moves:
+            if move.is_castle_move and (move.end_col > move.start_col) == king_side:
+                return move
+        return None
+    match = san_pattern.match(san)
+    if match is None:
+        return None
+    piece, from_file, from_rank, target = match.group(1) or "p", match.group(2), match.group(3), match.group(4)
+    if match.group(5) not in (None, "Q"):
+        return None
+    end_row, end_col = ChessEngine.Move.ranks_to_rows[target[1]], ChessEngine.Move.files_to_cols[target[0]]
+    for move in valid_moves:
+        if move.piece_moved[1] == piece and move.end_row == end_row and move.end_col == end_col and \
+                (from_file is None or move.start_col == ChessEngine.Move.files_to_cols[from_file]) and \
+                (from_rank is None or move.start_row == ChessEngine.Move.ranks_to_rows[from_rank]):
+            return move
+    return None
+
+
+def getSAN(game_state, move):
+    """
+    The SAN of a valid move in the position before it is made, e.g. "Nbd7", "exd5", "e8=Q+" or "O-O".
+    """
+    if move.is_castle_move:
+        san = "O-O" if move.end_col > move.start_col else "O-O-O"
+    else:
+        end_square = move.getRankFile(move.end_row, move.end_col)
+        if move.piece_moved[1] == "p":
+            san = (move.cols_to_files[move.start_col] + "x" if move.is_capture else "") + end_square
+            if move.is_pawn_promotion:
+                san += "=Q"
+        else:
+            # name the starting file, rank or both if another piece of the same kind can move there too
+            others = [other for other in game_state.getValidMoves() if other.piece_moved == move.piece_moved and
+                      other.end_row == move.end_row and other.end_col == move.end_col and
+                      (other.start_row, other.start_col) != (move.start_row, move.start_col)]
+            disambiguation = ""
+            if others:
+                if all(other.start_col != move.start_col for other in others):
+                    disambiguation = move.cols_to_files[move.start_col]
+                elif all(other.start_row != move.start_row for other in others):
+                    disambiguation = move.rows_to_ranks[move.start_row]
+                else:
+                    disambiguation = move.getRankFile(move.start_row, move.start_col)
+            san = move.piece_moved[1] + disambiguation + ("x" if move.is_capture else "") + end_square
+    game_state.makeMove(move)
+    game_state.getValidMoves()
+    if game_state.checkmate:
+        san += "#"
+    elif game_state.in_check:
+        san += "+"
+    game_state.undoMove()
+    return san
+
+
+def writePGN(file, headers, moves, result="*", comments=None):
+    """
+    Write one game to a PGN file: the headers (a dict, the Seven Tag Roster first if present), the SAN moves
+    and the result. comments can hold a comment for every move, written after it in braces.
+    """
+    for tag in ("Event", "Site", "Date", "Round", "White", "Black"):
+        if tag in headers:
+            file.write(f'[{tag} "{headers[tag]}"]\n')
+    file.write(f'[Result "{result}"]\n')
+    for tag, value in headers.items():
+        if tag not in ("Event", "Site", "Date", "Round", "White", "Black", "Result"):
+            file.write(f'[{tag} "{value}"]\n')
+    file.write("\n")
+    start = ChessEngine.GameState.fromFEN(headers.get("FEN", ChessEngine.START_FEN))
+    black_first = not start.white_to_move
+    first_move = start.getClocks()[1]  # 1 if the FEN leaves out the clocks
+    tokens = []
+    for ply, san in enumerate(moves):
+        move_number = first_move + (ply + black_first) // 2
+        if (ply + black_first) % 2 == 0:
+            tokens.append(f"{move_number}. {san}")
+        elif ply == 0 or (comments and comments[ply - 1]):
+            tokens.append(f"{move_number}... {san}")
+        else:
+            tokens.append(san)
+        if comments and comments[ply]:
+            tokens.append("{" + comments[ply] + "}")
+    tokens.append(result)
+    line = ""
+    for token in tokens:  # lines of at most 80 characters
+        if line and len(line) + 1 + len(token) > 80:
+            file.write(line + "\n")
+            line = token
+        else:
+            line = line + " " + token if line else token
+    file.write(line + "\n\n")
+
+
+def readPGNPositions(lines):
+    """
+    Lazily replay every game of a PGN and yield (game number, ply, fen, move played) for each position,
+    the move played being the SAN from the file. A game stops at its first illegal move.
+    """
+    for game_number, (headers, moves) in enumerate(readPGN(lines)):
+        game_state = ChessEngine.GameState.fromFEN(headers.get("FEN", ChessEngine.START_FEN))
+        for ply, san in enumerate(moves):
+            move = parseSAN(game_state, san)
+            if move is None:
+                break
+            yield game_number, ply, game_state.toFEN(), san
+            game_state.makeMove(move)
@@ -0,0 +1,188 @@
+"""
+Dense NumPy encodings of GameState positions.
+Scoring many positions at once against the ChessAI piece-square tables.
+Attack maps, mobility and check status of many positions at once.
+"""
+import random
+import numpy as np
+import ChessAI
+import ChessEngine
+
+PIECES = ["wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK"]
+PIECE_PLANES = {piece: plane for plane, piece in enumerate(PIECES)}
+PIECE_CODES = {piece: plane + 1 for piece, plane in PIECE_PLANES.items()}  # 0 is an empty square
+PIECE_CODES["--"] = 0
+
+KNIGHT_DIRECTIONS = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2))
+KING_DIRECTIONS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+ROOK_DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, 1), (1, -1))
+
+
+def encodeBoard(game_state):
+    """
+    Encode the board as a (12, 8, 8) array with a 1 wherever a piece of that plane's type stands.
+    Planes follow PIECES: white pawn, knight, bishop, rook, queen, king, then the same for black.
+    """
+    planes = np.zeros((12, 8, 8), dtype=np.uint8)
+    for row in range(8):
+        for col in range(8):
+            piece = game_state.board[row][col]
+            if piece != "--":
+                planes[PIECE_PLANES[piece], row, col] = 1
+    return planes
+
+
+def encodeBoards(game_states):
+    """
+    Encode any number of game states as a (N, 12, 64) array, 768 bytes per position.
+    """
+    return np.array([encodeBoard(game_state).reshape(12, 64) for game_state in game_states], dtype=np.uint8)
+
+
+def pieceSquareTables():
+    """
+    Stack the material values and piece-square tables of ChessAI into a (12, 64) weight array,
+    with black planes negated so a position's score is simply the sum of its weighted planes.
+    """
+    tables = np.zeros((12, 64), dtype=np.float64)
+    for piece, plane in PIECE_PLANES.items():
+        tables[plane] = ChessAI.piece_score[piece[1]]
+        if piece in ChessAI.piece_position_scores:
+            tables[plane] += np.array(ChessAI.piece_position_scores[piece], dtype=np.float64).reshape(64)
+        if piece[0] == "b":
+            tables[plane] = -tables[plane]
+    return tables
+
+
+def scoreBoards(boards, tables=None):
+    """
+    Score a batch of encoded boards, (N, 12, 64) or (N, 12, 8, 8), in a single dot product.
+    Gives the material and piece-square part of ChessAI.scoreBoard: positive is good for white.
+    Checkmate and stalemate are not detected, use ChessAI.scoreBoard for those.
+    """
+    if tables is None:
+        tables = pieceSquareTables()
+    boards = np.asarray(boards)
+    return boards.reshape(len(boards), 12 * 64) @ tables.reshape(12 * 64)
+
+
+def encodeSquares(game_states):
+    """
+    Encode any number of game states as a (N, 64) array of PIECE_CODES, square 0 being a8 and 63 being h1.
+    """
+    return np.array([[PIECE_CODES[piece] for row in game_state.board for piece in row] for game_state in game_states],
+                    dtype=np.int8)
+
+
+def shift(masks, d_row, d_col):
+    """
+    Move every square of a (N, 8, 8) mask by d_row, d_col, dropping whatever falls off the board.
+    """
+    shifted = np.zeros_like(masks)
+    shifted[:, max(d_row, 0):8 + min(d_row, 0), max(d_col, 0):8 + min(d_col, 0)] = \
+        masks[:, max(-d_row, 0):8 + min(-d_row, 0), max(-d_col, 0):8 + min(-d_col, 0)]
+    return shifted
+
+
+def computeAttacks(squares):
+    """
+    Compute attack maps, mobility and check status for a (N, 64) array of PIECE_CODES using board shifts only.
+    Returns:
+    attacks - (N, 2, 64) bool, squares attacked (or defended) by white [:, 0] and black [:, 1]
+    mobility - (N, 64) number of pseudo-legal moves of the piece on each square (en-passant and castling not counted)
+    in_check - (N, 2) bool, whether the white and the black king are attacked
+    Memory use peaks at about 1 KB per position (the board masks and the results), so feed millions of positions
+    in chunks.
+    """
+    boards = np.asarray(squares).reshape(-1, 8, 8)
+    empty = boards == 0
+    attacks = np.zeros((len(boards), 2, 8, 8), dtype=bool)
+    mobility = np.zeros((len(boards), 8, 8), dtype=np.uint8)
+    in_check = np.zeros((len(boards), 2), dtype=bool)
+    for side, color in enumerate("wb"):
+        own = (boards >= PIECE_CODES[color + "p"]) & (boards <= PIECE_CODES[color + "K"])
+        enemy = ~empty & ~own
+        attacked = attacks[:, side]
+
+        # pawns attack diagonally forward, but only move straight ahead
+        forward = -1 if color == "w" else 1
+        pawns = boards == PIECE_CODES[color + "p"]
+        for d_col in (-1, 1):
+            targets = shift(pawns, forward, d_col)
+            attacked |= targets
+            mobility += shift(targets & enemy, -forward, -d_col)
+        single_push = shift(pawns, forward, 0) & empty
+        mobility += shift(single_push, -forward, 0)
+        start_row = 6 if color == "w" else 1
+        double_push = shift(single_push & (np.arange(8) == start_row + forward)[:, None], forward, 0) & empty
+        mobility += shift(double_push, -2 * forward, 0)
+
+        # knights and kings jump to a fixed set of squares
+        for piece, directions in (("N", KNIGHT_DIRECTIONS), ("K", KING_DIRECTIONS)):
+            pieces = boards == PIECE_CODES[color + piece]
+            for d_row, d_col in directions:
+                targets = shift(pieces, d_row, d_col)
+                attacked |= targets
+                mobility += shift(targets & ~own, -d_row, -d_col)
+
+        # sliding pieces: push a ray one square at a time until it hits an occupied square
+        queens = boards == PIECE_CODES[color + "Q"]
+        for piece, directions in (("R", ROOK_DIRECTIONS), ("B", BISHOP_DIRECTIONS)):
+            sliders = (boards == PIECE_CODES[color + piece]) | queens
+            for d_row, d_col in directions:
+                ray = sliders
+                for distance in range(1, 8):
+                    ray = shift(ray, d_row, d_col)
+                    if not ray.any():
+                        break
+                    attacked |= ray
+                    mobility += shift(ray & ~own, -distance * d_row, -distance * d_col)
+                    ray = ray & empty
+
+    for side, color in enumerate("wb"):
+        king = boards == PIECE_CODES[color + "K"]
+        in_check[:, side] = (king & attacks[:, 1 - side]).any(axis=(1, 2))
+    return attacks.reshape(-1, 2, 64), mobility.reshape(-1, 64), in_check
+
+
+def crossCheck(game_states):
+    """
+    Compare computeAttacks against the scalar move generators of GameState for both colors.
+    Returns the number of positions where check status or the mobility of a non-king piece disagree.
+    """
+    game_states = list(game_states)
+    squares = encodeSquares(game_states)
+    attacks, mobility, in_check = computeAttacks(squares)
+    mismatches = 0
+    for index, game_state in enumerate(game_states):
+        expected_mobility = np.zeros(64, dtype=np.uint8)
+        expected_check = [False, False]
+        for side, white_to_move in enumerate((True, False)):
+            saved_turn = game_state.white_to_move
+            game_state.white_to_move = white_to_move
+            game_state.pins = []
+            expected_check[side] = game_state.checkForPinsAndChecks()[0]
+            for move in game_state.getAllPossibleMoves():
+                if move.piece_moved[1] != "K" and not move.is_enpassant_move:
+                    expected_mobility[move.start_row * 8 + move.start_col] += 1
+            game_state.white_to_move = saved_turn
+        not_king = (squares[index] != PIECE_CODES["wK"]) & (squares[index] != PIECE_CODES["bK"])
+        if list(in_check[index]) != expected_check or \
+                (mobility[index][not_king] != expected_mobility[not_king]).any():
+            mismatches += 1
+    return mismatches
+
+
+if __name__ == "__main__":
+    # cross-check on positions from random games
+    positions = []
+    for game in range(200):
+        game_state = ChessEngine.GameState()
+        for ply in range(random.randint(0, 100)):
+            valid_moves = game_state.getValidMoves()
+            if not valid_moves:
+                break
+            game_state.makeMove(random.choice(valid_moves))
+        positions.append(game_state)
+    print(f"{crossCheck(positions)} mismatches in {len(positions)} positions")
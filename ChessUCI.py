@@ -0,0 +1,216 @@
+"""
+UCI protocol driver around GameState and ChessAI, for running the engine under match tools and chess GUIs.
+Commands are read from stdin on their own thread while the search runs on another, so "stop" takes effect at once.
+
+Usage: python ChessUCI.py
+"""
+import sys
+import threading
+import time
+from queue import Queue
+import ChessAI
+import ChessEngine
+
+ENGINE_NAME = "Nhom14Chess"
+ENGINE_AUTHOR = "Nhom 14"
+MAX_DEPTH = 64  # depth limit when the search is bounded by time only
+MOVE_CACHE_ENTRY_BYTES = 6500  # rough memory taken by one cached move list
+DEFAULT_HASH = 32  # MB
+MOVES_TO_GO = 30  # moves the remaining clock time is shared over when the GUI doesn't say
+TIME_MARGIN = 0.05  # seconds kept in reserve for communication
+
+
+class UCIEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.hash_size = DEFAULT_HASH
+        self.threads = 1
+        self.multi_pv = 1
+        self.game_state = self.newGameState()
+        self.search_thread = None
+        self.stop_event = threading.Event()
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def newGameState(self):
+        game_state = ChessEngine.GameState()
+        game_state.enableMoveCache(self.hash_size * 1024 * 1024 // MOVE_CACHE_ENTRY_BYTES)
+        return game_state
+
+    def handle(self, line):
+        """
+        Execute one command. Returns False once the engine should quit.
+        A malformed command is reported as an info string and otherwise ignored.
+        """
+        words = line.split()
+        if not words:
+            return True
+        try:
+            return self.handleCommand(words)
+        except ValueError as error:
+            self.send(f"info string error in '{line.strip()}': {error}")
+            return True
+
+    def handleCommand(self, words):
+        command = words[0]
+        if command == "uci":
+            self.send("id name " + ENGINE_NAME)
+            self.send("id author " + ENGINE_AUTHOR)
+            self.send(f"option name Hash type spin default {DEFAULT_HASH} min 1 max 4096")
+            self.send("option name Threads type spin default 1 min 1 max 1")
+            self.send("option name MultiPV type spin default 1 min 1 max 64")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.setOption(words)
+        elif command == "ucinewgame":
+            self.stopSearch()
+            self.game_state = self.newGameState()
+        elif command == "position":
+            self.stopSearch()
+            self.setPosition(words)
+        elif command == "go":
+            self.stopSearch()
+            self.startSearch(words)
+        elif command == "stop":
+            self.stopSearch()
+        elif command == "quit":
+            self.stopSearch()
+            return False
+        return True
+
+    def setOption(self, words):
+        """
+        setoption name <name> value <value>
+        """
+        if "name" not in words:
+            return
+        name_end = words.index("value") if "value" in words else len(words)
+        name = " ".join(words[words.index("name") + 1:name_end]).lower()
+        value = " ".join(words[name_end + 1:])
+        if name == "hash":
+            self.hash_size = max(1, int(value))
+            self.game_state.enableMoveCache(self.hash_size * 1024 * 1024 // MOVE_CACHE_ENTRY_BYTES)
+        elif name == "threads":
+            self.threads = max(1, int(value))  # accepted for compatibility, the search runs on one thread
+        elif name == "multipv":
+            self.multi_pv = max(1, int(value))
+
+    def setPosition(self, words):
+        """
+        position startpos [moves ...] or position fen <fen> [moves ...]
+        Raises ValueError for an invalid FEN, which leaves the position as it was. The engine always promotes
+        to a queen, so an underpromotion like e7e8n is rejected as an illegal move.
+        """
+        moves_index = words.index("moves") if "moves" in words else len(words)
+        if len(words) > 1 and words[1] == "fen":
+            self.game_state.loadFEN(" ".join(words[2:moves_index]))
+        elif len(words) > 1 and words[1] == "startpos":
+            self.game_state.loadFEN(ChessEngine.START_FEN)
+        else:
+            raise ValueError("expected startpos or fen")
+        for notation in words[moves_index + 1:]:
+            for move in self.game_state.getValidMoves():
+                if move.getUCINotation() == notation.lower():
+                    self.game_state.makeMove(move)
+                    break
+            else:
+                self.send("info string illegal move " + notation)
+                return
+
+    def startSearch(self, words):
+        """
+        go [depth N] [movetime MS] [wtime MS btime MS winc MS binc MS movestogo N] [nodes N] [infinite]
+        """
+        limits = {}
+        for index, word in enumerate(words[:-1]):
+            if word in ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo", "nodes"):
+                limits[word] = int(words[index + 1])
+        infinite = "infinite" in words
+        budget = None
+        if "movetime" in limits:
+            budget = limits["movetime"] / 1000
+        elif not infinite and ("wtime" in limits or "btime" in limits):
+            clock, increment = ("wtime", "winc") if self.game_state.white_to_move else ("btime", "binc")
+            time_left = limits.get(clock, 0) / 1000
+            budget = time_left / limits.get("movestogo", MOVES_TO_GO) + limits.get(increment, 0) / 1000 * 0.8
+            budget = min(budget, time_left / 2)
+        if budget is not None:
+            budget = max(budget - TIME_MARGIN, 0.01)
+        max_depth = limits.get("depth", MAX_DEPTH)
+        if not infinite and budget is None and "depth" not in limits and "nodes" not in limits:
+            max_depth = ChessAI.DEPTH  # a bare "go" searches like the game does
+        self.stop_event.clear()
+        self.search_thread = threading.Thread(target=self.search,
+                                              args=(max_depth, budget, limits.get("nodes"), infinite), daemon=True)
+        self.search_thread.start()
+
+    def search(self, max_depth, budget, node_limit, infinite):
+        start_time = time.perf_counter()
+        deadline = start_time + budget if budget is not None else None
+
+        def shouldStop():
+            return self.stop_event.is_set() or (deadline is not None and time.perf_counter() >= deadline) or \
+                (node_limit is not None and ChessAI.nodes_searched >= node_limit)
+
+        def reportIteration(depth, score, principal_variation, line_number=None):
+            elapsed = time.perf_counter() - start_time
+            nodes = ChessAI.nodes_searched
+            mate_moves = ChessAI.getMateMoves(score)
+            if mate_moves is not None:
+                score_text = f"mate {mate_moves}"
+            else:
+                score_text = f"cp {round(score * 100)}"
+            multi_pv_text = f" multipv {line_number}" if line_number is not None else ""
+            self.send(f"info depth {depth}{multi_pv_text} score {score_text} nodes {nodes} "
+                      f"nps {int(nodes / max(elapsed, 1e-6))} time {int(elapsed * 1000)} pv " +
+                      " ".join(move.getUCINotation() for move in principal_variation))
+
+        def reportLines(depth, lines):
+            for line_number, (move, score, principal_variation) in enumerate(lines, 1):
+                reportIteration(depth, score, principal_variation, line_number)
+
+        valid_moves = self.game_state.getValidMoves()
+        if self.multi_pv > 1:
+            lines = ChessAI.findBestMoves(self.game_state, valid_moves, self.multi_pv, max_depth, shouldStop,
+                                          reportLines)
+            best_move = lines[0][0] if lines else (valid_moves[0] if valid_moves else None)
+        else:
+            best_move = ChessAI.findBestMoveIterative(self.game_state, valid_moves, max_depth, shouldStop,
+                                                      reportIteration)[0]
+        statistics = ChessAI.getSearchStatistics()
+        self.send(f"info string pawn hash hits {statistics['pawn_hash_hits']} misses "
+                  f"{statistics['pawn_hash_misses']} ({statistics['pawn_hash_hit_rate']:.1%})")
+        if infinite:
+            self.stop_event.wait()  # UCI: bestmove is only sent after "stop" in infinite mode
+        self.send("bestmove " + (best_move.getUCINotation() if best_move is not None else "0000"))
+
+    def stopSearch(self):
+        if self.search_thread is not None:
+            self.stop_event.set()
+            self.search_thread.join()
+            self.search_thread = None
+
+    def run(self, input_stream=sys.stdin):
+        """
+        Read commands on a separate thread, so a running search never delays "stop" or "isready".
+        """
+        commands = Queue()
+
+        def readInput():
+            for line in input_stream:
+                commands.put(line)
+            commands.put("quit")
+
+        threading.Thread(target=readInput, daemon=True).start()
+        while self.handle(commands.get()):
+            pass
+
+
+if __name__ == "__main__":
+    UCIEngine().run()
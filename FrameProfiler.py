@@ -0,0 +1,163 @@
+"""
+Opt-in timing of the main loop.
+Every frame is split into sections by calling lap(name) at the end of each part of the loop, which records the
+time since the previous lap. The last ROLLING_FRAMES frames of every section are kept for percentiles, shown by
+an overlay in the corner of the board (toggled with F3) and printed when the game closes. Every AI move is
+reported with its search time and nodes per second. Optionally the first frames are captured with cProfile and
+written to a file for `python -m pstats`.
+
+Usage: python main.py --stats [--profile-frames 300 --profile-output frames.prof]
+"""
+import cProfile
+import time
+from collections import deque
+import pygame as p
+
+ROLLING_FRAMES = 120  # frames in the percentiles
+OVERLAY_POSITION = (4, 4)
+OVERLAY_INTERVAL = 1.0  # seconds between overlay refreshes, so the overlay alone never keeps the loop awake
+
+
+def getPercentile(values, percentile):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * percentile / 100), len(ordered) - 1)]
+
+
+class FrameProfiler:
+    def __init__(self, enabled=False, profile_frames=0, profile_output="frames.prof"):
+        self.enabled = enabled or profile_frames > 0
+        self.overlay = False
+        self.sections = {}  # name -> the last ROLLING_FRAMES durations in ms, in the order first seen
+        self.frame_times = deque(maxlen=ROLLING_FRAMES)
+        self.searches = deque(maxlen=ROLLING_FRAMES)  # (ms, nodes per second) of the last AI moves
+        self.frame_start = self.lap_start = 0.0
+        self.frame_laps = {}
+        self.profile = cProfile.Profile() if profile_frames > 0 else None
+        self.profile_frames = profile_frames
+        self.profile_output = profile_output
+        self.font = None
+        self.overlay_rect = None  # where the overlay was last drawn
+        self.overlay_time = 0.0  # when the overlay was last drawn
+
+    def startFrame(self):
+        if not self.enabled:
+            return
+        self.frame_start = self.lap_start = time.perf_counter()
+        self.frame_laps = {}
+        if self.profile is not None:
+            self.profile.enable()
+
+    def lap(self, name):
+        """
+        End the section called name, which began at the previous lap or the start of the frame.
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.frame_laps[name] = self.frame_laps.get(name, 0.0) + (now - self.lap_start) * 1000
+        self.lap_start = now
+
+    def endFrame(self):
+        """
+        Record the frame, before the main loop sleeps until the next one.
+        """
+        if not self.enabled:
+            return
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile_frames -= 1
+            if self.profile_frames == 0:
+                self.dumpProfile()
+        for name, milliseconds in self.frame_laps.items():
+            self.sections.setdefault(name, deque(maxlen=ROLLING_FRAMES)).append(milliseconds)
+        self.frame_times.append((time.perf_counter() - self.frame_start) * 1000)
+
+    def recordSearch(self, seconds, nodes, move):
+        """
+        Report an AI move with its search time and nodes per second.
+        """
+        if not self.enabled:
+            return
+        nodes_per_second = nodes / seconds if seconds > 0 else 0
+        self.searches.append((seconds * 1000, nodes_per_second))
+        print(f"AI {move.getUCINotation()}: {seconds * 1000:.0f} ms, {nodes} nodes, {nodes_per_second:,.0f} nodes/s")
+
+    def dumpProfile(self):
+        self.profile.dump_stats(self.profile_output)
+        print(f"Profile of the first frames written to {self.profile_output}")
+        self.profile = None
+
+    def toggleOverlay(self):
+        self.overlay = not self.overlay
+        self.enabled = True
+        self.overlay_time = 0.0  # draw it right away when it is turned on
+
+    def needsOverlay(self, dirty_rects):
+        """
+        Whether the overlay is on and due for a refresh, or was drawn over by one of dirty_rects.
+        """
+        if not self.overlay:
+            return False
+        if time.perf_counter() - self.overlay_time >= OVERLAY_INTERVAL or self.overlay_rect is None:
+            return True
+        return self.overlay_rect.collidelist(dirty_rects) != -1
+
+    def getOverlayTimeout(self):
+        """
+        Seconds until the overlay is due for a refresh, or None if it is off.
+        """
+        if not self.overlay:
+            return None
+        return max(OVERLAY_INTERVAL - (time.perf_counter() - self.overlay_time), 0)
+
+    def getLines(self):
+        """
+        The p50, p95 and p99 of the frame, every section and the AI moves, in ms.
+        """
+        lines = []
+        for name, values in [("frame", self.frame_times)] + list(self.sections.items()):
+            if values:
+                lines.append(f"{name:<10}{getPercentile(values, 50):7.1f}{getPercentile(values, 95):7.1f}"
+                             f"{getPercentile(values, 99):7.1f}")
+        if self.searches:
+            times = [search[0] for search in self.searches]
+            lines.append(f"{'AI move':<10}{getPercentile(times, 50):7.0f}{getPercentile(times, 95):7.0f}"
+                         f"{getPercentile(times, 99):7.0f}")
+            lines.append(f"AI {sum(search[1] for search in self.searches) / len(self.searches):,.0f} nodes/s")
+        return lines
+
+    def drawOverlay(self, screen):
+        """
+        Draw the percentiles over the board and return the rectangle covered, or None if the overlay is off.
+        The overlay is translucent, so whatever was under the last one must have been repainted first.
+        """
+        if not self.overlay:
+            return None
+        if self.font is None:
+            self.font = p.font.SysFont("Courier", 12, True, False)
+        lines = [f"{'ms':<10}{'p50':>7}{'p95':>7}{'p99':>7}"] + self.getLines()
+        line_height = self.font.get_linesize()
+        rendered = [self.font.render(line, True, p.Color("yellow")) for line in lines]
+        overlay_rect = p.Rect(OVERLAY_POSITION, (max(text.get_width() for text in rendered) + 8,
+                                                 line_height * len(rendered) + 8))
+        background = p.Surface(overlay_rect.size)
+        background.set_alpha(180)
+        screen.blit(background, overlay_rect)
+        for index, text in enumerate(rendered):
+            screen.blit(text, overlay_rect.move(4, 4 + index * line_height))
+        self.overlay_rect = overlay_rect
+        self.overlay_time = time.perf_counter()
+        return overlay_rect
+
+    def close(self):
+        """
+        Print the percentiles and write the profile if the game closes before enough frames were captured.
+        """
+        if self.profile is not None:
+            self.profile.disable()
+            self.dumpProfile()
+        if self.enabled and self.frame_times:
+            print(f"Last {len(self.frame_times)} frames")
+            print(f"{'ms':<10}{'p50':>7}{'p95':>7}{'p99':>7}")
+            for line in self.getLines():
+                print(line)
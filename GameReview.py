@@ -0,0 +1,125 @@
+"""
+Post-game review.
+Every move of a finished game is searched on worker processes, comparing the score of the move played with the
+score of the best move, and classified by how much it lost. Results are collected as they finish, so the game
+window can poll for them every frame. The web build has no processes, there the moves are reviewed one per poll.
+"""
+import signal
+import sys
+from collections import deque
+from multiprocessing import Pool, cpu_count
+import ChessAI
+import ChessEngine
+
+REVIEW_DEPTH = ChessAI.DEPTH
+# smallest score loss (in pawns) for each class, worst first; moves losing less are "best" or "good"
+CLASSIFICATIONS = [(3.0, "blunder"), (1.0, "mistake"), (0.4, "inaccuracy"), (0.1, "good")]
+ANNOTATIONS = {"best": "", "good": "", "inaccuracy": "?!", "mistake": "?", "blunder": "??"}
+
+
+def classifyMove(score_loss):
+    for threshold, classification in CLASSIFICATIONS:
+        if score_loss >= threshold:
+            return classification
+    return "best"
+
+
+def initWorker():
+    global worker_state
+    worker_state = ChessEngine.GameState()
+
+
+def initPoolWorker():
+    # SDL turns SIGTERM into a quit event and forked workers inherit its handler, so without the default
+    # back an idle worker would ignore Pool.terminate() and close() would wait for it forever
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    initWorker()
+
+
+def reviewMove(task):
+    """
+    Worker task: score the best move and the move played in one position, both for the side to move
+    and searched to the same depth. Returns (ply, best move, best score, played score, classification).
+    """
+    ply, fen, notation, depth = task
+    worker_state.loadFEN(fen)
+    best_move, best_score, principal_variation = ChessAI.findBestMoveIterative(
+        worker_state, worker_state.getValidMoves(), depth)
+    if best_move.getUCINotation() == notation:
+        played_score = best_score
+    else:
+        # searched as the only root move, so it is scored exactly like the best move, mates included
+        move = next(move for move in worker_state.getValidMoves() if move.getUCINotation() == notation)
+        played_score = ChessAI.findBestMoves(worker_state, [move], 1, depth)[0][1]
+    played_score = min(played_score, best_score)  # the searched best move can't be beaten at this depth
+    return ply, str(best_move), best_score, played_score, classifyMove(best_score - played_score)
+
+
+class GameReview:
+    def __init__(self, game_state, depth=REVIEW_DEPTH, processes=None):
+        """
+        Start reviewing every move of game_state.move_log.
+        """
+        self.results = {}  # ply -> (best move, best score, played score, classification)
+        self.finished = deque()  # results handed over by the pool, collected by poll
+        self.tasks = deque()
+        replay = ChessEngine.GameState.fromFEN(game_state.start_fen)
+        for ply, move in enumerate(game_state.move_log):
+            self.tasks.append((ply, replay.toFEN(), move.getUCINotation(), depth))
+            replay.makeMove(move)
+        self.total = len(self.tasks)
+        self.white_first = game_state.start_fen.split()[1] == "w"
+        self.pool = None
+        if sys.platform != "emscripten":
+            self.pool = Pool(min(processes or cpu_count(), max(self.total, 1)), initializer=initPoolWorker)
+            for task in self.tasks:
+                self.pool.apply_async(reviewMove, (task,), callback=self.finished.append)
+            self.tasks.clear()
+            self.pool.close()
+        else:
+            initWorker()
+
+    def poll(self):
+        """
+        Collect the results finished since the last call. Returns True if there were any.
+        """
+        if self.tasks:  # no worker processes, review one move in this process
+            self.finished.append(reviewMove(self.tasks.popleft()))
+        updated = False
+        while self.finished:
+            ply, *result = self.finished.popleft()
+            self.results[ply] = tuple(result)
+            updated = True
+        return updated
+
+    def isDone(self):
+        return len(self.results) == self.total
+
+    def getAnnotation(self, ply):
+        """
+        The mark to print after the move in the move log, empty until the move has been reviewed.
+        """
+        result = self.results.get(ply)
+        return ANNOTATIONS[result[3]] if result else ""
+
+    def getSummary(self):
+        """
+        Lines of text with the counts of inaccuracies, mistakes and blunders per side,
+        or the progress while the review runs.
+        """
+        if not self.isDone():
+            return [f"Reviewing... {len(self.results)}/{self.total}"]
+        lines = []
+        for side, parity in (("White", 0 if self.white_first else 1), ("Black", 1 if self.white_first else 0)):
+            counts = {classification: 0 for classification in ("inaccuracy", "mistake", "blunder")}
+            for ply, result in self.results.items():
+                if ply % 2 == parity and result[3] in counts:
+                    counts[result[3]] += 1
+            lines.append(f"{side}: {counts['inaccuracy']}?! {counts['mistake']}? {counts['blunder']}??")
+        return lines
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+        self.tasks.clear()
@@ -0,0 +1,413 @@
+"""
+Hosts many games at once over a line-based TCP protocol.
+Every game is backed by a GameState, but only the ACTIVE_GAMES most recently used games keep one in memory.
+The others are kept compact as their start FEN and one 16-bit code per move (the saveGame format), and are
+replayed when they are used again. AI moves are searched on one shared process pool with a bounded number of
+searches at a time, each handed its position as a snapshot in shared memory. Waiting searches are taken from
+the connections in turn, so one client with many games can't hold up the others, and every game searches
+within its own depth and time budget.
+
+Protocol, one command per line, every reply names the game:
+    new [depth=N] [movetime=MS] [fen <FEN>]   -> game <id>
+    move <id> <uci move>                       -> ok <id> <state>
+    go <id>                                    -> bestmove <id> <uci move or none> <state>
+    fen <id>                                   -> fen <id> <FEN>
+    close <id>                                 -> closed <id>
+    stats                                      -> stats games=N active=N waiting=N searching=N
+where state is playing, checkmate or stalemate. Errors reply "error <id or -> <message>".
+
+Usage:
+    python GameServer.py serve --port 8765 --processes 4
+    python GameServer.py loadtest --port 8765 --games 1000 --connections 10 --depth 1
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import cpu_count, util
+import ChessAI
+import ChessEngine
+
+DEFAULT_PORT = 8765
+ACTIVE_GAMES = 256  # games that keep their GameState in memory, the others are replayed when used
+MAX_DEPTH = 3  # the largest search budget a game can ask for
+MAX_MOVETIME = 2000  # ms
+DEFAULT_DEPTH = 2
+DEFAULT_MOVETIME = 1000  # ms
+
+
+attached_positions = {}  # shared memory name -> ChessEngine.SnapshotBuffer, in every pool process
+
+
+def initWorker():
+    """
+    Runs in every pool process: close the shared snapshots it attached to when the process exits.
+    Pool processes leave through multiprocessing's exit handlers, not atexit.
+    """
+    util.Finalize(None, closeAttachedPositions, exitpriority=0)
+
+
+def closeAttachedPositions():
+    for positions in attached_positions.values():
+        positions.close()
+    attached_positions.clear()
+
+
+def searchPosition(positions_name, slot, depth, movetime):
+    """
+    Runs on the process pool: the best move of the position in a slot of the scheduler's shared snapshots,
+    in UCI notation, or None if there is none.
+    """
+    if positions_name not in attached_positions:
+        attached_positions[positions_name] = ChessEngine.SnapshotBuffer(name=positions_name)
+    game_state = attached_positions[positions_name].read(slot)
+    deadline = time.perf_counter() + movetime / 1000
+    best_move, score, line = ChessAI.findBestMoveIterative(game_state, game_state.getValidMoves(), depth,
+                                                           lambda: time.perf_counter() >= deadline)
+    return best_move.getUCINotation() if best_move is not None else None
+
+
+class Game:
+    """
+    One hosted game: its start position and moves, and the GameState while it is active.
+    """
+    __slots__ = ("game_id", "client", "start_fen", "moves", "depth", "movetime", "game_state", "busy")
+
+    def __init__(self, game_id, client, start_fen, depth, movetime):
+        self.game_id = game_id
+        self.client = client
+        self.start_fen = start_fen
+        self.moves = bytearray()  # move codes, 2 bytes each
+        self.depth = depth
+        self.movetime = movetime
+        self.game_state = None
+        self.busy = False  # a search is running for the game
+
+
+class SearchScheduler:
+    """
+    Runs searches on the process pool, at most `slots` at a time, taking waiting searches from the clients in turn.
+    Every running search has a slot in shared memory that its position is handed over in.
+    """
+
+    def __init__(self, executor, slots):
+        self.executor = executor
+        self.slots = asyncio.Semaphore(slots)
+        self.positions = ChessEngine.SnapshotBuffer(slots)
+        self.free_slots = list(range(slots))
+        self.waiting = OrderedDict()  # client -> deque of (arguments, future), in turn order
+        self.ready = asyncio.Event()
+        self.searching = 0
+
+    def search(self, client, snapshot, depth, movetime):
+        """
+        Queue a search of a GameState.toSnapshot position for the client, returns a future of the move.
+        """
+        arguments = (snapshot, depth, movetime)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.setdefault(client, deque()).append((arguments, future))
+        self.ready.set()
+        return future
+
+    def dropClient(self, client):
+        for arguments, future in self.waiting.pop(client, ()):
+            future.cancel()
+
+    def getWaitingCount(self):
+        return sum(len(queue) for queue in self.waiting.values())
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.slots.acquire()
+            while not self.waiting:
+                self.ready.clear()
+                await self.ready.wait()
+            client, queue = next(iter(self.waiting.items()))
+            arguments, future = queue.popleft()
+            if queue:
+                self.waiting.move_to_end(client)  # the next search of this client waits for the other clients
+            else:
+                del self.waiting[client]
+            if future.cancelled():
+                self.slots.release()
+                continue
+            self.searching += 1
+            snapshot, depth, movetime = arguments
+            slot = self.free_slots.pop()
+            self.positions.writeSnapshot(slot, snapshot)
+            search = loop.run_in_executor(self.executor, searchPosition, self.positions.name, slot, depth, movetime)
+            search.add_done_callback(lambda search, future=future, slot=slot: self.finish(search, future, slot))
+
+    def finish(self, search, future, slot):
+        self.searching -= 1
+        self.free_slots.append(slot)
+        self.slots.release()
+        if future.cancelled():
+            return
+        if search.exception() is not None:
+            future.set_exception(search.exception())
+        else:
+            future.set_result(search.result())
+
+
+class GameServer:
+    def __init__(self, processes=None, active_games=ACTIVE_GAMES, max_depth=MAX_DEPTH, max_movetime=MAX_MOVETIME):
+        processes = processes or cpu_count()
+        self.executor = ProcessPoolExecutor(processes, initializer=initWorker)
+        self.scheduler = SearchScheduler(self.executor, processes)
+        self.games = {}
+        self.active = OrderedDict()  # game id -> game with a GameState, least recently used first
+        self.active_games = active_games
+        self.max_depth = max_depth
+        self.max_movetime = max_movetime
+        self.game_ids = itertools.count(1)
+        self.client_ids = itertools.count(1)
+
+    def getGameState(self, game):
+        """
+        The GameState of a game, replaying its moves if it was compacted.
+        The least recently used game is compacted when there are too many active games.
+        """
+        if game.game_state is None:
+            game_state = ChessEngine.GameState.fromFEN(game.start_fen)
+            for (code,) in ChessEngine.move_code.iter_unpack(game.moves):
+                game_state.makeMove(next(move for move in game_state.getValidMoves() if move.getMoveCode() == code))
+            game_state.getValidMoves()  # sets checkmate and stalemate
+            game.game_state = game_state
+            self.active[game.game_id] = game
+            if len(self.active) > self.active_games:
+                game_id, compacted = self.active.popitem(last=False)
+                compacted.game_state = None
+        else:
+            self.active.move_to_end(game.game_id)
+        return game.game_state
+
+    def makeMove(self, game, notation):
+        """
+        Play a move given in UCI notation, returns False if it isn't legal.
+        """
+        game_state = self.getGameState(game)
+        for move in game_state.getValidMoves():
+            if move.getUCINotation() == notation:
+                game_state.makeMove(move)
+                game.moves += ChessEngine.move_code.pack(move.getMoveCode())
+                game_state.getValidMoves()
+                return True
+        return False
+
+    @staticmethod
+    def getState(game_state):
+        return "checkmate" if game_state.checkmate else "stalemate" if game_state.stalemate else "playing"
+
+    def getGame(self, client, game_id):
+        game = self.games.get(int(game_id)) if game_id.isdigit() else None
+        if game is None or game.client != client:
+            raise LookupError("unknown game")
+        return game
+
+    def closeGame(self, game):
+        del self.games[game.game_id]
+        self.active.pop(game.game_id, None)
+
+    async def handleCommand(self, client, line):
+        """
+        Carry out one command line and return the reply.
+        """
+        words = line.split()
+        command = words[0].lower() if words else ""
+        if command == "new":
+            depth, movetime, fen = DEFAULT_DEPTH, DEFAULT_MOVETIME, ChessEngine.START_FEN
+            for index, word in enumerate(words[1:], 1):
+                if word == "fen":
+                    # raises ValueError if it isn't a valid FEN, clocks included, and stores it normalized
+                    fen = ChessEngine.GameState.fromFEN(" ".join(words[index + 1:])).toFEN()
+                    break
+                key, value = word.split("=", 1)
+                if key == "depth":
+                    depth = min(max(int(value), 1), self.max_depth)
+                elif key == "movetime":
+                    movetime = min(max(int(value), 1), self.max_movetime)
+                else:
+                    raise ValueError("unknown option " + key)
+            game = Game(next(self.game_ids), client, fen, depth, movetime)
+            self.games[game.game_id] = game
+            return f"game {game.game_id}"
+        if command == "stats":
+            return f"stats games={len(self.games)} active={len(self.active)} " \
+                   f"waiting={self.scheduler.getWaitingCount()} searching={self.scheduler.searching}"
+        if command not in ("move", "go", "fen", "close") or len(words) < 2:
+            raise ValueError("unknown command")
+        game = self.getGame(client, words[1])
+        if game.busy:
+            raise RuntimeError("busy")
+        if command == "move":
+            if len(words) < 3 or not self.makeMove(game, words[2]):
+                raise ValueError("illegal move")
+            return f"ok {game.game_id} {self.getState(game.game_state)}"
+        if command == "fen":
+            return f"fen {game.game_id} {self.getGameState(game).toFEN()}"
+        if command == "close":
+            self.closeGame(game)
+            return f"closed {game.game_id}"
+        # go
+        game_state = self.getGameState(game)
+        if game_state.checkmate or game_state.stalemate:
+            return f"bestmove {game.game_id} none {self.getState(game_state)}"
+        game.busy = True
+        try:
+            notation = await self.scheduler.search(client, game_state.toSnapshot(), game.depth, game.movetime)
+        finally:
+            game.busy = False
+        if game.game_id not in self.games:  # closed while searching
+            raise LookupError("unknown game")
+        if notation is None or not self.makeMove(game, notation):
+            notation = ChessAI.findRandomMove(self.getGameState(game).getValidMoves()).getUCINotation()
+            self.makeMove(game, notation)
+        return f"bestmove {game.game_id} {notation} {self.getState(game.game_state)}"
+
+    async def runCommand(self, client, line, writer):
+        try:
+            reply = await self.handleCommand(client, line)
+        except (ValueError, LookupError, RuntimeError) as error:
+            words = line.split()
+            reply = f"error {words[1] if len(words) > 1 and words[0] != 'new' else '-'} {error}"
+        if not writer.is_closing():
+            writer.write((reply + "\n").encode())
+
+    async def handleClient(self, reader, writer):
+        """
+        Serve one connection. Commands run concurrently, so a search doesn't hold up the client's other games.
+        """
+        client = next(self.client_ids)
+        commands = set()
+        try:
+            while line := await reader.readline():
+                command = asyncio.create_task(self.runCommand(client, line.decode(errors="replace").strip(), writer))
+                commands.add(command)
+                command.add_done_callback(commands.discard)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.scheduler.dropClient(client)
+            for command in list(commands):
+                command.cancel()
+            for game in [game for game in self.games.values() if game.client == client]:
+                self.closeGame(game)
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        scheduler = asyncio.create_task(self.scheduler.run())
+        try:
+            server = await asyncio.start_server(self.handleClient, host, port)
+            print(f"Serving games on {host}:{port}")
+            async with server:
+                await server.serve_forever()
+        finally:
+            scheduler.cancel()
+            self.executor.shutdown(cancel_futures=True)
+            self.scheduler.positions.close()
+            self.scheduler.positions.unlink()
+
+
+async def playLoadTestConnection(host, port, games, depth, movetime, max_plies, latencies):
+    """
+    Play `games` AI vs AI games at once over one connection, adding the time of every go command to latencies.
+    Returns the number of moves played.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    replies = {}  # game id -> future of the reply, every game waits for one reply at a time
+
+    async def readReplies():
+        while line := await reader.readline():
+            words = line.decode().split()
+            if words[0] == "error":
+                print("Server error: " + " ".join(words[2:]))
+            # errors of new carry no game id
+            key = "new" if words[0] == "game" or words[:2] == ["error", "-"] else words[1]
+            reply = replies.pop(key, None)
+            if reply is None:
+                print("Unexpected reply: " + " ".join(words))
+            else:
+                reply.set_result(words)
+
+    async def request(key, line):
+        replies[key] = asyncio.get_running_loop().create_future()
+        writer.write((line + "\n").encode())
+        return await replies[key]
+
+    async def playGame(game_id):
+        moves = 0
+        while moves < max_plies:
+            start_time = time.perf_counter()
+            words = await request(game_id, "go " + game_id)
+            latencies.append(time.perf_counter() - start_time)
+            if words[0] != "bestmove" or words[2] == "none":
+                break
+            moves += 1
+            if words[3] != "playing":
+                break
+        await request(game_id, "close " + game_id)
+        return moves
+
+    reader_task = asyncio.create_task(readReplies())
+    game_ids = []
+    for game in range(games):
+        words = await request("new", f"new depth={depth} movetime={movetime}")
+        if words[0] == "game":
+            game_ids.append(words[1])
+    moves = sum(await asyncio.gather(*(playGame(game_id) for game_id in game_ids)))
+    reader_task.cancel()
+    writer.close()
+    return moves
+
+
+async def loadTest(host="127.0.0.1", port=DEFAULT_PORT, games=100, connections=10, depth=1, movetime=100,
+                   max_plies=40):
+    """
+    Play games AI vs AI on a running server and report moves per second and the latency of the AI moves.
+    """
+    latencies = []
+    start_time = time.perf_counter()
+    games_per_connection = [games // connections + (index < games % connections) for index in range(connections)]
+    moves = await asyncio.gather(*(playLoadTestConnection(host, port, connection_games, depth, movetime, max_plies,
+                                                          latencies) for connection_games in games_per_connection))
+    elapsed = time.perf_counter() - start_time
+    latencies.sort()
+    total_moves = sum(moves)
+    print(f"{games} games, {total_moves} moves in {elapsed:.1f} s: {total_moves / elapsed:.1f} moves/s")
+    if latencies:
+        print(f"move latency p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+              f"p99 {latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000:.0f} ms")
+    return total_moves / elapsed, latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host many games over TCP, or load test a running server.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="run the game server")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--processes", type=int, default=None, help="search processes, all CPUs if omitted")
+    serve_parser.add_argument("--active-games", type=int, default=ACTIVE_GAMES,
+                              help="games kept in memory as a GameState")
+    serve_parser.add_argument("--max-depth", type=int, default=MAX_DEPTH)
+    serve_parser.add_argument("--max-movetime", type=int, default=MAX_MOVETIME, help="ms")
+    load_parser = commands.add_parser("loadtest", help="play AI vs AI games on a running server")
+    load_parser.add_argument("--host", default="127.0.0.1")
+    load_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    load_parser.add_argument("--games", type=int, default=100)
+    load_parser.add_argument("--connections", type=int, default=10)
+    load_parser.add_argument("--depth", type=int, default=1)
+    load_parser.add_argument("--movetime", type=int, default=100, help="ms")
+    load_parser.add_argument("--max-plies", type=int, default=40)
+    args = parser.parse_args()
+    if args.command == "serve":
+        asyncio.run(GameServer(args.processes, args.active_games, args.max_depth, args.max_movetime)
+                    .serve(args.host, args.port))
+    else:
+        asyncio.run(loadTest(args.host, args.port, args.games, args.connections, args.depth, args.movetime,
+                             args.max_plies))
@@ -0,0 +1,159 @@
+"""
+Forced mate search for puzzles.
+A depth-first search that tries checking moves first, proves that every defence still loses,
+and deepens one move at a time so the shortest mate is found first.
+
+Usage: python MateSolver.py --fen "<fen>" -n 3
+       python MateSolver.py puzzles.epd [--processes 8]   (EPD lines with a "dm N" opcode)
+"""
+import argparse
+import json
+from multiprocessing import Pool, cpu_count
+import ChessEngine
+
+
+class MateSolver:
+    def __init__(self, game_state):
+        self.game_state = game_state
+        self.no_mate_within = {}  # position key -> largest number of moves proven not to be enough to mate
+        self.nodes = 0
+
+    def findMate(self, moves_to_mate):
+        """
+        Find a forced mate in at most moves_to_mate moves for the side to move.
+        Returns the mating line (attacker and defender moves alternating, defender resisting longest)
+        or None if there is no such mate.
+        """
+        for moves in range(1, moves_to_mate + 1):  # the first mate found is the shortest one
+            line = self.attack(moves)
+            if line is not None:
+                return line
+        return None
+
+    def attack(self, moves):
+        """
+        Attacker to move: return a line that mates within `moves` moves, or None.
+        """
+        key = self.game_state.position_key
+        if self.no_mate_within.get(key, 0) >= moves:
+            return None
+        self.nodes += 1
+        for move, gives_check in self.orderAttackingMoves(self.game_state.getValidMoves()):
+            if moves == 1 and not gives_check:
+                break  # the remaining moves don't check, so none of them can mate right away
+            self.game_state.makeMove(move)
+            replies = self.game_state.getValidMoves()
+            if not replies:
+                checkmate = self.game_state.checkmate
+                self.game_state.undoMove()
+                if checkmate:
+                    return [move]
+                continue  # stalemate
+            line = self.defend(replies, moves - 1) if moves > 1 else None
+            self.game_state.undoMove()
+            if line is not None:
+                return [move] + line
+        self.no_mate_within[key] = moves
+        return None
+
+    def defend(self, replies, moves):
+        """
+        Defender to move: if every reply still loses to a mate within `moves` moves, return the line
+        after the reply that holds out longest, otherwise None.
+        """
+        longest = None
+        for reply in self.orderDefendingMoves(replies):
+            self.game_state.makeMove(reply)
+            line = None
+            for attacker_moves in range(1, moves + 1):  # shortest mate against this reply
+                line = self.attack(attacker_moves)
+                if line is not None:
+                    break
+            self.game_state.undoMove()
+            if line is None:
+                return None  # this reply escapes
+            if longest is None or len(line) + 1 > len(longest):
+                longest = [reply] + line
+        return longest
+
+    def orderAttackingMoves(self, moves):
+        """
+        Checks first, then captures, then quiet moves. Returns (move, gives check) pairs.
+        """
+        ordered = []
+        for move in moves:
+            self.game_state.makeMove(move)
+            gives_check = self.game_state.checkForPinsAndChecks()[0]
+            self.game_state.undoMove()
+            ordered.append((0 if gives_check else 1 if move.is_capture else 2, move, gives_check))
+        ordered.sort(key=lambda entry: entry[0])
+        return [(move, gives_check) for priority, move, gives_check in ordered]
+
+    def orderDefendingMoves(self, moves):
+        """
+        Captures and king moves first, as they are the likeliest to refute the attack.
+        """
+        return sorted(moves, key=lambda move: 0 if move.is_capture else 1 if move.piece_moved[1] == "K" else 2)
+
+
+def findMate(game_state, moves_to_mate):
+    """
+    Forced mate in at most moves_to_mate moves for the side to move, as a list of moves, or None.
+    """
+    return MateSolver(game_state).findMate(moves_to_mate)
+
+
+def solveLine(line):
+    """
+    Worker task: solve one EPD puzzle line with a "dm N" opcode.
+    """
+    position = ChessEngine.parseFENLine(line)
+    if position is None or "dm" not in position[1]:
+        return None
+    fen, operations = position
+    moves_to_mate = int(operations["dm"])
+    solver = MateSolver(ChessEngine.GameState.fromFEN(fen))
+    solution = solver.findMate(moves_to_mate)
+    return {"id": operations.get("id"), "fen": fen, "dm": moves_to_mate, "solved": solution is not None,
+            "mate_in": (len(solution) + 1) // 2 if solution else None,
+            "line": [move.getUCINotation() for move in solution] if solution else None, "nodes": solver.nodes}
+
+
+def solvePuzzles(filename, output=None, processes=None):
+    """
+    Check every "dm" puzzle in an EPD file on a process pool, optionally writing results as JSON lines.
+    Returns (puzzles solved, puzzles checked).
+    """
+    solved = checked = 0
+    with Pool(processes or cpu_count()) as pool, open(filename) as file:
+        results_file = open(output, "w") if output else None
+        for result in pool.imap(solveLine, file, chunksize=16):
+            if result is None:
+                continue
+            checked += 1
+            solved += result["solved"]
+            if results_file:
+                results_file.write(json.dumps(result) + "\n")
+            elif not result["solved"]:
+                print(f"No mate in {result['dm']} found: {result['id'] or result['fen']}")
+        if results_file:
+            results_file.close()
+    print(f"{solved}/{checked} puzzles solved")
+    return solved, checked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find forced mates.")
+    parser.add_argument("puzzles", nargs="?", help='EPD file of puzzles with a "dm N" opcode')
+    parser.add_argument("--fen", help="solve a single position")
+    parser.add_argument("-n", type=int, default=3, help="moves to mate for --fen")
+    parser.add_argument("--output", default=None, help="write every result as a JSON line")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+    if args.fen:
+        mate = findMate(ChessEngine.GameState.fromFEN(args.fen), args.n)
+        print(" ".join(move.getUCINotation() for move in mate) if mate else f"No mate in {args.n}")
+    elif args.puzzles:
+        solvePuzzles(args.puzzles, args.output, args.processes)
+    else:
+        parser.print_help()
@@ -0,0 +1,58 @@
+"""
+Piece sprites packed into one pre-scaled image per square size.
+Loading a single atlas replaces loading and scaling twelve separate images at every start, which matters most
+on the web build where each image is a separate fetch and decode. Atlases are built on first use and cached
+in the images folder, e.g. images/atlas_64.png.
+
+Build step (run again after changing the piece images): python SpriteAtlas.py 64 [80 96 ...]
+"""
+import argparse
+import os
+import pygame as p
+
+PIECES = ['wp', 'wR', 'wN', 'wB', 'wK', 'wQ', 'bp', 'bR', 'bN', 'bB', 'bK', 'bQ']
+IMAGE_FOLDER = "images"
+
+
+def getAtlasFile(square_size):
+    return os.path.join(IMAGE_FOLDER, f"atlas_{square_size}.png")
+
+
+def buildAtlas(square_size):
+    """
+    Scale every piece image to square_size and pack them side by side in PIECES order.
+    The atlas is saved for the next start if the images folder is writable.
+    """
+    atlas = p.Surface((square_size * len(PIECES), square_size), p.SRCALPHA)
+    for index, piece in enumerate(PIECES):
+        image = p.transform.scale(p.image.load(os.path.join(IMAGE_FOLDER, piece + ".png")), (square_size, square_size))
+        atlas.blit(image, (index * square_size, 0))
+    try:
+        p.image.save(atlas, getAtlasFile(square_size))
+    except (OSError, p.error):
+        pass  # read-only deployment, the atlas is rebuilt next time
+    return atlas
+
+
+def loadAtlas(square_size):
+    """
+    The pieces at square_size, as a dict of piece -> sprite, from the cached atlas if there is one.
+    """
+    atlas_file = getAtlasFile(square_size)
+    if os.path.exists(atlas_file):
+        atlas = p.image.load(atlas_file)
+    else:
+        atlas = buildAtlas(square_size)
+    if p.display.get_surface() is not None:
+        atlas = atlas.convert_alpha()  # match the display format once, so blits don't convert every time
+    return {piece: atlas.subsurface(p.Rect(index * square_size, 0, square_size, square_size))
+            for index, piece in enumerate(PIECES)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the piece sprite atlases.")
+    parser.add_argument("sizes", type=int, nargs="+", help="square sizes in pixels")
+    args = parser.parse_args()
+    for size in args.sizes:
+        buildAtlas(size)
+        print("Built " + getAtlasFile(size))
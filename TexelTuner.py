@@ -0,0 +1,274 @@
+"""
+Tuning the piece values and piece-square tables of ChessAI on labeled positions (Texel's method).
+Positions come from an EPD file with the game result in the c9 opcode, e.g.
+    rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 c9 "1-0";
+The evaluation is linear in the parameters, so the positions are turned into feature rows once, cached on disk,
+and every iteration computes the prediction error and its gradient over the cache on all cores. The cache is
+rebuilt whenever the positions file changes, and lines with an invalid position are reported and skipped.
+The pawn structure terms are not tuned; each position's pawn structure score is cached next to its features and
+added to the prediction as a fixed offset, so the tuned values are fitted to the full evaluation.
+
+Usage: python TexelTuner.py positions.epd -o tuned.json
+The result can be loaded with ChessAI.loadParameters("tuned.json").
+"""
+import argparse
+import json
+import math
+import os
+from multiprocessing import Pool, cpu_count
+import numpy as np
+import ChessAI
+import ChessEngine
+import ChessTensor
+
+TUNED_PIECES = ["p", "N", "B", "R", "Q"]  # the king has neither a value nor a table in ChessAI
+FEATURE_COUNT = len(TUNED_PIECES) * 65  # one material feature plus 64 square features per piece type
+RESULTS = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+CHUNK_SIZE = 16384  # positions per task, bounds the memory each worker needs
+
+
+def extractFeatures(planes):
+    """
+    Turn (N, 12, 8, 8) board planes into (N, FEATURE_COUNT) feature rows: for every tuned piece type the white
+    minus black piece count, then the white minus black occupancy of each square, with black squares mirrored
+    the way ChessAI mirrors its tables.
+    """
+    planes = planes.astype(np.int8)
+    white = planes[:, [ChessTensor.PIECE_PLANES["w" + piece] for piece in TUNED_PIECES]]
+    black = planes[:, [ChessTensor.PIECE_PLANES["b" + piece] for piece in TUNED_PIECES]][:, :, ::-1, :]
+    squares = (white - black).reshape(len(planes), len(TUNED_PIECES), 64)
+    return np.concatenate([squares.sum(axis=2), squares.reshape(len(planes), -1)], axis=1).astype(np.int8)
+
+
+def getParameters():
+    """
+    The current ChessAI values and tables as a parameter vector matching the feature layout.
+    """
+    values = [ChessAI.piece_score[piece] for piece in TUNED_PIECES]
+    tables = [np.array(ChessAI.piece_tables[piece], dtype=np.float64).reshape(64) for piece in TUNED_PIECES]
+    return np.concatenate([np.array(values, dtype=np.float64)] + tables)
+
+
+def setParameters(parameters):
+    """
+    Write a parameter vector back into the ChessAI values and tables.
+    """
+    for index, piece in enumerate(TUNED_PIECES):
+        ChessAI.piece_score[piece] = round(float(parameters[index]), 4)
+        table = parameters[len(TUNED_PIECES) + index * 64:len(TUNED_PIECES) + (index + 1) * 64].reshape(8, 8)
+        for row in range(8):
+            ChessAI.piece_tables[piece][row][:] = [round(float(score), 4) for score in table[row]]
+
+
+def encodeLines(task):
+    """
+    Worker task: parse a chunk of EPD lines, numbered from first_line, into feature rows, pawn structure offsets
+    and results, skipping lines without a result. Invalid positions are skipped too and returned as a list of
+    (line number, error).
+    """
+    first_line, lines = task
+    planes = []
+    offsets = []
+    results = []
+    skipped = []
+    for line_number, line in enumerate(lines, first_line):
+        position = ChessEngine.parseFENLine(line)
+        if position is None or position[1].get("c9") not in RESULTS:
+            continue
+        try:
+            game_state = ChessEngine.GameState.fromFEN(position[0])
+        except ValueError as error:
+            skipped.append((line_number, str(error)))
+            continue
+        planes.append(ChessTensor.encodeBoard(game_state))
+        offsets.append(ChessAI.scorePawnStructure(game_state.board))
+        results.append(RESULTS[position[1]["c9"]])
+    if not planes:
+        empty = np.zeros(0, dtype=np.float32)
+        return np.zeros((0, FEATURE_COUNT), dtype=np.int8), empty, empty, skipped
+    return (extractFeatures(np.array(planes)), np.array(offsets, dtype=np.float32),
+            np.array(results, dtype=np.float32), skipped)
+
+
+def readChunks(filename, chunk_size=CHUNK_SIZE):
+    """
+    Lazily read a file in lists of chunk_size lines, yielding (number of the first line, lines).
+    """
+    with open(filename) as file:
+        chunk = []
+        first_line = 1
+        for line_number, line in enumerate(file, 1):
+            chunk.append(line)
+            if len(chunk) == chunk_size:
+                yield first_line, chunk
+                chunk = []
+                first_line = line_number + 1
+        if chunk:
+            yield first_line, chunk
+
+
+def boundedMap(pool, function, tasks, max_pending):
+    """
+    Like pool.imap, but never reads more than max_pending tasks ahead, so huge inputs are not pulled into memory.
+    Results are yielded in task order.
+    """
+    pending = []
+    for task in tasks:
+        pending.append(pool.apply_async(function, (task,)))
+        if len(pending) >= max_pending:
+            yield pending.pop(0).get()
+    for result in pending:
+        yield result.get()
+
+
+def buildFeatureCache(positions_file, cache, pool, processes):
+    """
+    Stream the positions through the worker pool and append their feature rows, offsets and results to the cache
+    files. Invalid positions are reported and left out. Returns the number of positions cached.
+    """
+    count = 0
+    with open(cache + ".features", "wb") as features_file, open(cache + ".offsets", "wb") as offsets_file, \
+            open(cache + ".results", "wb") as results_file:
+        for features, offsets, results, skipped in boundedMap(pool, encodeLines, readChunks(positions_file),
+                                                              processes * 2):
+            for line_number, error in skipped:
+                print(f"Skipped line {line_number} of {positions_file}: {error}")
+            features_file.write(features.tobytes())
+            offsets_file.write(offsets.tobytes())
+            results_file.write(results.tobytes())
+            count += len(results)
+    with open(cache + ".source", "w") as source_file:  # written last, so an interrupted build is never used
+        json.dump(getSourceStamp(positions_file), source_file)
+    return count
+
+
+def getSourceStamp(positions_file):
+    """
+    What identifies the version of the positions file a cache was built from.
+    """
+    status = os.stat(positions_file)
+    return {"file": os.path.abspath(positions_file), "size": status.st_size, "mtime_ns": status.st_mtime_ns}
+
+
+def openCache(cache, count):
+    features = np.memmap(cache + ".features", dtype=np.int8, mode="r", shape=(count, FEATURE_COUNT))
+    offsets = np.memmap(cache + ".offsets", dtype=np.float32, mode="r", shape=(count,))
+    results = np.memmap(cache + ".results", dtype=np.float32, mode="r", shape=(count,))
+    return features, offsets, results
+
+
+def isCacheValid(cache, positions_file):
+    """
+    Whether all cache files exist, were built from the current version of positions_file and hold the same
+    number of positions as the results file.
+    """
+    files = [cache + ".features", cache + ".offsets", cache + ".results", cache + ".source"]
+    if not all(os.path.exists(file) for file in files):
+        return False
+    try:
+        with open(cache + ".source") as source_file:
+            if json.load(source_file) != getSourceStamp(positions_file):
+                return False
+    except ValueError:
+        return False
+    count = os.path.getsize(cache + ".results") // 4
+    return (os.path.getsize(cache + ".features") == count * FEATURE_COUNT
+            and os.path.getsize(cache + ".offsets") == count * 4)
+
+
+def initWorker(cache, count):
+    global worker_features, worker_offsets, worker_results
+    if count:
+        worker_features, worker_offsets, worker_results = openCache(cache, count)
+
+
+def computeGradient(task):
+    """
+    Worker task: squared prediction error and its gradient over rows start to end of the cache.
+    """
+    start, end, parameters, k = task
+    features = worker_features[start:end].astype(np.float64)
+    predicted = 1 / (1 + 10 ** (-k * (features @ parameters + worker_offsets[start:end]) / 4))
+    error = worker_results[start:end] - predicted
+    gradient = -2 * (error * predicted * (1 - predicted) * k * math.log(10) / 4) @ features
+    return float(error @ error), gradient
+
+
+def evaluateError(pool, count, parameters, k):
+    """
+    Mean squared error and its gradient over all cached positions.
+    """
+    tasks = [(start, min(start + CHUNK_SIZE, count), parameters, k) for start in range(0, count, CHUNK_SIZE)]
+    loss = 0.0
+    gradient = np.zeros_like(parameters)
+    for chunk_loss, chunk_gradient in pool.imap_unordered(computeGradient, tasks):
+        loss += chunk_loss
+        gradient += chunk_gradient
+    return loss / count, gradient / count
+
+
+def fitScalingConstant(pool, count, parameters):
+    """
+    Find the k that best maps the current evaluation to results, so tuning starts from a calibrated sigmoid.
+    """
+    best_k, best_loss = 1.0, float("inf")
+    for k in np.arange(0.2, 3.01, 0.1):
+        loss = evaluateError(pool, count, parameters, k)[0]
+        if loss < best_loss:
+            best_k, best_loss = float(k), loss
+    return best_k
+
+
+def tune(positions_file, output, iterations=300, learning_rate=0.01, k=None, processes=None, cache=None,
+         rebuild_cache=False):
+    """
+    Tune the ChessAI parameters with Adam on the mean squared error between sigmoid(k * eval) and the results,
+    then save them to output.
+    """
+    processes = processes or cpu_count()
+    cache = cache or positions_file + ".texel"
+    with Pool(processes) as pool:
+        if rebuild_cache or not isCacheValid(cache, positions_file):
+            count = buildFeatureCache(positions_file, cache, pool, processes)
+        else:
+            count = os.path.getsize(cache + ".results") // 4
+    print(f"{count} positions in {cache}")
+    if count == 0:
+        return
+
+    parameters = getParameters()
+    with Pool(processes, initializer=initWorker, initargs=(cache, count)) as pool:
+        if k is None:
+            k = fitScalingConstant(pool, count, parameters)
+            print(f"k = {k:.2f}")
+        first_moment = np.zeros_like(parameters)
+        second_moment = np.zeros_like(parameters)
+        for iteration in range(1, iterations + 1):
+            loss, gradient = evaluateError(pool, count, parameters, k)
+            first_moment = 0.9 * first_moment + 0.1 * gradient
+            second_moment = 0.999 * second_moment + 0.001 * gradient ** 2
+            step = first_moment / (1 - 0.9 ** iteration) / (np.sqrt(second_moment / (1 - 0.999 ** iteration)) + 1e-8)
+            parameters -= learning_rate * step
+            if iteration % 10 == 0 or iteration == 1:
+                print(f"iteration {iteration}: error {loss:.6f}")
+    setParameters(parameters)
+    ChessAI.saveParameters(output)
+    print(f"Tuned parameters saved to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune ChessAI evaluation parameters on labeled positions.")
+    parser.add_argument("positions", help="EPD file with results in the c9 opcode")
+    parser.add_argument("-o", "--output", default="tuned_parameters.json")
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--learning-rate", type=float, default=0.01)
+    parser.add_argument("--k", type=float, default=None, help="sigmoid scaling, fitted to the data if omitted")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--cache", default=None, help="prefix of the feature cache files")
+    parser.add_argument("--rebuild-cache", action="store_true")
+    parser.add_argument("--parameters", default=None, help="start from a saved parameter file")
+    args = parser.parse_args()
+    if args.parameters:
+        ChessAI.loadParameters(args.parameters)
+    tune(args.positions, args.output, args.iterations, args.learning_rate, args.k, args.processes, args.cache,
+         args.rebuild_cache)
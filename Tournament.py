@@ -0,0 +1,238 @@
+"""
+Headless engine matches.
+Plays many games between two ChessAI configurations on a process pool, without pygame,
+streams every game to a JSON lines file and reports the Elo difference and an SPRT verdict.
+
+Usage: python Tournament.py --engine1 depth=3 --engine2 depth=2,parameters=tuned.json --games 1000
+"""
+import argparse
+import json
+import math
+import random
+import time
+from multiprocessing import Pool, cpu_count
+import ChessAI
+import ChessEngine
+
+# a few balanced positions after the first moves of common openings, each is played once with either color
+OPENINGS = [
+    ChessEngine.START_FEN,
+    "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2",  # open game
+    "rnbqkbnr/pp1ppppp/8/2p5/4P3/8/PPPP1PPP/RNBQKBNR w KQkq c6 0 2",  # sicilian
+    "rnbqkbnr/pppp1ppp/4p3/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2",  # french
+    "rnbqkbnr/pp1ppppp/2p5/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2",  # caro-kann
+    "rnbqkbnr/ppp1pppp/8/3p4/3P4/8/PPP1PPPP/RNBQKBNR w KQkq d6 0 2",  # closed game
+    "rnbqkb1r/pppppppp/5n2/8/3P4/8/PPP1PPPP/RNBQKBNR w KQkq - 1 2",  # indian
+    "rnbqkbnr/pppppppp/8/8/2P5/8/PP1PPPPP/RNBQKBNR b KQkq c3 0 1",  # english
+    "r1bqkbnr/pppp1ppp/2n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3",  # ruy lopez
+    "rnbqkbnr/ppp1pppp/8/3p4/2PP4/8/PP2PPPP/RNBQKBNR b KQkq c3 0 2",  # queen's gambit
+]
+
+MAX_PLIES = 200  # adjudicate a draw after this many plies
+WIN_MARGIN = 10  # adjudicate a win once the material score stays this far ahead...
+WIN_PLIES = 8  # ...for this many plies
+
+
+def parseEngine(text, name):
+    """
+    Read an engine configuration like "depth=3,parameters=tuned.json".
+    """
+    config = {"name": name, "depth": ChessAI.DEPTH, "parameters": None}
+    for option in filter(None, text.split(",")):
+        key, value = option.split("=", 1)
+        config[key] = int(value) if key == "depth" else value
+    return config
+
+
+def initWorker():
+    global default_parameters, applied_parameters, loaded_parameters
+    default_parameters = ChessAI.getParameters()
+    applied_parameters = None
+    loaded_parameters = {}
+
+
+def applyEngine(config):
+    """
+    Switch ChessAI to the search depth and evaluation parameters of an engine configuration.
+    """
+    global applied_parameters
+    ChessAI.DEPTH = config["depth"]
+    if config["parameters"] != applied_parameters:
+        if config["parameters"] is None:
+            ChessAI.setParameters(default_parameters)
+        else:
+            if config["parameters"] not in loaded_parameters:
+                with open(config["parameters"]) as file:
+                    loaded_parameters[config["parameters"]] = json.load(file)
+            ChessAI.setParameters(loaded_parameters[config["parameters"]])
+        applied_parameters = config["parameters"]
+
+
+def playGame(white, black, opening=ChessEngine.START_FEN, max_plies=MAX_PLIES, seed=None):
+    """
+    Play one game between two engine configurations from the opening position.
+    Returns a dict with the result ("1-0", "0-1" or "1/2-1/2"), the reason, the moves in UCI notation,
+    the time every move took and the CPU time each engine used.
+    """
+    if seed is not None:
+        random.seed(seed)
+    game_state = ChessEngine.GameState.fromFEN(opening)
+    moves = []
+    move_times = []
+    cpu_time = {"white": 0.0, "black": 0.0}
+    halfmove_clock = 0
+    winning_plies = 0
+    white_winning = True
+    result, reason = "1/2-1/2", "max plies"
+    while len(moves) < max_plies:
+        valid_moves = game_state.getValidMoves()
+        if game_state.checkmate:
+            result, reason = ("0-1" if game_state.white_to_move else "1-0"), "checkmate"
+            break
+        if game_state.stalemate:
+            reason = "stalemate"
+            break
+        if game_state.position_key_log.count(game_state.position_key) >= 3:
+            reason = "repetition"
+            break
+        if halfmove_clock >= 100:
+            reason = "fifty moves"
+            break
+        if all(square in ("--", "wK", "bK") for row in game_state.board for square in row):
+            reason = "insufficient material"
+            break
+
+        side = "white" if game_state.white_to_move else "black"
+        applyEngine(white if game_state.white_to_move else black)
+        start_time, start_cpu = time.perf_counter(), time.process_time()
+        move = ChessAI.findBestMove(game_state, valid_moves)
+        if move is None:
+            move = ChessAI.findRandomMove(valid_moves)
+        move_times.append(time.perf_counter() - start_time)
+        cpu_time[side] += time.process_time() - start_cpu
+        game_state.makeMove(move)
+        moves.append(move.getUCINotation())
+        halfmove_clock = 0 if move.piece_moved[1] == "p" or move.is_capture else halfmove_clock + 1
+
+        # adjudicate games that are clearly decided on material
+        score = ChessAI.scoreBoard(game_state)
+        if WIN_MARGIN <= abs(score) < ChessAI.CHECKMATE:
+            winning_plies = winning_plies + 1 if (score > 0) == white_winning else 1
+            white_winning = score > 0
+            if winning_plies >= WIN_PLIES:
+                result, reason = ("1-0" if white_winning else "0-1"), "adjudicated"
+                break
+        else:
+            winning_plies = 0
+    return {"opening": opening, "white": white["name"], "black": black["name"], "result": result, "reason": reason,
+            "plies": len(moves), "moves": moves, "move_times": move_times, "cpu_time": cpu_time}
+
+
+def playTask(task):
+    index, white, black, opening, max_plies = task
+    game = playGame(white, black, opening, max_plies, seed=index)
+    game["game"] = index
+    return game
+
+
+def eloFromScore(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def computeElo(wins, draws, losses):
+    """
+    Elo difference of engine 1 over engine 2 with the 95% confidence interval.
+    """
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    return eloFromScore(score), eloFromScore(score - margin), eloFromScore(score + margin)
+
+
+def computeSPRT(wins, draws, losses, elo0, elo1, alpha, beta):
+    """
+    Log-likelihood ratio of H1 (engine 1 is elo1 stronger) against H0 (elo0 stronger), using the normal
+    approximation of the trinomial model. Returns the LLR and "pass", "fail" or "continue".
+    """
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    if variance == 0:
+        return 0.0, "continue"
+    score0 = 1 / (1 + 10 ** (-elo0 / 400))
+    score1 = 1 / (1 + 10 ** (-elo1 / 400))
+    llr = (score1 - score0) * (2 * score - score0 - score1) / (2 * variance / games)
+    if llr >= math.log((1 - beta) / alpha):
+        return llr, "pass"
+    if llr <= math.log(beta / (1 - alpha)):
+        return llr, "fail"
+    return llr, "continue"
+
+
+def runMatch(engine1, engine2, games, output, openings=OPENINGS, processes=None, max_plies=MAX_PLIES,
+             elo0=0.0, elo1=10.0, alpha=0.05, beta=0.05, stop_on_sprt=True):
+    """
+    Play the match on a process pool, appending every finished game to output as a JSON line.
+    Engines swap colors on every opening. Returns (wins, draws, losses) from engine 1's point of view.
+    """
+    tasks = []
+    for index in range(games):
+        opening = openings[(index // 2) % len(openings)]
+        white, black = (engine1, engine2) if index % 2 == 0 else (engine2, engine1)
+        tasks.append((index, white, black, opening, max_plies))
+    wins = draws = losses = 0
+    cpu_time = {engine1["name"]: 0.0, engine2["name"]: 0.0}
+    moves_played = {engine1["name"]: 0, engine2["name"]: 0}
+    with Pool(processes or cpu_count(), initializer=initWorker) as pool, open(output, "a") as file:
+        for game in pool.imap_unordered(playTask, tasks):
+            file.write(json.dumps(game) + "\n")
+            file.flush()
+            first_side = "white" if game["opening"].split()[1] == "w" else "black"
+            for side in ("white", "black"):
+                cpu_time[game[side]] += game["cpu_time"][side]
+                moves_played[game[side]] += (game["plies"] + (side == first_side)) // 2
+            if game["result"] == "1/2-1/2":
+                draws += 1
+            elif (game["result"] == "1-0") == (game["white"] == engine1["name"]):
+                wins += 1
+            else:
+                losses += 1
+            llr, verdict = computeSPRT(wins, draws, losses, elo0, elo1, alpha, beta)
+            played = wins + draws + losses
+            if played % 10 == 0 or played == games or verdict != "continue":
+                elo, elo_low, elo_high = computeElo(wins, draws, losses)
+                print(f"{played} games  +{wins} ={draws} -{losses}  Elo {elo:+.1f} [{elo_low:+.1f}, {elo_high:+.1f}]  "
+                      f"LLR {llr:.2f} ({verdict})")
+            if stop_on_sprt and verdict != "continue":
+                pool.terminate()
+                break
+    for name in cpu_time:
+        if moves_played[name]:
+            print(f"{name}: {1000 * cpu_time[name] / moves_played[name]:.1f} ms CPU per move")
+    return wins, draws, losses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play a headless match between two ChessAI configurations.")
+    parser.add_argument("--engine1", default="", help='e.g. "depth=3,parameters=tuned.json"')
+    parser.add_argument("--engine2", default="")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--output", default="match_results.jsonl")
+    parser.add_argument("--openings", default=None, help="FEN or EPD file of opening positions")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES)
+    parser.add_argument("--elo0", type=float, default=0.0)
+    parser.add_argument("--elo1", type=float, default=10.0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--no-sprt-stop", action="store_true", help="play all games even once SPRT has decided")
+    args = parser.parse_args()
+    openings = OPENINGS
+    if args.openings:
+        with open(args.openings) as file:
+            openings = [position[0] for position in map(ChessEngine.parseFENLine, file) if position is not None]
+    runMatch(parseEngine(args.engine1, "engine1"), parseEngine(args.engine2, "engine2"), args.games, args.output,
+             openings, args.processes, args.max_plies, args.elo0, args.elo1, args.alpha, args.beta,
+             not args.no_sprt_stop)
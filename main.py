@@ -3,11 +3,19 @@ Main driver file.
 Handling user input.
 Displaying current GameStatus object.
 """
+import argparse
 import asyncio
+import datetime
+import math
 import pygame as p
 import sys
 import ChessEngine
 import ChessAI
+import ChessPGN
+import FrameProfiler
+import GameReview
+import SpriteAtlas
+import Tournament
 from multiprocessing import Process, Queue
 import time
 
@@ -17,44 +25,70 @@ MOVE_LOG_PANEL_HEIGHT = BOARD_HEIGHT
 DIMENSION = 8
 SQUARE_SIZE = BOARD_HEIGHT // DIMENSION
 MAX_FPS = 15
+SECONDS_PER_SQUARE = 0.08  # move animation speed
+MAX_ANIMATION_TIME = 0.3  # seconds, however far the piece moves
+IDLE_TIMEOUT = 1.0  # longest sleep in seconds while nothing happens on screen
+WEB_POLL_INTERVAL = 0.05  # the web build can't block on events, it checks for them this often while idle
 IMAGES = {}
+BOARD_COLORS = [p.Color("white"), p.Color("gray")]
+board_surface = None  # the empty board, see getBoardSurface
+HIGHLIGHT_SURFACES = {}  # color -> translucent square, see getHighlightSurface
+background = None  # the title screen background scaled to the window, see getBackground
 
 
 def loadImages():
     """
     Initialize a global directory of images.
-    This will be called exactly once in the main.
+    The pieces come from the sprite atlas for SQUARE_SIZE, they are only loaded the first time.
     """
-    pieces = ['wp', 'wR', 'wN', 'wB', 'wK', 'wQ', 'bp', 'bR', 'bN', 'bB', 'bK', 'bQ']
-    for piece in pieces:
-        IMAGES[piece] = p.transform.scale(p.image.load("images/" + piece + ".png"), (SQUARE_SIZE, SQUARE_SIZE))
+    if not IMAGES:
+        IMAGES.update(SpriteAtlas.loadAtlas(SQUARE_SIZE))
 
-async def title_screen(screen):
+
+def getPieceImage(piece):
     """
-    Display the title screen with options for single-player, multiplayer, and bot vs bot.
+    The sprite of piece, loading the atlas the first time a piece is drawn.
     """
-    # Fill the screen with black
-    screen.fill(p.Color("black"))
+    loadImages()
+    return IMAGES[piece]
 
-    # Load the background image
-    bg_image = p.image.load("images/background.png")
-    
-    # Get the original dimensions of the image
-    original_width, original_height = bg_image.get_size()
 
-    # Calculate scaling factors
-    scale_x = (BOARD_WIDTH + MOVE_LOG_PANEL_WIDTH) / original_width
-    scale_y = BOARD_HEIGHT / original_height
+def getBackground():
+    """
+    The title screen background, loaded and scaled the first time the title screen is shown.
+    """
+    global background
+    if background is None:
+        bg_image = p.image.load("images/background.png")
+
+        # Get the original dimensions of the image
+        original_width, original_height = bg_image.get_size()
+
+        # Calculate scaling factors
+        scale_x = (BOARD_WIDTH + MOVE_LOG_PANEL_WIDTH) / original_width
+        scale_y = BOARD_HEIGHT / original_height
+
+        # Use the smaller scale factor to maintain aspect ratio
+        scale = min(scale_x, scale_y)
 
-    # Use the smaller scale factor to maintain aspect ratio
-    scale = min(scale_x, scale_y)
+        # Calculate new dimensions
+        new_width = int(original_width * scale)
+        new_height = int(original_height * scale)
 
-    # Calculate new dimensions
-    new_width = int(original_width * scale)
-    new_height = int(original_height * scale)
+        # Scale the image
+        background = p.transform.scale(bg_image, (new_width, new_height)).convert()
+    return background
 
-    # Scale the image
-    bg_image = p.transform.scale(bg_image, (new_width, new_height))
+
+async def title_screen(screen):
+    """
+    Display the title screen with options for single-player, multiplayer, and bot vs bot.
+    """
+    # Fill the screen with black
+    screen.fill(p.Color("black"))
+
+    bg_image = getBackground()
+    new_width, new_height = bg_image.get_size()
 
     # Calculate position to center the image
     bg_x = (BOARD_WIDTH + MOVE_LOG_PANEL_WIDTH) // 2 - new_width // 2
@@ -186,15 +220,19 @@ def button_info(screen):
 
 
 
-async def main():
+async def main(profiler=None):
     """
     The main driver for our code.
     This will handle user input and updating the graphics.
+    profiler is a FrameProfiler.FrameProfiler timing the frames, it is off unless given (F3 shows it anyway).
     """
+    start_time = time.perf_counter()
     p.init()
     screen = p.display.set_mode((BOARD_WIDTH + MOVE_LOG_PANEL_WIDTH, BOARD_HEIGHT))
+    print(f"Startup: {(time.perf_counter() - start_time) * 1000:.0f} ms")  # images load when first drawn
     clock = p.time.Clock()
     screen.fill(p.Color("white"))
+    p.event.set_blocked(p.MOUSEMOTION)  # nothing uses it, and it would wake the idle loop for no reason
 
     flags = {
         "save_flag": False,
@@ -220,9 +258,9 @@ async def main():
 
     game_state = ChessEngine.GameState()
     valid_moves = game_state.getValidMoves()
+    journal = ChessEngine.GameJournal()  # autosaves the game once it has been saved or loaded
     move_made = False
     animate = False
-    loadImages()
     running = True
     square_selected = ()
     player_clicks = []
@@ -230,25 +268,29 @@ async def main():
     ai_thinking = False
     move_undone = False
     move_finder_process = None
-    move_log_font = p.font.SysFont("Arial", 14, False, False)
+    review = None  # review of the finished game, running on worker processes
+    renderer = BoardRenderer()
+    move_log_panel = MoveLogPanel(p.font.SysFont("Arial", 14, False, False))
     last_undo_time = None
     undo_cooldown = 1
+    if profiler is None:
+        profiler = FrameProfiler.FrameProfiler()
 
 
     while running:
+        profiler.startFrame()
         human_turn = (game_state.white_to_move and player_one) or (not game_state.white_to_move and player_two)
         for e in p.event.get():
             if e.type == p.QUIT:
+                profiler.close()
                 p.quit()
                 sys.exit()
 
                         # Check for mouse click and update flags based on button dimensions
             if e.type == p.MOUSEBUTTONDOWN and e.button == 1:  # Left-click
                 mouse_pos = p.mouse.get_pos()
-                button_dimensions = button_info(screen)
-                
                 # Check if the mouse is inside any button's rectangle
-                for flag, rect in button_dimensions.items():
+                for flag, rect in renderer.button_dimensions.items():
                     if rect.collidepoint(mouse_pos):
                         flags[flag] = True  # Set the corresponding flag to True
             # mouse handler
@@ -264,26 +306,36 @@ async def main():
                         square_selected = (row, col)
                         player_clicks.append(square_selected)  # append for both 1st and 2nd click
                     if len(player_clicks) == 2 and human_turn:  # after 2nd click
-                        move = ChessEngine.Move(player_clicks[0], player_clicks[1], game_state.board)
-                        for i in range(len(valid_moves)):
-                            if move == valid_moves[i]:
-                                game_state.makeMove(valid_moves[i])
-                                move_made = True
-                                animate = True
-                                square_selected = ()  # reset user clicks
-                                player_clicks = []
+                        move = valid_moves.getMove(player_clicks[0], player_clicks[1])
+                        if move is not None:
+                            game_state.makeMove(move)
+                            journal.recordMove(move)
+                            move_made = True
+                            animate = True
+                            square_selected = ()  # reset user clicks
+                            player_clicks = []
                         if not move_made:
                             player_clicks = [square_selected]
 
+            # scrolling the move log
+            elif e.type == p.MOUSEWHEEL:
+                if p.mouse.get_pos()[0] >= BOARD_WIDTH:
+                    move_log_panel.scrollBy(-e.y)
+
             # key handler
             elif e.type == p.KEYDOWN:
+                if e.key == p.K_F3:  # frame time overlay
+                    profiler.toggleOverlay()
+                    if profiler.overlay_rect is not None:
+                        renderer.invalidateRect(profiler.overlay_rect)
                 if e.key == p.K_s:  # Save the game when 'S' is pressed
-                    game_state.saveGame()
+                    journal.start(game_state)  # save now and autosave every following move
                     print("Game saved!")
 
                 if e.key == p.K_l:  # Load the game when 'L' is pressed
                     try:
-                        game_state.loadGame()
+                        if game_state.loadGame():
+                            journal.start(game_state)  # keep autosaving into the loaded game
                         valid_moves = game_state.getValidMoves()  # Recalculate valid moves after loading
                         square_selected = ()  # Reset the selection state
                         player_clicks = []    # Reset player clicks
@@ -291,10 +343,19 @@ async def main():
                         animate = False       # No animation to process
                         game_over = False     # Reset game over state
                         print("Game loaded!")
-                    except FileNotFoundError:
-                        print("No saved game found! Press 'S' to save a game first.")
+                    except (OSError, ValueError) as error:  # missing, truncated or corrupted journal
+                        print(f"Could not load the saved game ({error}), starting a new game.")
+                        game_state = ChessEngine.GameState()
+                        journal.close()  # don't append to the broken journal
+                        valid_moves = game_state.getValidMoves()
+                        square_selected = ()
+                        player_clicks = []
+                        move_made = False
+                        animate = False
+                        game_over = False
                 if e.key == p.K_u:  # undo when 'z' is pressed
                     game_state.undoMove()
+                    journal.recordUndo()
                     move_made = True
                     animate = False
                     game_over = False
@@ -305,6 +366,7 @@ async def main():
                     move_undone = True
                 if e.key == p.K_r:  # reset the game when 'r' is pressed
                     game_state = ChessEngine.GameState()
+                    journal.close()  # a new game must not overwrite the saved one
                     valid_moves = game_state.getValidMoves()
                     square_selected = ()
                     player_clicks = []
@@ -318,6 +380,7 @@ async def main():
                 if e.key == p.K_e:  # Exit and return to title screen when 'E' is pressed
                         # Display title screen and set player mode
                     game_mode = await title_screen(screen)
+                    renderer.invalidate()  # the title screen drew over the board
 
                     # Set player types based on game mode
                     if game_mode == "single":
@@ -330,6 +393,7 @@ async def main():
                         player_one = False  # Player one is bot
                         player_two = False  # Player two is also bot
                     game_state = ChessEngine.GameState()  # Reset the game state
+                    journal.close()
                     valid_moves = game_state.getValidMoves()  # Recalculate valid moves after reset
                     square_selected = ()  # Reset selected square
                     player_clicks = []  # Reset player clicks
@@ -340,14 +404,15 @@ async def main():
                     move_undone = False  # Reset move undone state
         
         if flags["save_flag"]:
-            game_state.saveGame()
+            journal.start(game_state)  # save now and autosave every following move
             print("Game saved!")
             flags["save_flag"] = False 
 
         if flags["load_flag"]:  # Load the game when 'L' is pressed
             try:
                 flags["load_flag"] = False
-                game_state.loadGame()
+                if game_state.loadGame():
+                    journal.start(game_state)  # keep autosaving into the loaded game
                 valid_moves = game_state.getValidMoves()  # Recalculate valid moves after loading
                 square_selected = ()  # Reset the selection state
                 player_clicks = []    # Reset player clicks
@@ -355,11 +420,20 @@ async def main():
                 animate = False       # No animation to process
                 game_over = False     # Reset game over state
                 print("Game loaded!")
-            except FileNotFoundError:
-                print("No saved game found! Press 'S' to save a game first.")
+            except (OSError, ValueError) as error:  # missing, truncated or corrupted journal
+                print(f"Could not load the saved game ({error}), starting a new game.")
+                game_state = ChessEngine.GameState()
+                journal.close()  # don't append to the broken journal
+                valid_moves = game_state.getValidMoves()
+                square_selected = ()
+                player_clicks = []
+                move_made = False
+                animate = False
+                game_over = False
         if flags["undo_flag"]:  # undo when 'z' is pressed
             flags["undo_flag"] = False
             game_state.undoMove()
+            journal.recordUndo()
             move_made = True
             animate = False
             game_over = False
@@ -371,6 +445,7 @@ async def main():
         if flags["reset_flag"]:  # reset the game when 'r' is pressed
             flags["reset_flag"] = False
             game_state = ChessEngine.GameState()
+            journal.close()  # a new game must not overwrite the saved one
             valid_moves = game_state.getValidMoves()
             square_selected = ()
             player_clicks = []
@@ -385,6 +460,7 @@ async def main():
                 # Display title screen and set player mode
             flags["exit_flag"] = False
             game_mode = await title_screen(screen)
+            renderer.invalidate()  # the title screen drew over the board
 
             # Set player types based on game mode
             if game_mode == "single":
@@ -397,6 +473,7 @@ async def main():
                 player_one = False  # Player one is bot
                 player_two = False  # Player two is also bot
             game_state = ChessEngine.GameState()  # Reset the game state
+            journal.close()
             valid_moves = game_state.getValidMoves()  # Recalculate valid moves after reset
             square_selected = ()  # Reset selected square
             player_clicks = []  # Reset player clicks
@@ -405,6 +482,7 @@ async def main():
             game_over = False  # Reset game over state
             ai_thinking = False  # Reset AI thinking state
             move_undone = False  # Reset move undone state
+        profiler.lap("events")
 
         # AI move finder
         if not game_over and not human_turn and not move_undone:
@@ -413,55 +491,103 @@ async def main():
                 if last_undo_time is None or time.time() - last_undo_time >= undo_cooldown:
                     ai_thinking = True
                     # Calculate the AI move directly in the main thread
+                    search_start = time.perf_counter()
                     ai_move = ChessAI.findBestMove(game_state, valid_moves)
                     if ai_move is None:
                         ai_move = ChessAI.findRandomMove(valid_moves)
+                    profiler.recordSearch(time.perf_counter() - search_start, ChessAI.nodes_searched, ai_move)
                     game_state.makeMove(ai_move)
+                    journal.recordMove(ai_move)
                     move_made = True
-                    animate = True
+                    animate = player_one or player_two  # bot games run as fast as the bots think
                     ai_thinking = False
                     last_undo_time = None  # Reset cooldown after AI move
                 else:
                     # AI waits for cooldown to expire
                     pass
+        profiler.lap("ai")
 
         if move_made:
             if animate:
                 await animateMove(game_state.move_log[-1], screen, game_state.board, clock)
+                renderer.invalidate()
             valid_moves = game_state.getValidMoves()
             move_made = False
             animate = False
             move_undone = False
+        profiler.lap("animation")
 
-        drawGameState(screen, game_state, valid_moves, square_selected)
-
-        if not game_over:
-            drawMoveLog(screen, game_state, move_log_font)
+        if review is not None and not game_over:  # the game went on after an undo, reset or load
+            review.close()
+            review = None
+        if (game_state.checkmate or game_state.stalemate) and not game_over:
+            review = GameReview.GameReview(game_state)
+        if review is not None:
+            review.poll()
 
+        end_text = None
         if game_state.checkmate:
             game_over = True
             if game_state.white_to_move:
-                drawEndGameText(screen, "Black wins by checkmate")
+                end_text = "Black wins by checkmate"
             else:
-                drawEndGameText(screen, "White wins by checkmate")
+                end_text = "White wins by checkmate"
 
         elif game_state.stalemate:
             game_over = True
-            drawEndGameText(screen, "Stalemate")
-
-        button_info(screen)
-        clock.tick(MAX_FPS)
-        p.display.flip()
+            end_text = "Stalemate"
+
+        profiler.lap("review")
+
+        # only repaint and update what changed
+        dirty_rects = renderer.drawBoard(screen, game_state, valid_moves, square_selected, end_text)
+        profiler.lap("board")
+        if not game_over or review is not None:
+            dirty_rects += renderer.drawPanel(screen, game_state, move_log_panel, review)
+        profiler.lap("panel")
+        if profiler.needsOverlay(dirty_rects):
+            if profiler.overlay_rect is not None:  # repaint what the old overlay covered before drawing a new one
+                renderer.invalidateRect(profiler.overlay_rect)
+                dirty_rects += renderer.drawBoard(screen, game_state, valid_moves, square_selected, end_text)
+            dirty_rects.append(profiler.drawOverlay(screen))
+        profiler.lap("overlay")
+        if dirty_rects:
+            p.display.update(dirty_rects)
+        profiler.lap("update")
+        profiler.endFrame()
+
+        # sleep until the next event when nothing is moving, otherwise run at MAX_FPS
+        human_turn = (game_state.white_to_move and player_one) or (not game_state.white_to_move and player_two)
+        idle_timeout = None
+        if not dirty_rects and (review is None or review.isDone()):
+            if game_over or human_turn:
+                idle_timeout = IDLE_TIMEOUT
+            elif last_undo_time is not None:  # the AI waits for the undo cooldown
+                idle_timeout = max(undo_cooldown - (time.time() - last_undo_time), 0)
+        overlay_timeout = profiler.getOverlayTimeout()
+        if idle_timeout and overlay_timeout is not None:
+            idle_timeout = min(idle_timeout, overlay_timeout)  # wake up for the next overlay refresh
+        if idle_timeout:
+            await waitForEvents(idle_timeout)
+            clock.tick()
+        else:
+            clock.tick(MAX_FPS)
         await asyncio.sleep(0)
 
 
-def drawGameState(screen, game_state, valid_moves, square_selected):
+async def waitForEvents(timeout):
     """
-    Responsible for all the graphics within current game state.
+    Sleep until an event arrives or timeout seconds have passed, leaving the event in the queue.
+    The web build runs in the browser's event loop and must not block, so there it yields to asyncio instead.
     """
-    drawBoard(screen)  # draw squares on the board
-    highlightSquares(screen, game_state, valid_moves, square_selected)
-    drawPieces(screen, game_state.board)  # draw pieces on top of those squares
+    if sys.platform == "emscripten":
+        deadline = time.time() + timeout
+        while not p.event.peek() and time.time() < deadline:
+            await asyncio.sleep(WEB_POLL_INTERVAL)
+    else:
+        event = p.event.wait(max(int(timeout * 1000), 1))  # 0 would wait forever
+        if event.type != p.NOEVENT:
+            p.event.post(event)  # handled by the main loop like any other event
 
 
 def drawBoard(screen):
@@ -469,38 +595,118 @@ def drawBoard(screen):
     Draw the squares on the board.
     The top left square is always light.
     """
-    global colors
-    colors = [p.Color("white"), p.Color("gray")]
-    for row in range(DIMENSION):
-        for column in range(DIMENSION):
-            color = colors[((row + column) % 2)]
-            p.draw.rect(screen, color, p.Rect(column * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+    screen.blit(getBoardSurface(), (0, 0))
+
+
+def getBoardSurface():
+    """
+    The empty board, drawn once and then reused.
+    """
+    global board_surface
+    if board_surface is None:
+        board_surface = p.Surface((BOARD_WIDTH, BOARD_HEIGHT))
+        for row in range(DIMENSION):
+            for column in range(DIMENSION):
+                color = BOARD_COLORS[((row + column) % 2)]
+                p.draw.rect(board_surface, color,
+                            p.Rect(column * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+    return board_surface
+
+
+def getHighlightSurface(color):
+    """
+    A translucent square of the color, made once and then reused.
+    """
+    if color not in HIGHLIGHT_SURFACES:
+        s = p.Surface((SQUARE_SIZE, SQUARE_SIZE))
+        s.set_alpha(100)  # transparency value 0 -> transparent, 255 -> opaque
+        s.fill(p.Color(color))
+        HIGHLIGHT_SURFACES[color] = s
+    return HIGHLIGHT_SURFACES[color]
 
 
-def highlightSquares(screen, game_state, valid_moves, square_selected):
+def getSquareHighlights(game_state, valid_moves, square_selected):
     """
-    Highlight square selected and moves for piece selected.
+    Highlight colors of every highlighted square, in drawing order: the last move's end square green,
+    the selected square blue and the moves for the piece selected yellow.
     """
+    highlights = {}
     if (len(game_state.move_log)) > 0:
         last_move = game_state.move_log[-1]
-        s = p.Surface((SQUARE_SIZE, SQUARE_SIZE))
-        s.set_alpha(100)
-        s.fill(p.Color('green'))
-        screen.blit(s, (last_move.end_col * SQUARE_SIZE, last_move.end_row * SQUARE_SIZE))
+        highlights[(last_move.end_row, last_move.end_col)] = ("green",)
     if square_selected != ():
         row, col = square_selected
         if game_state.board[row][col][0] == (
                 'w' if game_state.white_to_move else 'b'):  # square_selected is a piece that can be moved
-            # highlight selected square
-            s = p.Surface((SQUARE_SIZE, SQUARE_SIZE))
-            s.set_alpha(100)  # transparency value 0 -> transparent, 255 -> opaque
-            s.fill(p.Color('blue'))
-            screen.blit(s, (col * SQUARE_SIZE, row * SQUARE_SIZE))
-            # highlight moves from that square
-            s.fill(p.Color('yellow'))
-            for move in valid_moves:
-                if move.start_row == row and move.start_col == col:
-                    screen.blit(s, (move.end_col * SQUARE_SIZE, move.end_row * SQUARE_SIZE))
+            highlights[(row, col)] = highlights.get((row, col), ()) + ("blue",)
+            for move in valid_moves.movesFrom(row, col):
+                end_square = (move.end_row, move.end_col)
+                highlights[end_square] = highlights.get(end_square, ()) + ("yellow",)
+    return highlights
+
+
+class BoardRenderer:
+    """
+    Draws only what changed since the last frame.
+    Every square is remembered with the piece and highlights it was last drawn with, and only squares that
+    differ are repainted from the cached board surface. The move log panel is repainted when its contents change.
+    """
+
+    def __init__(self):
+        self.squares = {}  # (row, col) -> (piece, highlights, end text) as last drawn
+        self.panel_drawn = False
+        self.button_dimensions = {}
+
+    def invalidate(self):
+        """
+        Repaint everything on the next frame, after something else drew over the window.
+        """
+        self.squares = {}
+        self.panel_drawn = False
+
+    def invalidateRect(self, rect):
+        """
+        Repaint the squares under rect on the next frame.
+        """
+        for row in range(DIMENSION):
+            for column in range(DIMENSION):
+                if rect.colliderect(p.Rect(column * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)):
+                    self.squares.pop((row, column), None)
+
+    def drawBoard(self, screen, game_state, valid_moves, square_selected, end_text=None):
+        """
+        Repaint the squares that changed and return their rectangles.
+        """
+        highlights = getSquareHighlights(game_state, valid_moves, square_selected)
+        dirty_rects = []
+        for row in range(DIMENSION):
+            for column in range(DIMENSION):
+                state = (game_state.board[row][column], highlights.get((row, column), ()), end_text)
+                if self.squares.get((row, column)) == state:
+                    continue
+                self.squares[(row, column)] = state
+                square = p.Rect(column * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+                screen.blit(getBoardSurface(), square, square)
+                for color in state[1]:
+                    screen.blit(getHighlightSurface(color), square)
+                if state[0] != "--":
+                    screen.blit(getPieceImage(state[0]), square)
+                dirty_rects.append(square)
+        if end_text is not None and dirty_rects:  # the text lies on top of the squares
+            dirty_rects.append(drawEndGameText(screen, end_text))
+        return dirty_rects
+
+    def drawPanel(self, screen, game_state, move_log_panel, review=None):
+        """
+        Repaint the move log panel and the buttons if the log, its scrolling or the review changed.
+        Returns the rectangles repainted.
+        """
+        if not move_log_panel.update(game_state, review) and self.panel_drawn:
+            return []
+        self.panel_drawn = True
+        move_log_panel.draw(screen)
+        self.button_dimensions = button_info(screen)
+        return [p.Rect(BOARD_WIDTH, 0, MOVE_LOG_PANEL_WIDTH, MOVE_LOG_PANEL_HEIGHT)]
 
 
 def drawPieces(screen, board):
@@ -511,41 +717,110 @@ def drawPieces(screen, board):
         for column in range(DIMENSION):
             piece = board[row][column]
             if piece != "--":
-                screen.blit(IMAGES[piece], p.Rect(column * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+                square = p.Rect(column * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+                screen.blit(getPieceImage(piece), square)
 
 
-def drawMoveLog(screen, game_state, font):
+class MoveLogPanel:
     """
-    Draws the move log.
-
+    The move log, three moves per line.
+    Move strings and rendered lines are cached, and only the lines from the first changed move on are rendered
+    again, so adding a move costs the same however long the game is. Only the lines in view are drawn, and the
+    log scrolls with the mouse wheel, following the last move unless scrolled back.
+    Once the game has been reviewed, moves are marked ?! (inaccuracy), ? (mistake) or ?? (blunder).
     """
-    move_log_rect = p.Rect(BOARD_WIDTH, 0, MOVE_LOG_PANEL_WIDTH, MOVE_LOG_PANEL_HEIGHT)
-    p.draw.rect(screen, p.Color('black'), move_log_rect)
-    move_log = game_state.move_log
-    move_texts = []
-    for i in range(0, len(move_log), 2):
-        move_string = str(i // 2 + 1) + '. ' + str(move_log[i]) + " "
-        if i + 1 < len(move_log):
-            move_string += str(move_log[i + 1]) + "  "
-        move_texts.append(move_string)
-
-    moves_per_row = 3
+    plies_per_line = 6
     padding = 5
     line_spacing = 2
-    text_y = padding
-    for i in range(0, len(move_texts), moves_per_row):
-        text = ""
-        for j in range(moves_per_row):
-            if i + j < len(move_texts):
-                text += move_texts[i + j]
 
-        text_object = font.render(text, True, p.Color('white'))
-        text_location = move_log_rect.move(padding, text_y)
-        screen.blit(text_object, text_location)
-        text_y += text_object.get_height() + line_spacing
+    def __init__(self, font):
+        self.font = font
+        self.line_height = font.get_height() + self.line_spacing
+        self.visible_lines = (MOVE_LOG_PANEL_HEIGHT - 2 * self.padding) // self.line_height
+        self.moves = []  # the moves the cached strings were made from
+        self.move_strings = []  # one per ply, with its review annotation
+        self.review = None
+        self.reviewed_plies = set()  # plies whose review result is in move_strings
+        self.lines = []  # (text, rendered line) for every line of the log
+        self.summary = []  # (text, rendered line) for the review summary below the log
+        self.scroll = 0  # first line in view
+        self.follow = True  # keep the last line in view as moves are added
+        self.changed = True
+
+    def update(self, game_state, review=None):
+        """
+        Bring the cached lines up to date with the move log and the review.
+        Returns True if the panel has to be drawn again.
+        """
+        move_log = game_state.move_log
+        # moves are only added or taken back at the end, unless it's another game altogether
+        first_changed = min(len(self.moves), len(move_log))
+        while first_changed > 0 and self.moves[first_changed - 1] is not move_log[first_changed - 1]:
+            first_changed -= 1
+        review_changed = review is not self.review
+        if review_changed:
+            self.review = review
+            self.reviewed_plies = set()
+            first_changed = 0
+        if review is not None and len(review.results) != len(self.reviewed_plies):
+            for ply in review.results:
+                if ply not in self.reviewed_plies:
+                    self.reviewed_plies.add(ply)
+                    first_changed = min(first_changed, ply)
+            review_changed = True
+        if first_changed == len(self.moves) == len(move_log) and not review_changed and not self.changed:
+            return False
+
+        del self.moves[first_changed:]
+        del self.move_strings[first_changed:]
+        for ply in range(first_changed, len(move_log)):
+            self.moves.append(move_log[ply])
+            self.move_strings.append(str(move_log[ply]) + (review.getAnnotation(ply) if review else ""))
+        line_count = (len(move_log) + self.plies_per_line - 1) // self.plies_per_line
+        del self.lines[line_count:]
+        for line in range(first_changed // self.plies_per_line, line_count):
+            text = ""
+            for ply in range(line * self.plies_per_line, min((line + 1) * self.plies_per_line, len(move_log)), 2):
+                text += str(ply // 2 + 1) + '. ' + self.move_strings[ply] + " "
+                if ply + 1 < len(move_log):
+                    text += self.move_strings[ply + 1] + "  "
+            if line == len(self.lines):
+                self.lines.append((text, self.font.render(text, True, p.Color('white'))))
+            elif self.lines[line][0] != text:
+                self.lines[line] = (text, self.font.render(text, True, p.Color('white')))
+        if review_changed:
+            self.summary = [(text, self.font.render(text, True, p.Color('yellow')))
+                            for text in (review.getSummary() if review is not None else [])]
+        if self.follow:
+            self.scroll = self.getLastScroll()
+        self.changed = False
+        return True
+
+    def getLastScroll(self):
+        return max(0, len(self.lines) + len(self.summary) - self.visible_lines)
+
+    def scrollBy(self, lines):
+        self.scroll = min(max(self.scroll + lines, 0), self.getLastScroll())
+        self.follow = self.scroll == self.getLastScroll()
+        self.changed = True
+
+    def draw(self, screen):
+        """
+        Draws the lines in view.
+        """
+        move_log_rect = p.Rect(BOARD_WIDTH, 0, MOVE_LOG_PANEL_WIDTH, MOVE_LOG_PANEL_HEIGHT)
+        p.draw.rect(screen, p.Color('black'), move_log_rect)
+        text_y = self.padding
+        for index in range(self.scroll, min(self.scroll + self.visible_lines, len(self.lines) + len(self.summary))):
+            text_object = self.lines[index][1] if index < len(self.lines) else self.summary[index - len(self.lines)][1]
+            screen.blit(text_object, move_log_rect.move(self.padding, text_y))
+            text_y += self.line_height
 
 
 def drawEndGameText(screen, text):
+    """
+    Draw the text in the middle of the board and return the rectangle it covers.
+    """
     font = p.font.SysFont("Helvetica", 32, True, False)
     text_object = font.render(text, False, p.Color("gray"))
     text_location = p.Rect(0, 0, BOARD_WIDTH, BOARD_HEIGHT).move(BOARD_WIDTH / 2 - text_object.get_width() / 2,
@@ -553,38 +828,110 @@ def drawEndGameText(screen, text):
     screen.blit(text_object, text_location)
     text_object = font.render(text, False, p.Color('black'))
     screen.blit(text_object, text_location.move(2, 2))
+    return p.Rect(text_location.x, text_location.y, text_object.get_width() + 2, text_object.get_height() + 2)
 
 
 async def animateMove(move, screen, board, clock):
     """
-    Animating a move
+    Animating a move.
+    The piece slides at SECONDS_PER_SQUARE, but never takes longer than MAX_ANIMATION_TIME. The board without
+    the moving piece is drawn once, and every frame only restores the piece's last position and draws it again.
+    A key press or click skips the rest of the animation and is then handled as usual.
     """
-    global colors
     d_row = move.end_row - move.start_row
     d_col = move.end_col - move.start_col
-    frames_per_square = 10  # frames to move one square
-    frame_count = (abs(d_row) + abs(d_col)) * frames_per_square
-    for frame in range(frame_count + 1):
-        row, col = (move.start_row + d_row * frame / frame_count, move.start_col + d_col * frame / frame_count)
-        drawBoard(screen)
-        drawPieces(screen, board)
-        # erase the piece moved from its ending square
-        color = colors[(move.end_row + move.end_col) % 2]
-        end_square = p.Rect(move.end_col * SQUARE_SIZE, move.end_row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
-        p.draw.rect(screen, color, end_square)
-        # draw captured piece onto rectangle
-        if move.piece_captured != '--':
-            if move.is_enpassant_move:
-                enpassant_row = move.end_row + 1 if move.piece_captured[0] == 'b' else move.end_row - 1
-                end_square = p.Rect(move.end_col * SQUARE_SIZE, enpassant_row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
-            screen.blit(IMAGES[move.piece_captured], end_square)
-        # draw moving piece
-        screen.blit(IMAGES[move.piece_moved], p.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
-        p.display.flip()
+    duration = min(math.hypot(d_row, d_col) * SECONDS_PER_SQUARE, MAX_ANIMATION_TIME)
+    # the board as it is after the move, minus the moving piece and with the captured piece still there
+    snapshot = getBoardSurface().copy()
+    drawPieces(snapshot, board)
+    end_square = p.Rect(move.end_col * SQUARE_SIZE, move.end_row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+    snapshot.blit(getBoardSurface(), end_square, end_square)
+    if move.piece_captured != '--':
+        if move.is_enpassant_move:
+            enpassant_row = move.end_row + 1 if move.piece_captured[0] == 'b' else move.end_row - 1
+            end_square = p.Rect(move.end_col * SQUARE_SIZE, enpassant_row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+        snapshot.blit(getPieceImage(move.piece_captured), end_square)
+    screen.blit(snapshot, (0, 0))
+    p.display.update(snapshot.get_rect())
+
+    start_time = time.perf_counter()
+    piece_rect = None
+    while True:
+        progress = min((time.perf_counter() - start_time) / duration, 1) if duration > 0 else 1
+        if p.event.peek((p.KEYDOWN, p.MOUSEBUTTONDOWN)):
+            progress = 1
+        dirty_rects = []
+        if piece_rect is not None:
+            screen.blit(snapshot, piece_rect, piece_rect)  # erase the piece from its last position
+            dirty_rects.append(piece_rect)
+        piece_rect = p.Rect(round((move.start_col + d_col * progress) * SQUARE_SIZE),
+                            round((move.start_row + d_row * progress) * SQUARE_SIZE), SQUARE_SIZE, SQUARE_SIZE)
+        screen.blit(getPieceImage(move.piece_moved), piece_rect)
+        dirty_rects.append(piece_rect)
+        p.display.update(dirty_rects)
+        if progress >= 1:
+            break
         clock.tick(60)
         await asyncio.sleep(0)
 
 
+def runHeadless(games, white, black, opening=ChessEngine.START_FEN, max_plies=Tournament.MAX_PLIES,
+                output="headless_games.pgn"):
+    """
+    Bot vs bot without a window: every game is played as fast as the engines search, without frames,
+    animation or pygame, and written to output as PGN with the time of every move.
+    Prints the time per move and the moves per second of all games.
+    """
+    Tournament.initWorker()
+    total_moves = 0
+    total_time = 0.0
+    start_time = time.perf_counter()
+    with open(output, "w") as file:
+        for index in range(games):
+            game = Tournament.playGame(white, black, opening, max_plies, seed=index)
+            game_state = ChessEngine.GameState.fromFEN(opening)
+            san_moves = []
+            for notation in game["moves"]:
+                move = next(move for move in game_state.getValidMoves() if move.getUCINotation() == notation)
+                san_moves.append(ChessPGN.getSAN(game_state, move))
+                game_state.makeMove(move)
+            headers = {"Event": "Headless bot vs bot", "Site": "main.py",
+                       "Date": datetime.date.today().strftime("%Y.%m.%d"), "Round": str(index + 1),
+                       "White": describeEngine(white), "Black": describeEngine(black), "Termination": game["reason"]}
+            if opening != ChessEngine.START_FEN:
+                headers.update({"SetUp": "1", "FEN": opening})
+            ChessPGN.writePGN(file, headers, san_moves, game["result"],
+                              [f"[%emt {seconds:.3f}]" for seconds in game["move_times"]])
+            file.flush()
+            game_time = sum(game["move_times"])
+            total_moves += game["plies"]
+            total_time += game_time
+            print(f"Game {index + 1}: {game['result']} ({game['reason']}), {game['plies']} plies, "
+                  f"{1000 * game_time / max(game['plies'], 1):.1f} ms per move")
+    print(f"{games} games, {total_moves} moves in {time.perf_counter() - start_time:.1f} s: "
+          f"{1000 * total_time / max(total_moves, 1):.1f} ms per move, "
+          f"{total_moves / total_time if total_time else 0:.1f} moves/s. PGN written to {output}")
+
+
+def describeEngine(config):
+    return f"ChessAI depth {config['depth']}" + (f" ({config['parameters']})" if config["parameters"] else "")
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Play chess, or let the AI play itself without a window.")
+    parser.add_argument("--headless", action="store_true", help="play bot vs bot games without a window")
+    parser.add_argument("--games", type=int, default=1)
+    parser.add_argument("--white", default="", help='engine settings, e.g. "depth=3,parameters=tuned.json"')
+    parser.add_argument("--black", default="")
+    parser.add_argument("--fen", default=ChessEngine.START_FEN, help="starting position")
+    parser.add_argument("--max-plies", type=int, default=Tournament.MAX_PLIES)
+    parser.add_argument("--output", default="headless_games.pgn", help="PGN file for the headless games")
+    parser.add_argument("--stats", action="store_true", help="time the frames and AI moves, F3 shows them")
+    parser.add_argument("--profile-frames", type=int, default=0, help="capture this many frames with cProfile")
+    parser.add_argument("--profile-output", default="frames.prof")
+    args = parser.parse_args()
+    if args.headless:
+        runHeadless(args.games, Tournament.parseEngine(args.white, "white"), Tournament.parseEngine(args.black, "black"),
+                    args.fen, args.max_plies, args.output)
+    else:
+        asyncio.run(main(FrameProfiler.FrameProfiler(args.stats, args.profile_frames, args.profile_output)))
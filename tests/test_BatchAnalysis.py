@@ -0,0 +1,46 @@
+import json
+import BatchAnalysis
+
+POSITIONS = """rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - id "start";
+# a comment
+8/5k2/8/3P4/8/8/2K5/8 w - - id "pawn";
+6k1/5ppp/8/8/8/8/8/R5K1 w - - id "mate";
+"""
+
+
+def readResults(output):
+    with open(output) as file:
+        return [json.loads(line) for line in file]
+
+
+def test_analyse(tmp_path):
+    positions = tmp_path / "positions.epd"
+    positions.write_text(POSITIONS)
+    output = str(tmp_path / "analysis.jsonl")
+    BatchAnalysis.analyse(str(positions), output, depth=1, processes=1)
+    results = readResults(output)
+    assert [result["id"] for result in results] == ["start", "pawn", "mate"]
+    assert results[2]["best_move"] == "a1a8"
+
+
+def test_resume_skips_checkpointed_positions(tmp_path):
+    positions = tmp_path / "positions.epd"
+    positions.write_text(POSITIONS)
+    output = str(tmp_path / "analysis.jsonl")
+    BatchAnalysis.analyse(str(positions), output, depth=1, processes=1)
+    with open(output) as file:
+        first_line = file.readline()
+    with open(output, "w") as file:  # as if the run stopped after the first checkpoint
+        file.write(first_line + '{"id": "half written')
+    BatchAnalysis.writeCheckpoint(output + ".checkpoint", 1, len(first_line))
+    BatchAnalysis.analyse(str(positions), output, depth=1, processes=1, resume=True)
+    assert [result["id"] for result in readResults(output)] == ["start", "pawn", "mate"]
+
+
+def test_resume_restarts_without_output(tmp_path):
+    positions = tmp_path / "positions.epd"
+    positions.write_text(POSITIONS)
+    output = tmp_path / "analysis.jsonl"
+    BatchAnalysis.writeCheckpoint(str(output) + ".checkpoint", 2, 500)
+    BatchAnalysis.analyse(str(positions), str(output), depth=1, processes=1, resume=True)
+    assert [result["id"] for result in readResults(output)] == ["start", "pawn", "mate"]
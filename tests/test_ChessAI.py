@@ -0,0 +1,80 @@
+import pytest
+import ChessAI
+import ChessEngine
+from tests.test_ChessEngine import playRandomGame
+
+MATE_IN_ONE = "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"
+
+
+def test_find_best_moves():
+    game_state = ChessEngine.GameState.fromFEN(MATE_IN_ONE)
+    lines = ChessAI.findBestMoves(game_state, game_state.getValidMoves(), 3, 2)
+    assert len(lines) == 3
+    assert lines[0][0].getUCINotation() == "a1a8"
+    assert [score for move, score, line in lines] == sorted((score for move, score, line in lines), reverse=True)
+    for move, score, line in lines:
+        assert line[0] == move
+    assert game_state.toFEN() == MATE_IN_ONE
+
+
+def test_find_best_moves_reports_every_depth():
+    game_state = ChessEngine.GameState()
+    iterations = []
+    lines = ChessAI.findBestMoves(game_state, game_state.getValidMoves(), 2, 2,
+                                  on_iteration=lambda depth, lines: iterations.append((depth, len(lines))))
+    assert iterations == [(1, 2), (2, 2)]
+    assert len({move.getUCINotation() for move, score, line in lines}) == 2
+
+
+def test_find_best_moves_with_fewer_moves_than_lines():
+    game_state = ChessEngine.GameState.fromFEN("7k/8/8/8/8/8/8/K7 w - - 0 1")
+    assert len(ChessAI.findBestMoves(game_state, game_state.getValidMoves(), 5, 1)) == 3
+
+
+def test_mate_scores_count_the_plies_to_mate():
+    game_state = ChessEngine.GameState.fromFEN("7k/8/8/8/8/8/R7/1R4K1 w - - 0 1")
+    for depth in (3, 4):
+        best_move, score, line = ChessAI.findBestMoveIterative(game_state, game_state.getValidMoves(), depth)
+        assert score == ChessAI.CHECKMATE - 3
+        assert ChessAI.getMateMoves(score) == 2
+
+
+def test_get_mate_moves():
+    assert ChessAI.getMateMoves(ChessAI.CHECKMATE - 1) == 1
+    assert ChessAI.getMateMoves(-(ChessAI.CHECKMATE - 2)) == -1
+    assert ChessAI.getMateMoves(9.5) is None
+
+
+def test_order_moves_by_exchange():
+    game_state = ChessEngine.GameState.fromFEN("4k3/8/2p5/3p4/n7/8/8/3QK3 w - - 0 1")
+    ordered = [move.getUCINotation() for move in ChessAI.orderMoves(game_state, game_state.getValidMoves())]
+    assert ordered[0] == "d1a4"  # the winning capture comes first
+    assert ordered[-1] == "d1d5"  # the losing capture comes last
+
+
+def test_quiescence_skips_losing_captures(monkeypatch):
+    game_state = ChessEngine.GameState.fromFEN("4k3/8/2p5/3p4/8/8/8/3QK3 w - - 0 1")
+    monkeypatch.setattr(ChessAI, "search_depth", 1)
+    score = ChessAI.findMoveQuiescence(game_state, game_state.getValidMoves(), ChessAI.QUIESCENCE_DEPTH,
+                                       -ChessAI.CHECKMATE, ChessAI.CHECKMATE, 1)
+    assert score == ChessAI.scoreBoard(game_state)  # standing pat beats Qxd5
+
+
+@pytest.mark.parametrize("fen, score", [
+    ("4k3/8/8/8/8/P7/P7/4K3 w - - 0 1", -0.2 - 2 * 0.15 + 0.05),  # doubled, isolated, the front pawn passed
+    ("4k3/8/8/3p4/3P4/8/8/4K3 w - - 0 1", 0.0),  # blocked isolated pawns cancel out
+    ("4k3/1P6/8/8/8/8/6p1/4K3 w - - 0 1", 0.0),  # passed on the seventh for both sides
+    ("4k3/8/8/8/8/8/PP6/4K3 w - - 0 1", 0.0),  # two connected pawns on their starting squares
+])
+def test_score_pawn_structure(fen, score):
+    game_state = ChessEngine.GameState.fromFEN(fen)
+    assert ChessAI.scorePawnStructure(game_state.board) == pytest.approx(score)
+
+
+def test_pawn_hash_matches_pawn_structure():
+    for seed in range(10):
+        game_state = playRandomGame(ChessEngine.GameState(), 40, seed)
+        assert ChessAI.probePawnHash(game_state) == ChessAI.scorePawnStructure(game_state.board)
+        hits = ChessAI.pawn_hash_hits
+        assert ChessAI.probePawnHash(game_state) == ChessAI.scorePawnStructure(game_state.board)
+        assert ChessAI.pawn_hash_hits == hits + 1
@@ -0,0 +1,262 @@
+import random
+import pytest
+import ChessEngine
+
+POSITIONS = [
+    ChessEngine.START_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "rnbqkbnr/ppp1pppp/8/8/3pP3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 3",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 12 40",
+]
+
+
+def playRandomGame(game_state, plies, seed):
+    generator = random.Random(seed)
+    for ply in range(plies):
+        valid_moves = game_state.getValidMoves()
+        if not valid_moves:
+            break
+        game_state.makeMove(generator.choice(valid_moves))
+    return game_state
+
+
+def findMove(game_state, notation):
+    return next(move for move in game_state.getValidMoves() if move.getUCINotation() == notation)
+
+
+@pytest.mark.parametrize("fen", POSITIONS)
+def test_fen_round_trip(fen):
+    assert ChessEngine.GameState.fromFEN(fen).toFEN() == fen
+
+
+def test_fen_without_clocks():
+    game_state = ChessEngine.GameState.fromFEN("8/5k2/8/3P4/8/8/2K5/8 b - -")
+    assert game_state.toFEN() == "8/5k2/8/3P4/8/8/2K5/8 b - - 0 1"
+    assert game_state.getClocks() == (0, 1)
+
+
+@pytest.mark.parametrize("epd, fen", [
+    ('8/5k2/8/3P4/8/8/2K5/8 w - - bm Kd3; id "x";', "8/5k2/8/3P4/8/8/2K5/8 w - - 0 1"),
+    ("8/5k2/8/3P4/8/8/2K5/8 w - - 4 30 bm Kd3;", "8/5k2/8/3P4/8/8/2K5/8 w - - 4 30"),
+])
+def test_epd_opcodes_are_not_clocks(epd, fen):
+    assert ChessEngine.GameState.fromFEN(epd).toFEN() == fen
+
+
+def test_fen_clocks_follow_moves():
+    game_state = ChessEngine.GameState()
+    for notation in ["g1f3", "g8f6", "f3g1"]:
+        game_state.makeMove(findMove(game_state, notation))
+    assert game_state.toFEN() == "rnbqkb1r/pppppppp/5n2/8/8/8/PPPPPPPP/RNBQKBNR b KQkq - 3 2"
+
+
+@pytest.mark.parametrize("fen", [
+    "",
+    "8/8/8 w - -",
+    "rnbqkbnr/ppppxppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -",
+    "8/5k2/8/3P4/8/8/2K5/8 x - -",
+    "8/5k2/8/3P4/8/8/2K5/8 w KX -",
+    "8/5k2/8/3P4/8/8/2K5/8 w - z9",
+    "8/5k2/8/3P4/8/8/2K5/8 w - - a b",
+    "8/5k2/8/3P4/8/8/2K5/8 w - - 5",
+])
+def test_invalid_fen(fen):
+    with pytest.raises(ValueError):
+        ChessEngine.GameState.fromFEN(fen)
+
+
+def test_parse_fen_line():
+    fen, operations = ChessEngine.parseFENLine('8/5k2/8/3P4/8/8/2K5/8 w - - bm Kd3; id "test 1";')
+    assert fen == "8/5k2/8/3P4/8/8/2K5/8 w - -"
+    assert operations == {"bm": "Kd3", "id": "test 1"}
+    assert ChessEngine.parseFENLine("# comment") is None
+
+
+def test_read_fen_file(tmp_path):
+    filename = tmp_path / "positions.epd"
+    filename.write_text("\n".join(POSITIONS[1:]) + '\n# comment\n\n8/5k2/8/3P4/8/8/2K5/8 w - - id "last";\n')
+    positions = ChessEngine.readFENFile(str(filename))
+    game_state, operations = next(positions)  # lazy, one line at a time
+    assert game_state.toFEN() == POSITIONS[1]
+    rest = list(positions)
+    assert [game_state.toFEN() for game_state, operations in rest[:2]] == POSITIONS[2:]
+    assert len(rest) == 3 and rest[2][1] == {"id": "last"}
+
+
+def test_journal_round_trip(tmp_path):
+    filename = str(tmp_path / "game.journal")
+    game_state = playRandomGame(ChessEngine.GameState(), 10, 1)
+    journal = ChessEngine.GameJournal(filename)
+    journal.start(game_state)
+    for ply in range(6):
+        move = game_state.getValidMoves()[0]
+        game_state.makeMove(move)
+        journal.recordMove(move)
+    game_state.undoMove()
+    journal.recordUndo()
+    journal.close()
+    loaded = ChessEngine.GameState()
+    assert loaded.loadGame(filename)
+    assert loaded.toFEN() == game_state.toFEN()
+    assert len(loaded.move_log) == len(game_state.move_log)
+
+
+def test_journal_from_fen(tmp_path):
+    filename = str(tmp_path / "game.journal")
+    game_state = ChessEngine.GameState.fromFEN(POSITIONS[3])
+    game_state.saveGame(filename)
+    loaded = ChessEngine.GameState()
+    assert loaded.loadGame(filename)
+    assert loaded.toFEN() == POSITIONS[3]
+
+
+def test_load_corrupt_journal(tmp_path):
+    filename = tmp_path / "game.journal"
+    filename.write_bytes(ChessEngine.START_FEN.encode("ascii") + b"\n" + ChessEngine.move_code.pack(0))
+    with pytest.raises(ValueError):
+        ChessEngine.GameState().loadGame(str(filename))
+
+
+def test_load_missing_game(tmp_path):
+    assert not ChessEngine.GameState().loadGame(str(tmp_path / "missing.journal"))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_zobrist_keys_follow_moves(seed):
+    game_state = ChessEngine.GameState.fromFEN(POSITIONS[1])
+    generator = random.Random(seed)
+    for ply in range(60):
+        valid_moves = game_state.getValidMoves()
+        if not valid_moves:
+            break
+        game_state.makeMove(generator.choice(valid_moves))
+        assert game_state.position_key == game_state.computePositionKey()
+        assert game_state.pawn_key == game_state.computePawnKey()
+    while game_state.move_log:
+        game_state.undoMove()
+        assert game_state.position_key == game_state.computePositionKey()
+        assert game_state.pawn_key == game_state.computePawnKey()
+    assert game_state.toFEN() == POSITIONS[1]
+
+
+def test_zobrist_key_includes_side_to_move():
+    white = ChessEngine.GameState.fromFEN("8/5k2/8/3P4/8/8/2K5/8 w - -")
+    black = ChessEngine.GameState.fromFEN("8/5k2/8/3P4/8/8/2K5/8 b - -")
+    assert white.position_key != black.position_key
+    assert white.pawn_key == black.pawn_key
+
+
+def test_move_cache_is_off_by_default():
+    assert ChessEngine.GameState().move_cache is None
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_move_cache_hit_matches_generated_moves(seed):
+    cached = ChessEngine.GameState.fromFEN(POSITIONS[1])
+    cached.enableMoveCache(64)
+    uncached = ChessEngine.GameState.fromFEN(POSITIONS[1])
+    generator = random.Random(seed)
+    for ply in range(40):
+        cached.getValidMoves()  # fill the cache, so the next call is a hit
+        cached_moves = cached.getValidMoves()
+        valid_moves = uncached.getValidMoves()
+        assert [move.getMoveCode() for move in cached_moves] == [move.getMoveCode() for move in valid_moves]
+        for attribute in ("in_check", "checkmate", "stalemate", "pins", "checks"):
+            assert getattr(cached, attribute) == getattr(uncached, attribute)
+        if not valid_moves:
+            break
+        move = generator.choice(valid_moves)
+        cached.makeMove(next(cached_move for cached_move in cached_moves if cached_move == move))
+        uncached.makeMove(move)
+    assert cached.move_cache.hits > 0
+
+
+def test_move_cache_is_bounded():
+    move_cache = ChessEngine.MoveCache(2)
+    for key in range(3):
+        move_cache.put(key, ([], False, False, False, (), ()))
+    assert move_cache.get(0) is None
+    assert move_cache.get(2) is not None
+
+
+@pytest.mark.parametrize("fen, notation, exchange", [
+    ("4k3/8/4p3/3n4/4P3/8/8/4K3 w - - 0 1", "e4d5", 2),  # pawn takes knight, pawn takes back
+    ("4k3/8/2p5/3p4/8/8/8/3QK3 w - - 0 1", "d1d5", -8),  # queen takes a defended pawn
+    ("3rk3/8/8/3p4/8/8/8/3RK3 w - - 0 1", "d1d5", -4),  # the rook behind the pawn defends it through it
+    ("3rk3/8/8/3p4/8/8/3R4/3RK3 w - - 0 1", "d2d5", 1),  # doubled rooks win the pawn
+    ("4k3/8/8/3n4/8/8/8/3RK3 w - - 0 1", "d1d5", 3),  # undefended knight
+])
+def test_static_exchange(fen, notation, exchange):
+    game_state = ChessEngine.GameState.fromFEN(fen)
+    assert game_state.staticExchange(findMove(game_state, notation)) == exchange
+    assert game_state.toFEN() == fen
+
+
+def test_move_list_lookups():
+    valid_moves = ChessEngine.GameState().getValidMoves()
+    assert isinstance(valid_moves, ChessEngine.MoveList)
+    assert sorted(move.getUCINotation() for move in valid_moves.movesFrom(7, 1)) == ["b1a3", "b1c3"]
+    assert valid_moves.movesFrom(4, 4) == []
+    assert valid_moves.getMove((6, 4), (4, 4)).getUCINotation() == "e2e4"
+    assert valid_moves.getMove([6, 4], [4, 4]) is valid_moves.getMove((6, 4), (4, 4))  # clicks come as lists
+    assert valid_moves.getMove((6, 4), (3, 4)) is None
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_move_list_lookups_cover_every_move(seed):
+    game_state = playRandomGame(ChessEngine.GameState.fromFEN(POSITIONS[1]), 20, seed)
+    valid_moves = game_state.getValidMoves()
+    from_squares = [move for row in range(8) for col in range(8) for move in valid_moves.movesFrom(row, col)]
+    assert sorted(move.getMoveCode() for move in from_squares) == sorted(move.getMoveCode() for move in valid_moves)
+    for move in valid_moves:
+        assert valid_moves.getMove((move.start_row, move.start_col), (move.end_row, move.end_col)) is move
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_snapshot_round_trip(seed):
+    game_state = playRandomGame(ChessEngine.GameState(), 30 + seed, seed)
+    restored = ChessEngine.GameState.fromSnapshot(game_state.toSnapshot())
+    assert restored.toFEN() == game_state.toFEN()
+    assert restored.position_key == game_state.position_key == restored.computePositionKey()
+    assert restored.pawn_key == game_state.pawn_key
+    assert [move.getMoveCode() for move in restored.getValidMoves()] == \
+        [move.getMoveCode() for move in game_state.getValidMoves()]
+
+
+def test_snapshot_sets_up_every_attribute():
+    restored = ChessEngine.GameState.fromSnapshot(ChessEngine.GameState().toSnapshot(), move_cache_size=16)
+    assert restored.__dict__.keys() == ChessEngine.GameState().__dict__.keys()
+    assert restored.move_cache.size == 16
+
+
+def test_snapshot_rejects_large_clocks():
+    with pytest.raises(ValueError):
+        ChessEngine.GameState.fromFEN("8/5k2/8/3P4/8/8/2K5/8 w - - 0 70000").toSnapshot()
+
+
+def test_snapshot_buffer():
+    positions = ChessEngine.SnapshotBuffer(slots=2)
+    try:
+        attached = ChessEngine.SnapshotBuffer(name=positions.name)
+        game_state = ChessEngine.GameState.fromFEN(POSITIONS[2])
+        positions.write(1, game_state)
+        assert attached.slots == 2
+        assert attached.read(1).toFEN() == POSITIONS[2]
+        attached.close()
+    finally:
+        positions.close()
+        positions.unlink()
+
+
+def test_constructors_skip_the_start_position(monkeypatch):
+    snapshot = ChessEngine.GameState.fromFEN(POSITIONS[3]).toSnapshot()
+
+    def unexpectedInit(self):
+        raise AssertionError("__init__ called")
+    monkeypatch.setattr(ChessEngine.GameState, "__init__", unexpectedInit)
+    assert ChessEngine.GameState.fromFEN(POSITIONS[3]).toFEN() == POSITIONS[3]
+    assert ChessEngine.GameState.fromSnapshot(snapshot).toFEN() == POSITIONS[3]
+
+
+def test_from_fen_sets_up_every_attribute():
+    assert ChessEngine.GameState.fromFEN(POSITIONS[1]).__dict__.keys() == ChessEngine.GameState().__dict__.keys()
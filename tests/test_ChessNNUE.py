@@ -0,0 +1,62 @@
+import random
+import numpy as np
+import pytest
+import ChessEngine
+import ChessNNUE
+from tests.test_ChessEngine import POSITIONS, findMove
+
+
+def freshEvaluation(weights, game_state):
+    evaluator = ChessNNUE.NNUEEvaluator(weights)
+    evaluator.refresh(game_state.board)
+    return evaluator
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_accumulator_matches_refresh(seed):
+    weights = ChessNNUE.createWeights(seed=seed)
+    game_state = ChessEngine.GameState.fromFEN(POSITIONS[1])
+    evaluator = ChessNNUE.NNUEEvaluator(weights)
+    game_state.setEvaluator(evaluator)
+    generator = random.Random(seed)
+    for ply in range(60):
+        valid_moves = game_state.getValidMoves()
+        if not valid_moves:
+            break
+        game_state.makeMove(generator.choice(valid_moves))
+        fresh = freshEvaluation(weights, game_state)
+        assert np.allclose(evaluator.accumulators[-1], fresh.accumulators[-1], atol=1e-4)
+        assert evaluator.evaluate() == pytest.approx(fresh.evaluate(), abs=1e-4)
+    while game_state.move_log:
+        game_state.undoMove()
+        assert np.allclose(evaluator.accumulators[-1], freshEvaluation(weights, game_state).accumulators[-1],
+                           atol=1e-4)
+    assert len(evaluator.accumulators) == 1
+
+
+@pytest.mark.parametrize("fen, notation", [
+    ("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", "e1g1"),
+    ("r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1", "e8c8"),
+    ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", "e5d6"),
+    ("1n2k3/P7/8/8/8/8/8/4K3 w - - 0 1", "a7b8q"),
+])
+def test_accumulator_special_moves(fen, notation):
+    weights = ChessNNUE.createWeights(seed=1)
+    game_state = ChessEngine.GameState.fromFEN(fen)
+    evaluator = ChessNNUE.NNUEEvaluator(weights)
+    game_state.setEvaluator(evaluator)
+    game_state.makeMove(findMove(game_state, notation))
+    assert np.allclose(evaluator.accumulators[-1], freshEvaluation(weights, game_state).accumulators[-1],
+                       atol=1e-4)
+
+
+def test_save_and_load_weights(tmp_path):
+    weights = ChessNNUE.createWeights(hidden_size=8, seed=2)
+    filename = str(tmp_path / "nnue.npz")
+    ChessNNUE.saveWeights(weights, filename)
+    loaded = ChessNNUE.loadWeights(filename)
+    assert all((loaded[name] == weights[name]).all() for name in weights)
+    weights["w2"] = weights["w2"][:4]
+    ChessNNUE.saveWeights(weights, filename)
+    with pytest.raises(ValueError):
+        ChessNNUE.loadWeights(filename)
@@ -0,0 +1,91 @@
+import io
+import ChessEngine
+import ChessPGN
+
+GAME = """[Event "Test"]
+[White "A"]
+[Black "B"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 {a comment} Nc6 (2... d6 3. d4) 3. Bb5 a6 4. Bxc6 dxc6 5. O-O f6 6. d4 exd4
+7. Nxd4 c5 8. Nb3 Qxd1 9. Rxd1 Bg4 10. f3 Be6 11. Nc3 Bd6 12. Be3 Ne7 13. Rd2 O-O 1-0
+"""
+
+
+def replay(moves, fen=ChessEngine.START_FEN):
+    game_state = ChessEngine.GameState.fromFEN(fen)
+    for san in moves:
+        move = ChessPGN.parseSAN(game_state, san)
+        assert move is not None, san
+        game_state.makeMove(move)
+    return game_state
+
+
+def test_read_pgn():
+    (headers, moves), = list(ChessPGN.readPGN(io.StringIO(GAME)))
+    assert headers["White"] == "A" and headers["Result"] == "1-0"
+    assert moves[:4] == ["e4", "e5", "Nf3", "Nc6"]  # comments and variations are skipped
+    assert len(moves) == 26
+    game_state = replay(moves)
+    assert game_state.toFEN() == "r4rk1/1pp1n1pp/p2bbp2/2p5/4P3/1NN1BP2/PPPR2PP/R5K1 w - - 7 14"
+
+
+def test_semicolon_comment_ends_at_the_line():
+    text = "1. e4 e5 ; the king pawn\n2. Nf3 {a; b} Nc6 ; 2... d6\n3. Bb5 *\n"
+    (headers, moves), = list(ChessPGN.readPGN(io.StringIO(text)))
+    assert moves == ["e4", "e5", "Nf3", "Nc6", "Bb5"]
+
+
+def test_parse_san():
+    game_state = ChessEngine.GameState.fromFEN("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    assert ChessPGN.parseSAN(game_state, "O-O").getUCINotation() == "e1g1"
+    assert ChessPGN.parseSAN(game_state, "Rad1").getUCINotation() == "a1d1"
+    assert ChessPGN.parseSAN(game_state, "Rxa8+").getUCINotation() == "a1a8"
+    assert ChessPGN.parseSAN(game_state, "Nf3") is None
+
+
+def test_parse_san_rejects_underpromotion():
+    game_state = ChessEngine.GameState.fromFEN("8/4P3/8/8/8/8/k7/4K3 w - - 0 1")
+    assert ChessPGN.parseSAN(game_state, "e8=Q+").getUCINotation() == "e7e8q"
+    assert ChessPGN.parseSAN(game_state, "e8=N") is None
+
+
+def test_get_san_round_trip():
+    (headers, moves), = list(ChessPGN.readPGN(io.StringIO(GAME)))
+    game_state = ChessEngine.GameState()
+    for san in moves:
+        move = ChessPGN.parseSAN(game_state, san)
+        assert ChessPGN.getSAN(game_state, move).rstrip("+#") == san.rstrip("+#")
+        game_state.makeMove(move)
+
+
+def test_write_pgn_round_trip():
+    (headers, moves), = list(ChessPGN.readPGN(io.StringIO(GAME)))
+    comments = [""] * len(moves)
+    comments[2] = "a comment"
+    file = io.StringIO()
+    ChessPGN.writePGN(file, headers, moves, "1-0", comments)
+    assert "2. Nf3 {a comment} 2... Nc6" in file.getvalue()
+    assert all(len(line) <= 80 for line in file.getvalue().splitlines())
+    (written_headers, written_moves), = list(ChessPGN.readPGN(io.StringIO(file.getvalue())))
+    assert written_headers == headers
+    assert written_moves == moves
+
+
+def test_write_pgn_numbers_moves_from_fen():
+    file = io.StringIO()
+    ChessPGN.writePGN(file, {"FEN": "8/5k2/8/3P4/8/8/2K5/8 b - - 0 40"}, ["Kf6", "Kd3"])
+    assert "40... Kf6 41. Kd3 *" in file.getvalue()
+
+
+def test_write_pgn_fen_without_clocks():
+    file = io.StringIO()
+    ChessPGN.writePGN(file, {"FEN": "8/5k2/8/3P4/8/8/2K5/8 b - -"}, ["Kf6", "Kd3"])
+    assert "1... Kf6 2. Kd3 *" in file.getvalue()
+
+
+def test_read_pgn_positions():
+    positions = list(ChessPGN.readPGNPositions(io.StringIO(GAME + GAME)))
+    assert len(positions) == 52
+    assert positions[0] == (0, 0, ChessEngine.START_FEN, "e4")
+    assert positions[26][:2] == (1, 0)
@@ -0,0 +1,65 @@
+import random
+import numpy as np
+import pytest
+import ChessAI
+import ChessEngine
+import ChessTensor
+
+
+def randomPositions(count, seed):
+    generator = random.Random(seed)
+    positions = []
+    for game in range(count):
+        game_state = ChessEngine.GameState()
+        for ply in range(generator.randint(0, 80)):
+            valid_moves = game_state.getValidMoves()
+            if not valid_moves:
+                break
+            game_state.makeMove(generator.choice(valid_moves))
+        positions.append(game_state)
+    return positions
+
+
+def test_encode_board():
+    planes = ChessTensor.encodeBoard(ChessEngine.GameState())
+    assert planes.shape == (12, 8, 8)
+    assert planes.sum() == 32
+    assert planes[ChessTensor.PIECE_PLANES["wp"], 6].all()
+    assert planes[ChessTensor.PIECE_PLANES["bK"], 0, 4] == 1
+
+
+def test_encode_boards():
+    game_states = randomPositions(5, 1)
+    boards = ChessTensor.encodeBoards(game_states)
+    assert boards.shape == (5, 12, 64)
+    for board, game_state in zip(boards, game_states):
+        assert (board == ChessTensor.encodeBoard(game_state).reshape(12, 64)).all()
+
+
+def test_score_boards_matches_score_board():
+    game_states = [game_state for game_state in randomPositions(30, 2)
+                   if not game_state.checkmate and not game_state.stalemate]
+    scores = ChessTensor.scoreBoards(ChessTensor.encodeBoards(game_states))
+    expected = [ChessAI.scoreBoard(game_state) - ChessAI.scorePawnStructure(game_state.board)
+                for game_state in game_states]
+    assert np.allclose(scores, expected)
+    assert ChessTensor.scoreBoards(ChessTensor.encodeBoards([ChessEngine.GameState()]))[0] == pytest.approx(0)
+
+
+def test_compute_attacks_matches_move_generator():
+    assert ChessTensor.crossCheck(randomPositions(40, 3)) == 0
+
+
+def test_compute_attacks_start_position():
+    attacks, mobility, in_check = ChessTensor.computeAttacks(ChessTensor.encodeSquares([ChessEngine.GameState()]))
+    assert attacks[0, 0, 40:48].all() and not attacks[0, 0, 32:40].any()  # white attacks its third rank only
+    assert attacks[0, 1, 16:24].all()
+    assert mobility[0].sum() == 40  # 20 moves for each side
+    assert not in_check.any()
+
+
+def test_compute_attacks_check():
+    game_state = ChessEngine.GameState.fromFEN("4k3/8/8/8/8/8/8/4RK2 b - - 0 1")
+    attacks, mobility, in_check = ChessTensor.computeAttacks(ChessTensor.encodeSquares([game_state]))
+    assert list(in_check[0]) == [False, True]
+    assert mobility[0, 60] == 11  # the rook: seven squares up to the king, four to the left
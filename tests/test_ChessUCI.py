@@ -0,0 +1,72 @@
+import io
+import ChessUCI
+
+MATE_IN_ONE = "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"
+
+
+def runCommands(*lines):
+    output = io.StringIO()
+    engine = ChessUCI.UCIEngine(output)
+    for line in lines:
+        assert engine.handle(line)
+        if engine.search_thread is not None:
+            engine.search_thread.join()
+    return engine, output.getvalue().splitlines()
+
+
+def test_uci_handshake():
+    engine, output = runCommands("uci", "isready")
+    assert output[0] == "id name " + ChessUCI.ENGINE_NAME
+    assert output[-2:] == ["uciok", "readyok"]
+
+
+def test_position_with_moves():
+    engine, output = runCommands("position startpos moves e2e4 e7e5 g1f3")
+    assert engine.game_state.toFEN() == "rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2"
+    assert output == []
+
+
+def test_position_with_promotion():
+    engine, output = runCommands("position fen 8/4P3/8/8/8/8/k7/4K3 w - - 0 1 moves e7e8q a2b2")
+    assert engine.game_state.toFEN() == "4Q3/8/8/8/8/8/1k6/4K3 w - - 1 2"
+
+
+def test_position_rejects_underpromotion():
+    engine, output = runCommands("position fen 8/4P3/8/8/8/8/k7/4K3 w - - 0 1 moves e7e8n")
+    assert output == ["info string illegal move e7e8n"]
+    assert engine.game_state.board[0][4] == "--"
+
+
+def test_invalid_commands_are_reported():
+    engine, output = runCommands("position fen 8/4P3/8/8/8/8/k7/4K3 w - - 0 1", "setoption name Hash value x",
+                                 "position fen 8/8/8 w - -", "position", "go depth x", "isready")
+    assert [line.split(":")[0] for line in output[:4]] == [
+        "info string error in 'setoption name Hash value x'", "info string error in 'position fen 8/8/8 w - -'",
+        "info string error in 'position'", "info string error in 'go depth x'"]
+    assert output[-1] == "readyok"
+    assert engine.game_state.toFEN() == "8/4P3/8/8/8/8/k7/4K3 w - - 0 1"  # the invalid FEN changed nothing
+
+
+def test_go_finds_mate():
+    engine, output = runCommands(f"position fen {MATE_IN_ONE}", "go depth 2")
+    assert output[-1] == "bestmove a1a8"
+    assert "score mate 1 " in output[0]
+
+
+def test_go_multi_pv():
+    engine, output = runCommands("setoption name MultiPV value 2", f"position fen {MATE_IN_ONE}", "go depth 1")
+    assert [line.split()[4] for line in output if line.startswith("info depth 1 ")] == ["1", "2"]
+    assert output[-1] == "bestmove a1a8"
+
+
+def test_mate_score_is_the_same_at_every_depth():
+    engine, output = runCommands("setoption name MultiPV value 2", f"position fen {MATE_IN_ONE}", "go depth 3")
+    best_lines = [line.split() for line in output if " multipv 1 " in line]
+    assert [line[2] for line in best_lines] == ["1", "2", "3"]
+    assert all(line[6:8] == ["mate", "1"] for line in best_lines)
+
+
+def test_run_until_quit():
+    output = io.StringIO()
+    ChessUCI.UCIEngine(output).run(io.StringIO("isready\nquit\nisready\n"))
+    assert output.getvalue() == "readyok\n"
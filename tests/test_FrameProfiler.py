@@ -0,0 +1,74 @@
+import os
+import time
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame as p
+import ChessEngine
+import FrameProfiler
+
+
+def test_get_percentile():
+    values = list(range(1, 101))
+    assert FrameProfiler.getPercentile(values, 50) == 51
+    assert FrameProfiler.getPercentile(values, 99) == 100
+    assert FrameProfiler.getPercentile([3.0], 95) == 3.0
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = FrameProfiler.FrameProfiler()
+    profiler.startFrame()
+    profiler.lap("events")
+    profiler.endFrame()
+    assert profiler.getLines() == []
+
+
+def test_sections_and_searches(capsys):
+    profiler = FrameProfiler.FrameProfiler(enabled=True)
+    for frame in range(FrameProfiler.ROLLING_FRAMES + 10):
+        profiler.startFrame()
+        profiler.lap("events")
+        profiler.lap("draw")
+        profiler.lap("events")  # a section can be lapped twice in a frame
+        profiler.endFrame()
+    assert list(profiler.sections) == ["events", "draw"]
+    assert len(profiler.frame_times) == FrameProfiler.ROLLING_FRAMES
+    move = ChessEngine.GameState().getValidMoves()[0]
+    profiler.recordSearch(0.5, 1000, move)
+    assert "2,000 nodes/s" in capsys.readouterr().out
+    lines = profiler.getLines()
+    assert [line.split()[0] for line in lines] == ["frame", "events", "draw", "AI", "AI"]
+    assert lines[-1] == "AI 2,000 nodes/s"
+
+
+def test_profile_is_written(tmp_path):
+    output = str(tmp_path / "frames.prof")
+    profiler = FrameProfiler.FrameProfiler(profile_frames=2, profile_output=output)
+    for frame in range(2):
+        profiler.startFrame()
+        profiler.endFrame()
+    assert os.path.exists(output) and profiler.profile is None
+
+
+@pytest.fixture
+def screen():
+    p.init()
+    yield p.Surface((512, 512))
+    p.quit()  # SDL's signal handlers would otherwise be inherited by the process pools of later tests
+
+
+def test_overlay_refresh(screen, monkeypatch):
+    profiler = FrameProfiler.FrameProfiler()
+    assert not profiler.needsOverlay([]) and profiler.getOverlayTimeout() is None
+    assert profiler.drawOverlay(screen) is None
+    profiler.toggleOverlay()
+    assert profiler.enabled and profiler.needsOverlay([])
+    overlay_rect = profiler.drawOverlay(screen)
+    assert not profiler.needsOverlay([])
+    assert profiler.needsOverlay([overlay_rect.move(overlay_rect.width - 1, 0)])  # drawn over
+    assert 0 < profiler.getOverlayTimeout() <= FrameProfiler.OVERLAY_INTERVAL
+    monkeypatch.setattr(time, "perf_counter", lambda: profiler.overlay_time + FrameProfiler.OVERLAY_INTERVAL)
+    assert profiler.needsOverlay([]) and profiler.getOverlayTimeout() == 0
+    monkeypatch.undo()
+    profiler.toggleOverlay()
+    assert not profiler.needsOverlay([overlay_rect])
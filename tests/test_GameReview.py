@@ -0,0 +1,61 @@
+import os
+import time
+import ChessEngine
+import GameReview
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame as p
+
+MATE_IN_ONE = "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"
+
+
+def test_classify_move():
+    assert GameReview.classifyMove(0) == "best"
+    assert GameReview.classifyMove(0.5) == "inaccuracy"
+    assert GameReview.classifyMove(5) == "blunder"
+
+
+def test_review_move():
+    GameReview.initWorker()
+    ply, best_move, best_score, played_score, classification = GameReview.reviewMove((0, MATE_IN_ONE, "a1a8", 1))
+    assert (best_move, classification) == ("Ra8", "best")
+    ply, best_move, best_score, played_score, classification = GameReview.reviewMove((0, MATE_IN_ONE, "a1a2", 2))
+    assert best_score > played_score and classification == "blunder"
+
+
+def test_missed_mate_is_scored_like_the_mate():
+    # both moves mate in one, so neither loses anything, at depth 1 as well as deeper
+    GameReview.initWorker()
+    fen = "6k1/5ppp/8/8/8/8/1R6/R5K1 w - - 0 1"
+    for depth in (1, 2):
+        for notation in ("a1a8", "b2b8"):
+            ply, best_move, best_score, played_score, classification = GameReview.reviewMove((0, fen, notation, depth))
+            assert played_score == best_score and classification == "best"
+
+
+def test_review_game():
+    game_state = ChessEngine.GameState()
+    for notation in ["f2f3", "e7e5", "g2g4", "d8h4"]:
+        game_state.makeMove(next(move for move in game_state.getValidMoves() if move.getUCINotation() == notation))
+    review = GameReview.GameReview(game_state, depth=2, processes=1)
+    while not review.isDone():
+        review.poll()
+    review.close()
+    assert review.getAnnotation(3) == ""  # the mate was the best move
+    assert review.getAnnotation(2) == "??"
+
+
+def test_close_with_pygame_running():
+    game_state = ChessEngine.GameState()
+    for notation in ["e2e4", "e7e5"]:
+        game_state.makeMove(next(move for move in game_state.getValidMoves() if move.getUCINotation() == notation))
+    p.init()
+    try:
+        review = GameReview.GameReview(game_state, depth=1, processes=1)
+        while not review.isDone():
+            review.poll()
+        start_time = time.perf_counter()
+        review.close()  # the idle worker must still stop on SIGTERM
+        assert time.perf_counter() - start_time < 5
+    finally:
+        p.quit()
@@ -0,0 +1,101 @@
+import asyncio
+import ChessEngine
+import GameServer
+
+MATE_IN_ONE = "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"
+
+
+class Writer:
+    def __init__(self):
+        self.lines = []
+
+    def is_closing(self):
+        return False
+
+    def write(self, data):
+        self.lines.append(data.decode().rstrip("\n"))
+
+
+def runServer(test, **options):
+    """
+    Run test(server) with a server whose scheduler is running, and release its processes and shared memory.
+    """
+    async def run():
+        server = GameServer.GameServer(1, **options)
+        scheduler = asyncio.create_task(server.scheduler.run())
+        try:
+            return await test(server)
+        finally:
+            scheduler.cancel()
+            server.executor.shutdown(cancel_futures=True)
+            server.scheduler.positions.close()
+            server.scheduler.positions.unlink()
+    return asyncio.run(run())
+
+
+async def runCommands(server, client, *lines):
+    writer = Writer()
+    for line in lines:
+        await server.runCommand(client, line, writer)
+    return writer.lines
+
+
+def test_play_a_game():
+    async def test(server):
+        return await runCommands(server, 1, "new depth=1 movetime=500", "move 1 e2e4", "fen 1", "go 1", "stats",
+                                 "close 1", "fen 1")
+    replies = runServer(test)
+    assert replies[:3] == ["game 1", "ok 1 playing",
+                           "fen 1 rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"]
+    assert replies[3].startswith("bestmove 1 ") and replies[3].endswith(" playing")
+    assert replies[4:] == ["stats games=1 active=1 waiting=0 searching=0", "closed 1", "error 1 unknown game"]
+
+
+def test_go_finds_mate():
+    async def test(server):
+        return await runCommands(server, 1, f"new depth=2 fen {MATE_IN_ONE}", "go 1", "go 1")
+    assert runServer(test) == ["game 1", "bestmove 1 a1a8 checkmate", "bestmove 1 none checkmate"]
+
+
+def test_invalid_commands():
+    async def test(server):
+        return await runCommands(server, 1, "new", "move 1 e2e5", "move 1", "jump 1", "", "new depth=x",
+                                 "new colour=red", "new fen 8/8/8 w - -", f"new fen {MATE_IN_ONE[:-4]} a b")
+    replies = runServer(test)
+    assert replies[:5] == ["game 1", "error 1 illegal move", "error 1 illegal move", "error 1 unknown command",
+                           "error - unknown command"]
+    assert all(reply.startswith("error - ") for reply in replies[5:])
+    assert len(replies) == 9
+
+
+def test_games_belong_to_their_client():
+    async def test(server):
+        return await runCommands(server, 1, "new"), await runCommands(server, 2, "move 1 e2e4", "close 1")
+    assert runServer(test) == (["game 1"], ["error 1 unknown game", "error 1 unknown game"])
+
+
+def test_new_game_fen_is_normalized():
+    async def test(server):
+        return await runCommands(server, 1, "new fen 8/5k2/8/3P4/8/8/2K5/8 b - - bm Kf6;", "fen 1")
+    assert runServer(test)[1] == "fen 1 8/5k2/8/3P4/8/8/2K5/8 b - - 0 1"
+
+
+def test_compacted_games_are_replayed():
+    async def test(server):
+        replies = await runCommands(server, 1, "new", "new", "move 1 e2e4", "move 2 d2d4", "move 1 e7e5")
+        assert server.games[2].game_state is None  # compacted when game 1 was used again
+        return replies + await runCommands(server, 1, "fen 2", "fen 1")
+    replies = runServer(test, active_games=1)
+    assert replies[-2:] == ["fen 2 rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq d3 0 1",
+                            "fen 1 rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2"]
+
+
+def test_search_position_reads_the_shared_snapshot():
+    positions = ChessEngine.SnapshotBuffer(1)
+    try:
+        positions.writeSnapshot(0, ChessEngine.GameState.fromFEN(MATE_IN_ONE).toSnapshot())
+        assert GameServer.searchPosition(positions.name, 0, 2, 1000) == "a1a8"
+    finally:
+        GameServer.closeAttachedPositions()
+        positions.close()
+        positions.unlink()
@@ -0,0 +1,44 @@
+import json
+import ChessEngine
+import MateSolver
+
+MATE_IN_ONE = "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"
+MATE_IN_TWO = "7k/8/8/8/8/8/R7/1R4K1 w - - 0 1"
+
+
+def solve(fen, moves_to_mate):
+    line = MateSolver.findMate(ChessEngine.GameState.fromFEN(fen), moves_to_mate)
+    return [move.getUCINotation() for move in line] if line is not None else None
+
+
+def test_mate_in_one():
+    assert solve(MATE_IN_ONE, 1) == ["a1a8"]
+
+
+def test_mate_in_two():
+    assert solve(MATE_IN_TWO, 1) is None
+    line = solve(MATE_IN_TWO, 2)
+    assert len(line) == 3
+    game_state = ChessEngine.GameState.fromFEN(MATE_IN_TWO)
+    for notation in line:
+        game_state.makeMove(next(move for move in game_state.getValidMoves() if move.getUCINotation() == notation))
+    game_state.getValidMoves()
+    assert game_state.checkmate
+
+
+def test_no_mate():
+    assert solve("7k/8/8/8/8/8/8/K7 w - - 0 1", 2) is None
+
+
+def test_solve_line():
+    result = MateSolver.solveLine(f'{MATE_IN_TWO} dm 2; id "ladder";\n')
+    assert (result["id"], result["solved"], result["mate_in"]) == ("ladder", True, 2)
+    assert MateSolver.solveLine(f"{MATE_IN_TWO} bm Ra7;") is None
+
+
+def test_solve_puzzles(tmp_path):
+    puzzles = tmp_path / "puzzles.epd"
+    puzzles.write_text(f'{MATE_IN_ONE} dm 1; id "a";\n{MATE_IN_TWO} dm 1; id "b";\n')
+    output = tmp_path / "results.jsonl"
+    assert MateSolver.solvePuzzles(str(puzzles), str(output), processes=1) == (1, 2)
+    assert [json.loads(line)["solved"] for line in output.read_text().splitlines()] == [True, False]
@@ -0,0 +1,36 @@
+import os
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame as p
+import SpriteAtlas
+
+SQUARE_SIZE = 32
+
+
+@pytest.fixture
+def atlas_file(tmp_path, monkeypatch):
+    atlas_file = str(tmp_path / f"atlas_{SQUARE_SIZE}.png")
+    monkeypatch.setattr(SpriteAtlas, "getAtlasFile", lambda square_size: atlas_file)
+    return atlas_file
+
+
+def getPixels(surface):
+    return p.image.tostring(surface, "RGBA")
+
+
+def test_atlas_matches_scaled_images(atlas_file):
+    sprites = SpriteAtlas.loadAtlas(SQUARE_SIZE)
+    assert os.path.exists(atlas_file)  # built on first use and saved
+    assert sorted(sprites) == sorted(SpriteAtlas.PIECES)
+    for piece, sprite in sprites.items():
+        image = p.image.load(os.path.join(SpriteAtlas.IMAGE_FOLDER, piece + ".png"))
+        assert getPixels(sprite) == getPixels(p.transform.scale(image, (SQUARE_SIZE, SQUARE_SIZE))), piece
+
+
+def test_cached_atlas_is_reused(atlas_file):
+    built = SpriteAtlas.loadAtlas(SQUARE_SIZE)
+    modified_time = os.path.getmtime(atlas_file)
+    loaded = SpriteAtlas.loadAtlas(SQUARE_SIZE)
+    assert os.path.getmtime(atlas_file) == modified_time
+    assert all(getPixels(loaded[piece]) == getPixels(built[piece]) for piece in SpriteAtlas.PIECES)
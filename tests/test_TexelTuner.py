@@ -0,0 +1,63 @@
+import os
+import numpy as np
+import pytest
+import ChessAI
+import ChessTensor
+import TexelTuner
+from tests.test_ChessTensor import randomPositions
+
+POSITIONS = """rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 c9 "1-0";
+8/5k2/8/3P4/8/8/2K5/8 w - - c9 "1-0";
+8/5k2/8/3p4/8/8/2K5/8 w - - c9 "0-1";
+8/5k2/8/3p4/8/8/2K5/8 w - z9 c9 "0-1";
+8/5k2/8/8/8/8/2K5/8 w - - c9 "1/2-1/2";
+"""
+
+
+@pytest.fixture
+def parameters():
+    """
+    Restore the ChessAI parameters after a test that tunes them.
+    """
+    saved = ChessAI.getParameters()
+    yield
+    ChessAI.setParameters(saved)
+
+
+def test_features_reproduce_the_evaluation():
+    game_states = [game_state for game_state in randomPositions(20, 4)
+                   if not game_state.checkmate and not game_state.stalemate]
+    features = TexelTuner.extractFeatures(np.array([ChessTensor.encodeBoard(game_state)
+                                                    for game_state in game_states]))
+    offsets = [ChessAI.scorePawnStructure(game_state.board) for game_state in game_states]
+    assert np.allclose(features @ TexelTuner.getParameters() + offsets,
+                       [ChessAI.scoreBoard(game_state) for game_state in game_states])
+
+
+def test_set_parameters_round_trip(parameters):
+    vector = TexelTuner.getParameters()
+    TexelTuner.setParameters(vector + 0.5)
+    assert ChessAI.piece_score["N"] == pytest.approx(vector[TexelTuner.TUNED_PIECES.index("N")] + 0.5)
+    TexelTuner.setParameters(vector)
+    assert np.allclose(TexelTuner.getParameters(), vector)
+
+
+def test_encode_lines_skips_invalid_positions():
+    features, offsets, results, skipped = TexelTuner.encodeLines((10, POSITIONS.splitlines()))
+    assert features.shape == (4, TexelTuner.FEATURE_COUNT)
+    assert list(results) == [1.0, 1.0, 0.0, 0.5]
+    assert [line_number for line_number, error in skipped] == [13]
+
+
+def test_tune(tmp_path, parameters, capsys):
+    positions_file = tmp_path / "positions.epd"
+    positions_file.write_text(POSITIONS)
+    output = str(tmp_path / "tuned.json")
+    TexelTuner.tune(str(positions_file), output, iterations=2, k=1.0, processes=1)
+    assert "Skipped line 4" in capsys.readouterr().out
+    assert os.path.exists(output)
+    cache = str(positions_file) + ".texel"
+    assert TexelTuner.isCacheValid(cache, str(positions_file))
+    positions_file.write_text(POSITIONS.replace('"0-1"', '"1-0"'))  # same size, new contents
+    os.utime(positions_file, ns=(0, 0))
+    assert not TexelTuner.isCacheValid(cache, str(positions_file))
@@ -0,0 +1,49 @@
+import json
+import pytest
+import ChessAI
+import Tournament
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    monkeypatch.setattr(ChessAI, "DEPTH", ChessAI.DEPTH)  # applyEngine changes it
+    Tournament.initWorker()
+    return Tournament.parseEngine("depth=1", "engine1"), Tournament.parseEngine("depth=1", "engine2")
+
+
+def test_parse_engine():
+    assert Tournament.parseEngine("depth=3,parameters=tuned.json", "a") == \
+        {"name": "a", "depth": 3, "parameters": "tuned.json"}
+    assert Tournament.parseEngine("", "b")["depth"] == ChessAI.DEPTH
+
+
+def test_compute_elo():
+    elo, low, high = Tournament.computeElo(10, 10, 10)
+    assert elo == pytest.approx(0) and low < 0 < high
+    assert Tournament.computeElo(20, 5, 5)[0] > 0
+
+
+def test_compute_sprt():
+    assert Tournament.computeSPRT(300, 100, 100, 0, 10, 0.05, 0.05)[1] == "pass"
+    assert Tournament.computeSPRT(100, 100, 300, 0, 10, 0.05, 0.05)[1] == "fail"
+    assert Tournament.computeSPRT(5, 5, 5, 0, 10, 0.05, 0.05)[1] == "continue"
+    assert Tournament.computeSPRT(0, 4, 0, 0, 10, 0.05, 0.05) == (0.0, "continue")
+
+
+def test_play_game_finds_mate(engines):
+    game = Tournament.playGame(*engines, opening="6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", max_plies=10)
+    assert (game["result"], game["reason"], game["moves"]) == ("1-0", "checkmate", ["a1a8"])
+
+
+def test_play_game_from_black_to_move(engines):
+    game = Tournament.playGame(*engines, opening="6k1/8/8/8/8/8/5PPP/r5K1 b - - 0 1", max_plies=10)
+    assert (game["result"], game["reason"], game["plies"]) == ("0-1", "checkmate", 1)
+    assert game["cpu_time"]["white"] == 0.0
+
+
+def test_run_match(tmp_path, engines):
+    output = tmp_path / "match.jsonl"
+    openings = ["6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"]
+    assert Tournament.runMatch(*engines, 2, str(output), openings, processes=1, max_plies=4) == (1, 0, 1)
+    games = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(game["white"] for game in games) == ["engine1", "engine2"]
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import random
+import time
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # no window, before pygame opens the display
+import pygame as p
+import ChessAI
+import ChessEngine
+import ChessPGN
+import Tournament
+import main
+from tests.test_ChessEngine import findMove
+
+WINDOW_SIZE = (main.BOARD_WIDTH + main.MOVE_LOG_PANEL_WIDTH, main.BOARD_HEIGHT)
+
+
+@pytest.fixture(scope="module")
+def screen():
+    p.init()
+    yield p.display.set_mode(WINDOW_SIZE)
+    p.quit()
+
+
+def playKnightMoves(game_state, plies):
+    for ply in range(plies):
+        game_state.makeMove(findMove(game_state, ["g1f3", "g8f6", "f3g1", "f6g8"][len(game_state.move_log) % 4]))
+
+
+def getSquarePixels(surface, row, col):
+    square = p.Rect(col * main.SQUARE_SIZE, row * main.SQUARE_SIZE, main.SQUARE_SIZE, main.SQUARE_SIZE)
+    return p.image.tostring(surface.subsurface(square), "RGB")
+
+
+def getBoardPixels(surface):
+    return p.image.tostring(surface.subsurface((0, 0, main.BOARD_WIDTH, main.BOARD_HEIGHT)), "RGB")
+
+
+def test_incremental_rendering_matches_full_rendering(screen):
+    incremental = p.Surface(WINDOW_SIZE)
+    renderer = main.BoardRenderer()
+    game_state = ChessEngine.GameState()
+    generator = random.Random(1)
+    for frame in range(60):
+        valid_moves = game_state.getValidMoves()
+        if not valid_moves:
+            break
+        square_selected = (valid_moves[0].start_row, valid_moves[0].start_col) if frame % 3 == 0 else ()
+        end_text = "Stalemate" if frame == 30 else None
+        renderer.drawBoard(incremental, game_state, valid_moves, square_selected, end_text)
+        full = p.Surface(WINDOW_SIZE)
+        main.BoardRenderer().drawBoard(full, game_state, valid_moves, square_selected, end_text)
+        assert getBoardPixels(incremental) == getBoardPixels(full), frame
+        if frame % 7 == 6:
+            game_state.undoMove()
+        else:
+            game_state.makeMove(generator.choice(valid_moves))
+
+
+def test_unchanged_board_repaints_nothing(screen):
+    renderer = main.BoardRenderer()
+    game_state = ChessEngine.GameState()
+    valid_moves = game_state.getValidMoves()
+    assert len(renderer.drawBoard(screen, game_state, valid_moves, ())) == 64
+    assert renderer.drawBoard(screen, game_state, valid_moves, ()) == []
+    renderer.invalidateRect(p.Rect(0, 0, main.SQUARE_SIZE + 1, 1))
+    assert len(renderer.drawBoard(screen, game_state, valid_moves, ())) == 2
+
+
+def test_wait_for_events_times_out(screen):
+    p.event.clear()
+    for timeout in (0, 0.05):
+        start_time = time.perf_counter()
+        asyncio.run(main.waitForEvents(timeout))
+        assert time.perf_counter() - start_time < timeout + 0.5
+
+
+def test_wait_for_events_leaves_the_event_queued(screen):
+    p.event.clear()
+    p.event.post(p.event.Event(p.KEYDOWN, key=p.K_z))
+    start_time = time.perf_counter()
+    asyncio.run(main.waitForEvents(5))
+    assert time.perf_counter() - start_time < 1
+    assert [event.type for event in p.event.get(p.KEYDOWN)] == [p.KEYDOWN]
+
+
+def test_move_log_panel_updates_only_changed_lines(screen):
+    panel = main.MoveLogPanel(p.font.SysFont("Arial", 14))
+    game_state = ChessEngine.GameState()
+    playKnightMoves(game_state, 8)
+    assert panel.update(game_state)
+    assert not panel.update(game_state)
+    assert [text for text, rendered in panel.lines] == ["1. Nf3 Nf6  2. Ng1 Ng8  3. Nf3 Nf6  ", "4. Ng1 Ng8  "]
+    first_line = panel.lines[0][1]
+    game_state.undoMove()
+    assert panel.update(game_state)
+    assert panel.lines[0][1] is first_line  # not rendered again
+    assert panel.lines[1][0] == "4. Ng1 "
+
+
+def test_move_log_panel_scrolling(screen):
+    panel = main.MoveLogPanel(p.font.SysFont("Arial", 14))
+    game_state = ChessEngine.GameState()
+    playKnightMoves(game_state, (panel.visible_lines + 5) * panel.plies_per_line)
+    panel.update(game_state)
+    assert panel.scroll == panel.getLastScroll() == 5
+    panel.scrollBy(-3)
+    assert panel.update(game_state)  # scrolling needs a repaint
+    playKnightMoves(game_state, panel.plies_per_line)
+    panel.update(game_state)
+    assert panel.scroll == 2  # scrolled back, so it stays put as moves are added
+    panel.scrollBy(100)
+    assert panel.scroll == panel.getLastScroll() == 6 and panel.follow
+    panel.draw(screen)
+
+
+def drawPosition(board):
+    surface = p.Surface(WINDOW_SIZE)
+    main.drawBoard(surface)
+    main.drawPieces(surface, board)
+    return surface
+
+
+@pytest.mark.parametrize("fen, notation", [
+    (ChessEngine.START_FEN, "e2e4"),
+    ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", "e5d6"),
+    ("4k3/8/8/8/8/8/8/R3K2R w KQ - 0 1", "a1a8"),
+])
+def test_animation_ends_on_the_new_position(screen, fen, notation):
+    game_state = ChessEngine.GameState.fromFEN(fen)
+    move = findMove(game_state, notation)
+    game_state.makeMove(move)
+    p.event.clear()
+    start_time = time.perf_counter()
+    asyncio.run(main.animateMove(move, screen, game_state.board, p.time.Clock()))
+    assert time.perf_counter() - start_time < main.MAX_ANIMATION_TIME + 0.5
+    # the piece ends on its square; an en passant pawn stays until the main loop repaints the board
+    expected = drawPosition(game_state.board)
+    for row, col in ((move.start_row, move.start_col), (move.end_row, move.end_col)):
+        assert getSquarePixels(screen, row, col) == getSquarePixels(expected, row, col)
+
+
+def test_key_press_skips_the_animation(screen):
+    game_state = ChessEngine.GameState.fromFEN("4k3/8/8/8/8/8/8/R3K2R w KQ - 0 1")
+    move = findMove(game_state, "a1a8")
+    game_state.makeMove(move)
+    p.event.clear()
+    p.event.post(p.event.Event(p.KEYDOWN, key=p.K_z))
+    start_time = time.perf_counter()
+    asyncio.run(main.animateMove(move, screen, game_state.board, p.time.Clock()))
+    assert time.perf_counter() - start_time < main.MAX_ANIMATION_TIME / 2
+    assert p.event.peek(p.KEYDOWN)  # left for the main loop
+    assert getBoardPixels(screen) == getBoardPixels(drawPosition(game_state.board))
+
+
+def test_piece_images_load_on_first_use(screen, monkeypatch):
+    monkeypatch.setattr(main, "IMAGES", {})
+    assert main.IMAGES == {}
+    sprite = main.getPieceImage("wN")
+    assert sprite.get_size() == (main.SQUARE_SIZE, main.SQUARE_SIZE)
+    assert len(main.IMAGES) == 12
+    assert main.getPieceImage("wN") is sprite
+
+
+def test_run_headless(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(ChessAI, "DEPTH", ChessAI.DEPTH)  # the engines set it
+    output = tmp_path / "games.pgn"
+    engine = Tournament.parseEngine("depth=1", "engine")
+    main.runHeadless(2, engine, engine, "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", 10, str(output))
+    games = list(ChessPGN.readPGN(output.read_text().splitlines()))
+    assert len(games) == 2
+    for headers, moves in games:
+        assert (headers["Result"], headers["Termination"], headers["SetUp"]) == ("1-0", "checkmate", "1")
+        assert moves == ["Ra8#"]
+    assert "[%emt " in output.read_text()
+    assert "2 games, 2 moves" in capsys.readouterr().out